@@ -0,0 +1,213 @@
+"""Per-route admission control and load shedding.
+
+Requests are sorted into route classes (uploads, media, content, data
+exports), and each class has its own limit on requests in flight plus a
+bounded queue of requests waiting for a slot. A burst of uploads can then only use the
+upload slots: media and theme requests keep their own share of event loop
+time and storage connections. A request arriving when its class's queue
+is full, or that waits longer than ADMISSION_QUEUE_TIMEOUT_SECONDS, is
+answered immediately with 503 and Retry-After rather than piling up.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from functools import lru_cache
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.metrics import REGISTRY, Counter, Gauge, Histogram
+from app.responses import FastJSONResponse
+from app.settings import get_settings
+from app.storage_backends.filesystem import UPLOAD_ROUTE
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_WAIT = REGISTRY.register(
+    Histogram(
+        "admission_queue_wait_seconds",
+        "Time admitted requests waited for a slot, by route class.",
+        ("route_class",),
+    )
+)
+ADMISSION_SHED = REGISTRY.register(
+    Counter(
+        "admission_shed_total",
+        "Requests rejected with 503 by admission control, by route class.",
+        ("route_class", "reason"),
+    )
+)
+ADMISSION_IN_FLIGHT = REGISTRY.register(
+    Gauge(
+        "admission_in_flight",
+        "Requests currently holding a slot, by route class.",
+        ("route_class",),
+    )
+)
+ADMISSION_QUEUED = REGISTRY.register(
+    Gauge(
+        "admission_queued",
+        "Requests currently waiting for a slot, by route class.",
+        ("route_class",),
+    )
+)
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+# --- Limiter ---
+
+
+class RouteLimiter:
+    """Concurrency limit with a bounded FIFO queue for one route class."""
+
+    def __init__(self, name: str, concurrency: int, queue_depth: int) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def _publish(self) -> None:
+        ADMISSION_IN_FLIGHT.set(self._active, route_class=self.name)
+        ADMISSION_QUEUED.set(len(self._waiters), route_class=self.name)
+
+    async def acquire(self, timeout: float) -> float:
+        """
+        Wait for a slot.
+
+        Args:
+            timeout: Longest time to wait in the queue
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            Overloaded: If the queue is full or the wait timed out
+        """
+        if self._active < self.concurrency and not self._waiters:
+            self._active += 1
+            self._publish()
+            return 0.0
+        if len(self._waiters) >= self.queue_depth:
+            raise Overloaded("queue_full")
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            async with asyncio.timeout(timeout):
+                await waiter
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on.
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._publish()
+            if isinstance(e, TimeoutError):
+                raise Overloaded("timeout")
+            raise
+        return time.perf_counter() - started
+
+    def release(self) -> None:
+        """Hand the slot to the next waiter, or free it."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._publish()
+                return
+        self._active -= 1
+        self._publish()
+
+
+@lru_cache
+def get_route_limiters() -> dict[str, RouteLimiter]:
+    """Return the limiter of every route class, sized from settings."""
+    settings = get_settings()
+    return {
+        "upload": RouteLimiter(
+            "upload",
+            settings.admission_upload_concurrency,
+            settings.admission_upload_queue_depth,
+        ),
+        "media": RouteLimiter(
+            "media",
+            settings.admission_media_concurrency,
+            settings.admission_media_queue_depth,
+        ),
+        "content": RouteLimiter(
+            "content",
+            settings.admission_content_concurrency,
+            settings.admission_content_queue_depth,
+        ),
+        "export": RouteLimiter(
+            "export",
+            settings.admission_export_concurrency,
+            settings.admission_export_queue_depth,
+        ),
+    }
+
+
+def route_class(method: str, path: str) -> str | None:
+    """Return the route class of a request, or None for unlimited routes."""
+    if method == "OPTIONS":
+        return None
+    if path.startswith(("/v1/media/", "/v1/yle-media/")):
+        return "media"
+    if path == "/v1/theme" or path.startswith("/v1/theme/"):
+        return "content"
+    if path.startswith("/v1/recordings/") and path.endswith("/export"):
+        # Exports stream for minutes; keep them off the upload slots.
+        return "export"
+    if path.startswith(("/v1/upload", "/v1/recordings/", UPLOAD_ROUTE)):
+        return "upload"
+    return None
+
+
+# --- Middleware ---
+
+
+class AdmissionMiddleware:
+    """Hold a route-class slot for the whole request, or shed it with 503."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        settings = get_settings()
+        name = None
+        if scope["type"] == "http" and settings.admission_control_enabled:
+            name = route_class(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = get_route_limiters()[name]
+        try:
+            waited = await limiter.acquire(settings.admission_queue_timeout_seconds)
+        except Overloaded as e:
+            ADMISSION_SHED.inc(route_class=name, reason=e.reason)
+            logger.warning(f"Shed {scope['method']} {scope['path']}: {e.reason}")
+            response = FastJSONResponse(
+                {"detail": "Server is busy, please retry"},
+                status_code=503,
+                headers={"Retry-After": str(settings.admission_retry_after_seconds)},
+            )
+            await response(scope, receive, send)
+            return
+
+        ADMISSION_WAIT.observe(waited, route_class=name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
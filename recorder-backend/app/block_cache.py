@@ -0,0 +1,130 @@
+"""Aligned-block cache for byte-range reads of large media blobs.
+
+Players seek by sending many small, overlapping Range requests for the same
+video. Each blob is split into fixed-size aligned blocks keyed by blob name,
+ETag and block index; a range is assembled from the blocks it covers and
+only the missing blocks are downloaded, concurrently. Blocks are downloaded
+on condition that the blob still has the cached ETag, so a changed blob
+never mixes old and new blocks; the read fails with BlobModifiedError
+instead, and the next one sees the new ETag.
+"""
+
+import asyncio
+import logging
+
+from app.cache import TTLCache
+from app.metrics import record_cache_lookup
+from app.storage import (
+    BlobModifiedError,
+    get_blob_properties,
+    load_blob_binary_range,
+)
+
+logger = logging.getLogger(__name__)
+
+BlockKey = tuple[str, str, int]
+
+# Blocks are immutable for a given ETag, so they only leave the cache by
+# LRU eviction; the TTL just bounds how long unused blocks linger.
+BLOCK_TTL_SECONDS = 3600.0
+
+
+class BlockCache:
+    """LRU cache of aligned blob blocks within a memory budget.
+
+    Blob sizes and ETags are cached for ``properties_ttl_seconds``; call
+    invalidate() when a blob is known to have changed.
+    """
+
+    def __init__(
+        self,
+        block_size: int,
+        max_bytes: int,
+        properties_ttl_seconds: float,
+        fetch_concurrency: int = 8,
+    ) -> None:
+        self.block_size = block_size
+        self.max_bytes = max_bytes
+        self.fetch_concurrency = fetch_concurrency
+        self._blocks: TTLCache[BlockKey, bytes] = TTLCache(
+            ttl_seconds=BLOCK_TTL_SECONDS,
+            max_entries=max(1, max_bytes // block_size) * 2,
+            max_bytes=max_bytes,
+        )
+        self._properties: TTLCache[str, tuple[int, str]] = TTLCache(
+            ttl_seconds=properties_ttl_seconds
+        )
+
+    def invalidate(self, blob_name: str) -> None:
+        """Forget a blob's size and ETag; its old blocks age out."""
+        self._properties.invalidate(blob_name)
+
+    def clear(self) -> None:
+        """Drop every block and cached blob property."""
+        self._blocks.clear()
+        self._properties.clear()
+
+    def can_serve(self, length: int) -> bool:
+        """Return True when a range of this length fits the cache usefully."""
+        return length <= self.max_bytes // 4
+
+    async def properties(self, blob_name: str) -> tuple[int, str]:
+        """Return (size, ETag) of a blob, from cache when known."""
+        cached = self._properties.get(blob_name)
+        if cached is None:
+            cached = await get_blob_properties(blob_name)
+            self._properties.set(blob_name, cached)
+        return cached
+
+    async def _fetch_block(
+        self, blob_name: str, etag: str, index: int, size: int
+    ) -> bytes:
+        offset = index * self.block_size
+        content, _ = await load_blob_binary_range(
+            blob_name,
+            offset=offset,
+            length=min(self.block_size, size - offset),
+            etag=etag,
+        )
+        self._blocks.set((blob_name, etag, index), content)
+        return content
+
+    async def read(self, blob_name: str, start: int, end: int) -> bytes:
+        """Return bytes start..end (inclusive) of a blob.
+
+        The caller clamps end to the blob size taken from properties().
+
+        Raises:
+            BlobModifiedError: If the blob changed since its ETag was cached
+            StorageError: If a missing block can't be loaded
+        """
+        size, etag = await self.properties(blob_name)
+        first, last = start // self.block_size, end // self.block_size
+
+        blocks: dict[int, bytes] = {}
+        missing: list[int] = []
+        for index in range(first, last + 1):
+            block = self._blocks.get((blob_name, etag, index))
+            record_cache_lookup("media_block", hit=block is not None)
+            if block is None:
+                missing.append(index)
+            else:
+                blocks[index] = block
+
+        if missing:
+            semaphore = asyncio.Semaphore(self.fetch_concurrency)
+
+            async def fetch(index: int) -> bytes:
+                async with semaphore:
+                    return await self._fetch_block(blob_name, etag, index, size)
+
+            try:
+                fetched = await asyncio.gather(*(fetch(index) for index in missing))
+            except BlobModifiedError:
+                self.invalidate(blob_name)
+                raise
+            blocks.update(zip(missing, fetched))
+
+        data = b"".join(blocks[index] for index in range(first, last + 1))
+        offset = start - first * self.block_size
+        return data[offset : offset + end - start + 1]
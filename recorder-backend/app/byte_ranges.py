@@ -0,0 +1,144 @@
+"""HTTP Range header parsing and multipart/byteranges framing.
+
+Media served from local files goes through Starlette's FileResponse; these
+helpers give blob-backed media the same behaviour: a malformed header is a
+400, a header with no satisfiable range is a 416, and several ranges are
+sent as one multipart/byteranges response. A header fragmented into more
+ranges than are served is not refused; neighbouring ranges are merged
+instead, as RFC 9110 allows.
+
+Ranges here are inclusive ``(start, end)`` pairs, as in Content-Range.
+"""
+
+from typing import Sequence
+
+ByteRange = tuple[int, int]
+
+# More ranges than this (after coalescing) are merged across their
+# narrowest gaps until this many remain.
+MAX_RANGES = 16
+
+
+class MalformedRangeHeader(ValueError):
+    """The Range header could not be parsed."""
+
+
+class RangeNotSatisfiable(Exception):
+    """None of the requested ranges overlaps the resource."""
+
+
+def _is_number(value: str) -> bool:
+    return value.isascii() and value.isdigit()
+
+
+def parse_range_header(header: str, size: int) -> list[ByteRange]:
+    """Parse a Range header into sorted, coalesced ranges within size.
+
+    Overlapping and adjacent ranges are merged so each byte is read once.
+    If more than MAX_RANGES remain, the ranges separated by the narrowest
+    gaps are merged too, sending the fewest bytes that were not asked for.
+
+    Args:
+        header: Range header value, for example ``bytes=0-99,-500``
+        size: Total size of the resource in bytes
+
+    Returns:
+        Non-empty list of inclusive (start, end) ranges
+
+    Raises:
+        MalformedRangeHeader: If the header is not a valid bytes range
+        RangeNotSatisfiable: If no range overlaps the resource
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        raise MalformedRangeHeader("Only bytes ranges are supported")
+
+    ranges: list[ByteRange] = []
+    for spec in specs.split(","):
+        first, dash, last = spec.strip().partition("-")
+        if (
+            not dash
+            or not (first or last)
+            or (first and not _is_number(first))
+            or (last and not _is_number(last))
+        ):
+            raise MalformedRangeHeader(f"Invalid range: {spec.strip()!r}")
+
+        if not first:
+            # Suffix range: the last N bytes.
+            length = int(last)
+            if length > 0 and size > 0:
+                ranges.append((max(size - length, 0), size - 1))
+            continue
+
+        start = int(first)
+        if last and int(last) < start:
+            raise MalformedRangeHeader(f"Invalid range: {spec.strip()!r}")
+        if start < size:
+            end = int(last) if last else size - 1
+            ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    merged = coalesce_ranges(ranges)
+    if len(merged) > MAX_RANGES:
+        merged = _bridge_narrowest_gaps(merged, MAX_RANGES)
+    return merged
+
+
+def coalesce_ranges(ranges: Sequence[ByteRange]) -> list[ByteRange]:
+    """Sort ranges and merge those that overlap or touch."""
+    merged: list[ByteRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _bridge_narrowest_gaps(ranges: list[ByteRange], limit: int) -> list[ByteRange]:
+    """Merge sorted, disjoint ranges into limit ranges, keeping the widest gaps."""
+    widest = sorted(
+        range(1, len(ranges)),
+        key=lambda i: ranges[i][0] - ranges[i - 1][1],
+        reverse=True,
+    )
+    bounds = [0, *sorted(widest[: limit - 1]), len(ranges)]
+    return [
+        (ranges[first][0], ranges[last - 1][1])
+        for first, last in zip(bounds, bounds[1:])
+    ]
+
+
+def multipart_part_header(
+    boundary: str, content_type: str, byte_range: ByteRange, size: int
+) -> bytes:
+    """Return the delimiter and headers that precede one part's bytes."""
+    start, end = byte_range
+    return (
+        f"--{boundary}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Range: bytes {start}-{end}/{size}\r\n"
+        "\r\n"
+    ).encode("latin-1")
+
+
+def multipart_closing(boundary: str) -> bytes:
+    """Return the delimiter that ends a multipart/byteranges body."""
+    return f"--{boundary}--".encode("latin-1")
+
+
+def multipart_length(
+    boundary: str, content_type: str, ranges: Sequence[ByteRange], size: int
+) -> int:
+    """Return the Content-Length of a multipart/byteranges body."""
+    return sum(
+        len(multipart_part_header(boundary, content_type, byte_range, size))
+        + byte_range[1]
+        - byte_range[0]
+        + 1
+        + len(b"\r\n")
+        for byte_range in ranges
+    ) + len(multipart_closing(boundary))
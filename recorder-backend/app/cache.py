@@ -0,0 +1,203 @@
+"""Small in-process caches for content served by the API."""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Hashable, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """Bounded LRU cache whose entries expire after a fixed time-to-live.
+
+    With ``max_bytes`` set, values must support ``len()`` and the cache also
+    evicts least recently used entries to keep their total size in budget.
+
+    With ``stale_seconds`` set, expired entries are kept that much longer
+    for get_stale(); get() still returns fresh entries only.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_entries: int = 1024,
+        max_bytes: int | None = None,
+        stale_seconds: float = 0.0,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_seconds = stale_seconds
+        self.total_bytes = 0
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def _size(self, value: V) -> int:
+        return len(value) if self.max_bytes is not None else 0  # type: ignore[arg-type]
+
+    def _pop(self, key: K) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= self._size(entry[1])
+
+    def get(self, key: K) -> V | None:
+        """Return the cached value, or None when missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored_at, value = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl_seconds:
+            if age > self.ttl_seconds + self.stale_seconds:
+                self._pop(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def get_stale(self, key: K) -> tuple[V, float] | None:
+        """Return (value, age in seconds), including expired stale entries."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored_at, value = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl_seconds + self.stale_seconds:
+            self._pop(key)
+            return None
+        return value, age
+
+    def set(self, key: K, value: V) -> None:
+        """Store a value, evicting the least recently used entries when full."""
+        size = self._size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            self._pop(key)
+            return
+
+        self._pop(key)
+        self._entries[key] = (time.monotonic(), value)
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.total_bytes > self.max_bytes
+        ):
+            self._pop(next(iter(self._entries)))
+
+    def invalidate(self, key: K) -> None:
+        """Drop one entry if present."""
+        self._pop(key)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def values(self) -> Iterator[V]:
+        """Iterate over values that have not expired, oldest first."""
+        now = time.monotonic()
+        for stored_at, value in list(self._entries.values()):
+            if now - stored_at <= self.ttl_seconds:
+                yield value
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# --- Stale-while-revalidate ---
+
+
+@dataclass
+class CacheLookup(Generic[V]):
+    """A cached value and, when it is past its TTL, why it was still served.
+
+    ``stale`` is None for fresh values, "revalidating" while a background
+    refresh runs, and "error" when the refresh failed. ``loaded`` is True
+    when the value was not in the cache and had to be loaded.
+    """
+
+    value: V
+    age: float = 0.0
+    stale: str | None = None
+    loaded: bool = False
+
+
+# Background refreshes in flight, one per cache and key.
+_revalidations: dict[tuple[int, Hashable], asyncio.Task] = {}
+
+
+def _revalidate(
+    cache: TTLCache[K, V],
+    key: K,
+    load: Callable[[], Awaitable[V]],
+    permanent_errors: tuple[type[Exception], ...],
+) -> None:
+    task_key = (id(cache), key)
+    running = _revalidations.get(task_key)
+    if (
+        running is not None
+        and not running.done()
+        and running.get_loop() is asyncio.get_running_loop()
+    ):
+        return
+
+    async def refresh() -> None:
+        try:
+            cache.set(key, await load())
+        except permanent_errors as e:
+            cache.invalidate(key)
+            logger.info(f"Dropped {key!r} after background refresh: {e}")
+        except Exception as e:
+            logger.warning(f"Background refresh of {key!r} failed: {e}")
+        finally:
+            if _revalidations.get(task_key) is task:
+                del _revalidations[task_key]
+
+    task = _revalidations[task_key] = asyncio.create_task(refresh())
+
+
+async def get_or_revalidate(
+    cache: TTLCache[K, V],
+    key: K,
+    load: Callable[[], Awaitable[V]],
+    stale_while_revalidate: float,
+    stale_if_error: float,
+    errors: tuple[type[Exception], ...],
+    permanent_errors: tuple[type[Exception], ...] = (),
+) -> CacheLookup[V]:
+    """Return a cached value, loading or refreshing it as needed.
+
+    Values up to ``stale_while_revalidate`` seconds past their TTL are served
+    at once while a single background task reloads them. Older values are
+    reloaded in line, but if that raises one of ``errors`` a value up to
+    ``stale_if_error`` seconds past its TTL is served instead. The cache
+    must keep expired entries at least that long (``stale_seconds``).
+
+    A load failing with one of ``permanent_errors`` (say, the value was
+    deleted) drops the stale value instead, so it is never served again.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return CacheLookup(value)
+
+    stale = cache.get_stale(key)
+    if stale is not None and stale[1] - cache.ttl_seconds <= stale_while_revalidate:
+        _revalidate(cache, key, load, permanent_errors)
+        return CacheLookup(stale[0], stale[1], "revalidating")
+
+    try:
+        value = await load()
+    except permanent_errors:
+        cache.invalidate(key)
+        raise
+    except errors:
+        if stale is not None and stale[1] - cache.ttl_seconds <= stale_if_error:
+            return CacheLookup(stale[0], stale[1], "error")
+        raise
+    cache.set(key, value)
+    return CacheLookup(value, loaded=True)
@@ -0,0 +1,223 @@
+"""HTTP content-encoding helpers and response compression middleware."""
+
+import gzip
+import zlib
+from typing import Iterable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.media_types import is_compressible_content_type
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional speedup
+    brotli = None
+
+# Bodies compressed here are cached and reused, so spend CPU once on the
+# best ratio rather than on speed.
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# Responses compressed per request trade some ratio for much less CPU.
+DYNAMIC_GZIP_LEVEL = 6
+DYNAMIC_BROTLI_QUALITY = 4
+
+
+def available_encodings() -> tuple[str, ...]:
+    """Return supported content encodings in server preference order."""
+    if brotli is not None:
+        return ("br", "gzip")
+    return ("gzip",)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress data with one of the encodings from available_encodings()."""
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def compress_variants(data: bytes) -> dict[str, bytes]:
+    """Compress data with every available encoding that makes it smaller."""
+    variants: dict[str, bytes] = {}
+    for encoding in available_encodings():
+        compressed = compress(data, encoding)
+        if len(compressed) < len(data):
+            variants[encoding] = compressed
+    return variants
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Return the ETag of the representation compressed with an encoding.
+
+    Encodings of one body are different representations, so each gets its
+    own validator, e.g. ``"abc"`` becomes ``"abc-br"``.
+    """
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+
+def parse_accept_encoding(header: str | None) -> dict[str, float]:
+    """Parse an Accept-Encoding header into a map of coding to q-value."""
+    accepted: dict[str, float] = {}
+    if not header:
+        return accepted
+
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+
+    return accepted
+
+
+def negotiate_encoding(
+    accept_encoding: str | None, available: Iterable[str]
+) -> str | None:
+    """Pick the best available encoding the client accepts, or None for identity."""
+    accepted = parse_accept_encoding(accept_encoding)
+    if not accepted:
+        return None
+
+    best: str | None = None
+    best_quality = 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _StreamCompressor:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, encoding: str) -> None:
+        if encoding == "br" and brotli is not None:
+            self._brotli = brotli.Compressor(quality=DYNAMIC_BROTLI_QUALITY)
+            self._zlib = None
+        elif encoding == "gzip":
+            self._brotli = None
+            self._zlib = zlib.compressobj(DYNAMIC_GZIP_LEVEL, zlib.DEFLATED, 31)
+        else:
+            raise ValueError(f"Unsupported content encoding: {encoding}")
+
+    def compress(self, data: bytes, *, final: bool) -> bytes:
+        if self._brotli is not None:
+            chunk = self._brotli.process(data)
+            return chunk + (self._brotli.finish() if final else self._brotli.flush())
+
+        assert self._zlib is not None
+        chunk = self._zlib.compress(data)
+        flush_mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return chunk + self._zlib.flush(flush_mode)
+
+
+class CompressionMiddleware:
+    """Compress eligible responses with gzip or brotli per Accept-Encoding.
+
+    Responses that already carry a Content-Encoding (such as pre-encoded
+    cached bodies), partial content, small bodies and media types that are
+    already compressed pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(
+            Headers(scope=scope).get("accept-encoding"), available_encodings()
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Rewrites the messages of a single response."""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int) -> None:
+        self._send = send
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._start: Message | None = None
+        self._passthrough = False
+        self._compressor: _StreamCompressor | None = None
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self._passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 206, 304)
+                or not is_compressible_content_type(headers.get("content-type"))
+            )
+            if self._passthrough:
+                await self._send(message)
+            else:
+                # Hold the start message until the first body chunk decides
+                # whether compression is worthwhile.
+                self._start = message
+            return
+
+        if message_type != "http.response.body" or self._passthrough:
+            if self._start is not None:
+                await self._send(self._start)
+                self._start = None
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._start is not None:
+            start, self._start = self._start, None
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self._minimum_size:
+                self._passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+
+            self._compressor = _StreamCompressor(self._encoding)
+            headers["Content-Encoding"] = self._encoding
+            if "etag" in headers:
+                headers["ETag"] = encoded_etag(headers["etag"], self._encoding)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                body = self._compressor.compress(body, final=True)
+                headers["Content-Length"] = str(len(body))
+                await self._send(start)
+                await self._send({**message, "body": body})
+                return
+            await self._send(start)
+
+        assert self._compressor is not None
+        body = self._compressor.compress(body, final=not more_body)
+        await self._send({**message, "body": body})
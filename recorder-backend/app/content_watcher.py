@@ -0,0 +1,126 @@
+"""Background detection of content changes pushed to blob storage.
+
+Each replica polls storage on its own and invalidates only the cache
+entries whose blobs changed, so replicas converge within one poll interval
+without requests revalidating anything themselves.
+
+A poll first lists the version marker blob that ``recorder-tooling storage
+init`` rewrites after every upload. When its ETag is unchanged the poll
+ends there; otherwise (or when there is no marker, or every
+FULL_SCAN_EVERY polls to catch writes made by other means) the theme/ and
+media/ prefixes are listed and their ETags compared to the previous poll.
+"""
+
+import asyncio
+import logging
+import random
+
+from app.metrics import REGISTRY, Counter
+from app.routers.content import (
+    THEME_PREFIX,
+    invalidate_theme_listing,
+    refresh_theme,
+)
+from app.routers.media import invalidate_media
+from app.storage import list_blob_etags, parse_localized_blob_name, StorageError
+
+logger = logging.getLogger(__name__)
+
+CONTENT_VERSION_BLOB = "content-version.json"
+MEDIA_PREFIX = "media/"
+WATCHED_PREFIXES = (THEME_PREFIX, MEDIA_PREFIX)
+FULL_SCAN_EVERY = 10
+
+CONTENT_CHANGES = REGISTRY.register(
+    Counter(
+        "content_changes_total",
+        "Changed blobs detected by the content watcher.",
+        ("prefix",),
+    )
+)
+
+
+def diff_etags(old: dict[str, str], new: dict[str, str]) -> set[str]:
+    """Return blob names added, removed or modified between two listings."""
+    return {
+        name
+        for name in old.keys() | new.keys()
+        if old.get(name) != new.get(name)
+    }
+
+
+class ContentWatcher:
+    """Polls storage for content changes and invalidates affected caches."""
+
+    def __init__(self) -> None:
+        self._marker_etag: str | None = None
+        self._snapshot: dict[str, str] | None = None
+        self._polls_since_scan = 0
+
+    async def poll_once(self) -> set[str]:
+        """Check for changes once and apply them.
+
+        The first poll only records the current state.
+
+        Returns:
+            Names of the blobs that changed since the previous poll
+        """
+        marker = await list_blob_etags(CONTENT_VERSION_BLOB)
+        marker_etag = marker.get(CONTENT_VERSION_BLOB)
+        self._polls_since_scan += 1
+        if (
+            self._snapshot is not None
+            and marker_etag is not None
+            and marker_etag == self._marker_etag
+            and self._polls_since_scan < FULL_SCAN_EVERY
+        ):
+            return set()
+
+        snapshot: dict[str, str] = {}
+        for prefix in WATCHED_PREFIXES:
+            snapshot.update(await list_blob_etags(prefix))
+
+        previous, self._snapshot = self._snapshot, snapshot
+        self._marker_etag = marker_etag
+        self._polls_since_scan = 0
+        if previous is None:
+            return set()
+
+        changed = diff_etags(previous, snapshot)
+        if changed:
+            logger.info(f"Content watcher found {len(changed)} changed blobs")
+            await self._apply(changed, previous, snapshot)
+        return changed
+
+    async def _apply(
+        self, changed: set[str], previous: dict[str, str], current: dict[str, str]
+    ) -> None:
+        refreshes = []
+        for name in sorted(changed):
+            if name.startswith(MEDIA_PREFIX):
+                CONTENT_CHANGES.inc(prefix=MEDIA_PREFIX)
+                invalidate_media(name)
+                continue
+
+            parsed = parse_localized_blob_name(name, THEME_PREFIX)
+            if parsed is None:
+                continue
+            CONTENT_CHANGES.inc(prefix=THEME_PREFIX)
+            if (name in previous) != (name in current):
+                invalidate_theme_listing()
+            refreshes.append(refresh_theme(*parsed))
+
+        await asyncio.gather(*refreshes)
+
+    async def run(self, interval_seconds: float) -> None:
+        """Poll until cancelled, sleeping a jittered interval between polls.
+
+        The jitter spreads replicas' listings while keeping every gap within
+        the interval.
+        """
+        while True:
+            try:
+                await self.poll_once()
+            except StorageError as e:
+                logger.warning(f"Content watcher poll failed: {e}")
+            await asyncio.sleep(interval_seconds * random.uniform(0.5, 1.0))
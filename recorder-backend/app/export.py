@@ -0,0 +1,157 @@
+"""Streaming ZIP export of one client's recordings and metadata.
+
+The archive is written on the fly while it is sent: each blob is read in
+ranges of ``EXPORT_CHUNK_SIZE`` bytes and passed straight through
+``zipfile`` into the response, so nothing the size of a recording, let
+alone the archive, is held in memory. The next ``EXPORT_PREFETCH_BLOBS``
+blobs are downloaded concurrently while the current one is sent, each
+with at most ``PREFETCH_CHUNKS`` chunks buffered, which bounds memory at
+roughly ``EXPORT_PREFETCH_BLOBS * (PREFETCH_CHUNKS + 1) * EXPORT_CHUNK_SIZE``.
+
+Audio is stored uncompressed (it is already compressed); metadata JSON is
+deflated. Entry sizes are not known up front, so every entry is written
+with ZIP64 extra fields and a trailing data descriptor, and archives over
+4 GiB or 65535 entries are valid.
+"""
+
+import asyncio
+import logging
+import time
+import zipfile
+from typing import AsyncIterator
+
+from app.manifests import UPLOAD_PREFIX, client_blob_names
+from app.settings import get_settings
+from app.storage import BlobNotFoundError, StorageError, load_blob_binary_range
+
+logger = logging.getLogger(__name__)
+
+# Chunks buffered per prefetched blob before its download waits.
+PREFETCH_CHUNKS = 2
+
+# Queue item marking a blob that was in the manifest but never written.
+_MISSING = object()
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes to the response.
+
+    Having no ``tell`` or ``seek`` makes ``zipfile`` write in streaming mode.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def export_blob_names(client_id: str) -> list[str]:
+    """
+    Return the audio and metadata blobs to export for a client.
+
+    Raises:
+        StorageError: If the client's manifest can't be read
+    """
+    names = await client_blob_names(client_id)
+    return [name for name in names if name.startswith(UPLOAD_PREFIX)]
+
+
+async def _fetch(blob_name: str, chunks: asyncio.Queue, chunk_size: int) -> None:
+    """Download one blob in ranges, ending with None, _MISSING or the error."""
+    offset = 0
+    try:
+        while True:
+            content, total_size = await load_blob_binary_range(
+                blob_name, offset=offset, length=chunk_size
+            )
+            offset += len(content)
+            if content:
+                await chunks.put(content)
+            if not content or offset >= total_size:
+                break
+        await chunks.put(None)
+    except BlobNotFoundError:
+        await chunks.put(_MISSING)
+    except StorageError as e:
+        await chunks.put(e)
+
+
+def _zip_info(blob_name: str, date_time: tuple) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(blob_name[len(UPLOAD_PREFIX) :], date_time=date_time)
+    if blob_name.endswith(".json"):
+        info.compress_type = zipfile.ZIP_DEFLATED
+    else:
+        info.compress_type = zipfile.ZIP_STORED
+    return info
+
+
+async def stream_client_archive(blob_names: list[str]) -> AsyncIterator[bytes]:
+    """
+    Stream a ZIP archive of the given blobs.
+
+    Entries are named by their path below ``uploads/audio_and_metadata/``.
+    Blobs that no longer exist are left out.
+
+    Args:
+        blob_names: Blobs to archive, in archive order
+
+    Yields:
+        Consecutive pieces of the archive
+
+    Raises:
+        StorageError: If a blob can't be read; the archive is then truncated
+    """
+    settings = get_settings()
+    chunk_size = settings.export_chunk_size
+    prefetch = max(1, settings.export_prefetch_blobs)
+    date_time = time.localtime()[:6]
+
+    queues = [asyncio.Queue(maxsize=PREFETCH_CHUNKS) for _ in blob_names]
+    tasks: list[asyncio.Task] = []
+
+    def start_next() -> None:
+        index = len(tasks)
+        if index < len(blob_names):
+            tasks.append(
+                asyncio.create_task(
+                    _fetch(blob_names[index], queues[index], chunk_size)
+                )
+            )
+
+    sink = _ChunkSink()
+    try:
+        for _ in range(prefetch):
+            start_next()
+        with zipfile.ZipFile(sink, "w", allowZip64=True) as archive:
+            for index, blob_name in enumerate(blob_names):
+                chunks = queues[index]
+                item = await chunks.get()
+                start_next()
+                if item is _MISSING:
+                    logger.info(f"Skipping missing blob in export: {blob_name}")
+                    continue
+
+                info = _zip_info(blob_name, date_time)
+                with archive.open(info, "w", force_zip64=True) as entry:
+                    while item is not None:
+                        if isinstance(item, StorageError):
+                            raise item
+                        entry.write(item)
+                        if data := sink.drain():
+                            yield data
+                        item = await chunks.get()
+        yield sink.drain()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -2,34 +2,94 @@
 FastAPI application factory for the Kielipankki speech donation recorder.
 """
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from app.routers import content, media, upload
+from app.admission import AdmissionMiddleware
+from app.compression import CompressionMiddleware
+from app.content_watcher import ContentWatcher
+from app.metrics import REGISTRY, MetricsMiddleware
+from app.offload import monitor_loop_lag, shutdown_executor
+from app.responses import FastJSONResponse
+from app.routers import content, local_storage, media, upload
+from app.settings import get_settings
+from app.storage_backends import close_storage_backend
+from app.warmup import run_warmup, warmup_state
 
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run warm-up, the content watcher and the loop lag monitor.
+
+    On shutdown, stop them and release the storage client and CPU executor.
+    """
+    settings = get_settings()
+    background_tasks = []
+    if settings.warmup_enabled:
+        background_tasks.append(asyncio.create_task(run_warmup()))
+    else:
+        warmup_state.ready = True
+    if settings.content_watch_interval_seconds > 0:
+        watcher = ContentWatcher()
+        background_tasks.append(
+            asyncio.create_task(watcher.run(settings.content_watch_interval_seconds))
+        )
+    if settings.loop_lag_interval_seconds > 0:
+        background_tasks.append(
+            asyncio.create_task(monitor_loop_lag(settings.loop_lag_interval_seconds))
+        )
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await close_storage_backend()
+    shutdown_executor()
+
+
 app = FastAPI(
     title="Kielipankki Recorder Backend",
     description="Speech donation recorder backend with Azure Blob Storage",
     version="2.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
 )
 
+# Inside CORS, so browsers can read the status and Retry-After of shed
+# requests, and inside the metrics middleware, so they still count.
+app.add_middleware(AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=get_settings().compression_minimum_size,
+)
+
+# Outermost, so request latency includes compression and CORS handling.
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(upload.router)
 app.include_router(content.router)
 app.include_router(media.router)
+app.include_router(local_storage.router)
 
 
 @app.get("/")
@@ -38,6 +98,21 @@ async def root():
     return {"status": "ok", "service": "jietnašiella-backend"}
 
 
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """Readiness probe: 503 until the startup warm-up has finished."""
+    status_code = 200 if warmup_state.ready else 503
+    return FastJSONResponse(warmup_state.as_dict(), status_code=status_code)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this worker process."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,337 @@
+"""Per-client manifests of uploaded blobs.
+
+Every upload initialisation appends one line to its client's manifest,
+``uploads/manifests/<clientId>.ndjson`` (an append blob), naming the blobs
+the upload may create: the metadata JSON, the audio file and, for
+resumable uploads, the upload record. The line is written before any of
+those blobs, so a manifest never misses a blob that exists.
+
+Deleting a client's data or exporting it then reads one blob instead of
+listing the client's audio and metadata prefixes. Clients that uploaded
+before manifests existed have a manifest that is not marked complete; for
+those the prefixes are still listed until ``reconcile_manifest`` has
+added the missing names and marked the manifest complete.
+
+An append blob takes at most 50,000 appends. When one is full, lines go
+to the next segment, ``<clientId>.0001.ndjson`` and so on. Every append
+holds at least one line, so readers only look for a next segment after a
+segment with that many lines.
+
+Line format (JSON, one object per line)::
+
+    {"complete": true}                       first line of new manifests
+    {"blobs": ["uploads/...", ...], "at": "2025-01-01T00:00:00+00:00"}
+"""
+
+import json
+import logging
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Iterable, Optional
+
+from app.cache import TTLCache
+from app.storage import (
+    AppendBlobFullError,
+    BlobNotFoundError,
+    append_blob,
+    create_append_blob,
+    delete_blobs,
+    list_blobs_with_prefix,
+    load_blob_binary,
+)
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_PREFIX = "uploads/audio_and_metadata/"
+METADATA_PREFIX = "uploads/audio_and_metadata/metadata/"
+MANIFEST_PREFIX = "uploads/manifests/"
+RESUMABLE_UPLOAD_PREFIX = "uploads/resumable/"
+
+# Listing cap for the prefix fallback; far above any one client's uploads.
+MAX_LISTED_BLOBS = 100_000
+
+# Appends Azure accepts per append blob.
+MAX_APPEND_BLOCKS = 50_000
+
+# Segment each client's uploads were last appended to, when not the first.
+_current_segments: TTLCache[str, int] = TTLCache(ttl_seconds=3600, max_entries=4096)
+
+
+def manifest_blob_name(client_id: str, segment: int = 0) -> str:
+    """Return one manifest segment of a client."""
+    if segment:
+        return f"{MANIFEST_PREFIX}{client_id}.{segment:04d}.ndjson"
+    return f"{MANIFEST_PREFIX}{client_id}.ndjson"
+
+
+def client_prefixes(
+    client_id: str, session_id: Optional[str] = None, recording_id: Optional[str] = None
+) -> list[str]:
+    """Return the audio and metadata prefixes holding a client's blobs.
+
+    Narrowed to one session, or one recording of a session, when given.
+    """
+    path = f"{client_id}/"
+    if session_id:
+        path += f"{session_id}/"
+        if recording_id:
+            path += recording_id
+    return [f"{UPLOAD_PREFIX}{path}", f"{METADATA_PREFIX}{path}"]
+
+
+def _line(record: dict) -> bytes:
+    return json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+@dataclass
+class Manifest:
+    """Parsed manifest of one client.
+
+    ``uploads`` holds the names of each line in order, so the blobs of one
+    upload can be found together.
+    """
+
+    complete: bool = False
+    blob_names: set[str] = field(default_factory=set)
+    uploads: list[list[str]] = field(default_factory=list)
+    segments: list[str] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, content: bytes) -> "Manifest":
+        manifest = cls()
+        manifest.add(content)
+        return manifest
+
+    def add(self, content: bytes) -> None:
+        """Add the lines of one segment."""
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn write; the lines around it are still good.
+                logger.warning("Skipping unreadable manifest line")
+                continue
+            if record.get("complete"):
+                self.complete = True
+            blobs = record.get("blobs", [])
+            if blobs:
+                self.blob_names.update(blobs)
+                self.uploads.append(blobs)
+
+
+async def load_manifest(client_id: str) -> Optional[Manifest]:
+    """Return the client's manifest, or None if the client has none.
+
+    Raises:
+        StorageError: If the manifest can't be read
+    """
+    manifest: Optional[Manifest] = None
+    segment = 0
+    while True:
+        name = manifest_blob_name(client_id, segment)
+        try:
+            content = await load_blob_binary(name)
+        except BlobNotFoundError:
+            return manifest
+        if manifest is None:
+            manifest = Manifest()
+        manifest.add(content)
+        manifest.segments.append(name)
+        if content.count(b"\n") < MAX_APPEND_BLOCKS:
+            # Not full, so no later segment exists.
+            return manifest
+        segment += 1
+
+
+async def _list_prefixes(prefixes: Iterable[str]) -> set[str]:
+    names: set[str] = set()
+    for prefix in prefixes:
+        names.update(await list_blobs_with_prefix(prefix, max_results=MAX_LISTED_BLOBS))
+    return names
+
+
+async def _append(
+    client_id: str, data: bytes, first_lines: Callable[[], Awaitable[bytes]]
+) -> None:
+    """Append to the client's current manifest segment, rolling over when full.
+
+    A missing first segment is created with ``first_lines()`` before data.
+    """
+    hint = _current_segments.get(client_id)
+    segment = hint or 0
+    while True:
+        name = manifest_blob_name(client_id, segment)
+        try:
+            await append_blob(name, data)
+            break
+        except AppendBlobFullError:
+            segment += 1
+        except BlobNotFoundError:
+            if segment and segment == hint:
+                # The client's data was deleted since; start over.
+                hint = None
+                segment = 0
+                continue
+            header = await first_lines() if segment == 0 else b""
+            if await create_append_blob(name, header + data):
+                break
+            # Another request created it first; append to it.
+    if segment:
+        _current_segments.set(client_id, segment)
+
+
+async def record_upload(client_id: str, blob_names: list[str]) -> None:
+    """
+    Add the blobs of one upload to the client's manifest.
+
+    The first upload of a client creates the manifest. It is marked complete
+    unless the client already has blobs from before manifests existed.
+
+    Raises:
+        StorageError: If the manifest can't be written
+    """
+
+    async def first_lines() -> bytes:
+        legacy = await _list_prefixes(client_prefixes(client_id))
+        return _line({"complete": True}) if not legacy else b""
+
+    entry = _line({"blobs": blob_names, "at": datetime.now(timezone.utc).isoformat()})
+    await _append(client_id, entry, first_lines)
+
+
+async def client_blob_names(
+    client_id: str, session_id: Optional[str] = None, recording_id: Optional[str] = None
+) -> list[str]:
+    """
+    Return every stored blob name of a client, session or recording.
+
+    Names come from the manifest, including the resumable upload records
+    of the matching uploads. The prefixes are only listed when the
+    manifest is missing or not complete. Names of blobs that were never
+    written, or were deleted since, may be included.
+
+    Raises:
+        StorageError: If the manifest can't be read or listing fails
+    """
+    manifest = await load_manifest(client_id)
+    return await _blob_names(manifest, client_id, session_id, recording_id)
+
+
+async def _blob_names(
+    manifest: Optional[Manifest],
+    client_id: str,
+    session_id: Optional[str],
+    recording_id: Optional[str],
+) -> list[str]:
+    prefixes = client_prefixes(client_id, session_id, recording_id)
+    names: set[str] = set()
+    if manifest is not None:
+        if session_id:
+            for upload in manifest.uploads:
+                matching = [n for n in upload if n.startswith(tuple(prefixes))]
+                if matching:
+                    names.update(matching)
+                    names.update(
+                        n for n in upload if n.startswith(RESUMABLE_UPLOAD_PREFIX)
+                    )
+        else:
+            names = set(manifest.blob_names)
+    if manifest is None or not manifest.complete:
+        names |= await _list_prefixes(prefixes)
+    return sorted(names)
+
+
+async def delete_client_blobs(
+    client_id: str, session_id: Optional[str] = None, recording_id: Optional[str] = None
+) -> int:
+    """
+    Delete the audio and metadata of a client, session or recording.
+
+    Deleting a whole client also deletes its manifest, last and from the
+    last segment back, so a delete that fails half-way can simply be
+    retried.
+
+    Returns:
+        Number of blobs deleted
+
+    Raises:
+        StorageError: If reading the manifest or deleting fails
+    """
+    manifest = await load_manifest(client_id)
+    names = await _blob_names(manifest, client_id, session_id, recording_id)
+    deleted = await delete_blobs(names)
+    if not session_id:
+        segments = manifest.segments if manifest is not None else []
+        for name in reversed(segments):
+            deleted += await delete_blobs([name])
+        _current_segments.invalidate(client_id)
+    return deleted
+
+
+async def reconcile_manifest(client_id: str, listed: Optional[set[str]] = None) -> int:
+    """
+    Add blobs found by listing to a client's manifest and mark it complete.
+
+    Only appends, so uploads recorded while it runs are never lost.
+
+    Args:
+        client_id: Client UUID
+        listed: The client's blob names if already listed
+
+    Returns:
+        Number of blob names that were missing from the manifest
+
+    Raises:
+        StorageError: If listing or writing fails
+    """
+    if listed is None:
+        listed = await _list_prefixes(client_prefixes(client_id))
+    manifest = await load_manifest(client_id)
+    known = manifest.blob_names if manifest is not None else set()
+    missing = sorted(listed - known)
+    if manifest is not None and manifest.complete and not missing:
+        return 0
+
+    repair = _line({"complete": True})
+    if missing:
+        repair += _line(
+            {"blobs": missing, "at": datetime.now(timezone.utc).isoformat()}
+        )
+
+    async def no_first_lines() -> bytes:
+        return b""
+
+    await _append(client_id, repair, no_first_lines)
+    return len(missing)
+
+
+async def reconcile_manifests() -> dict[str, int]:
+    """
+    Reconcile the manifest of every client with uploaded blobs.
+
+    Lists the audio and metadata prefixes once and repairs each manifest
+    that is missing names or not yet marked complete.
+
+    Returns:
+        Number of names added per client whose manifest was repaired
+    """
+    listed: dict[str, set[str]] = {}
+    for prefix in (UPLOAD_PREFIX, METADATA_PREFIX):
+        for name in await list_blobs_with_prefix(prefix, max_results=sys.maxsize):
+            client_id = name[len(prefix) :].split("/", 1)[0]
+            if "/" in name[len(prefix) :] and client_id != "metadata":
+                listed.setdefault(client_id, set()).add(name)
+
+    repaired: dict[str, int] = {}
+    for client_id, names in sorted(listed.items()):
+        manifest = await load_manifest(client_id)
+        if manifest is not None and manifest.complete and names <= manifest.blob_names:
+            continue
+        repaired[client_id] = await reconcile_manifest(client_id, names)
+        logger.info(
+            f"Reconciled manifest of {client_id}: {repaired[client_id]} names added"
+        )
+    return repaired
@@ -36,6 +36,24 @@ ALLOWED_UPLOAD_AUDIO_EXTENSIONS = frozenset(
 )
 
 
+# Payloads in these formats are already compressed, so HTTP compression would
+# spend CPU without making them meaningfully smaller.
+PRECOMPRESSED_CONTENT_TYPES = frozenset(
+    {
+        "application/gzip",
+        "application/octet-stream",
+        "application/x-gzip",
+        "application/zip",
+        "image/avif",
+        "image/gif",
+        "image/heic",
+        "image/jpeg",
+        "image/png",
+        "image/webp",
+    }
+)
+
+
 def get_content_type_for_filename(filename: str) -> str:
     """Return content type for a media filename, defaulting to binary stream."""
     extension = filename.rsplit(".", 1)[-1].lower()
@@ -45,3 +63,14 @@ def get_content_type_for_filename(filename: str) -> str:
 def is_allowed_upload_audio_extension(extension: str) -> bool:
     """Return True when the extension is allowed for upload endpoints."""
     return extension.lower() in ALLOWED_UPLOAD_AUDIO_EXTENSIONS
+
+
+def is_compressible_content_type(content_type: str | None) -> bool:
+    """Return True when HTTP compression is worthwhile for the content type."""
+    if not content_type:
+        return False
+
+    media_type = content_type.partition(";")[0].strip().lower()
+    if media_type.startswith(("audio/", "video/")):
+        return False
+    return media_type not in PRECOMPRESSED_CONTENT_TYPES
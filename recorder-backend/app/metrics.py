@@ -0,0 +1,374 @@
+"""In-process metrics with Prometheus text exposition and Server-Timing.
+
+Metrics are kept per process in a small registry and rendered on demand by
+the /metrics endpoint. Per-request phase durations (storage calls, theme
+validation, YLE lookups, ...) are also collected into a Server-Timing
+response header so a single slow request can be broken down in the browser.
+"""
+
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from types import TracebackType
+from typing import TypeVar
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LabelValues = tuple[str, ...]
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._lock = Lock()
+
+    def _label_values(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"{self.name} expects labels {self.label_names}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._label_values(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative histogram of observed values per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._label_values(labels), ()))
+
+    def _samples(self) -> list[str]:
+        lines: list[str] = []
+        bucket_names = (*self.label_names, "le")
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for upper, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                labels = _format_labels(bucket_names, (*key, _format_value(upper)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._sums.clear()
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: M) -> M:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route.",
+        ("method", "route", "status"),
+    )
+)
+STORAGE_DURATION = REGISTRY.register(
+    Histogram(
+        "storage_operation_duration_seconds",
+        "Blob storage call latency by operation.",
+        ("operation", "outcome"),
+    )
+)
+STORAGE_BYTES = REGISTRY.register(
+    Counter(
+        "storage_bytes_total",
+        "Bytes moved to or from blob storage by operation.",
+        ("operation", "direction"),
+    )
+)
+CACHE_REQUESTS = REGISTRY.register(
+    Counter(
+        "cache_requests_total",
+        "In-process cache lookups by cache and result.",
+        ("cache", "result"),
+    )
+)
+YLE_DURATION = REGISTRY.register(
+    Histogram(
+        "yle_request_duration_seconds",
+        "YLE API call latency by operation.",
+        ("operation", "outcome"),
+    )
+)
+PHASE_DURATION = REGISTRY.register(
+    Histogram(
+        "request_phase_duration_seconds",
+        "Time spent in CPU-bound request phases such as validation.",
+        ("phase",),
+    )
+)
+
+
+# --- Per-request Server-Timing ---
+
+_server_timing: ContextVar[dict[str, float] | None] = ContextVar(
+    "server_timing", default=None
+)
+
+
+def add_server_timing(phase: str, seconds: float) -> None:
+    """Add time spent in a phase to the current request's Server-Timing."""
+    timings = _server_timing.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+def format_server_timing(timings: dict[str, float]) -> str:
+    """Format phase durations as a Server-Timing header value."""
+    return ", ".join(
+        f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in timings.items()
+    )
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Count one cache lookup as a hit or a miss."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class OperationTimer:
+    """Context manager timing one operation into a histogram and Server-Timing.
+
+    Set ``bytes_in`` / ``bytes_out`` on the instance to count bytes moved
+    when a ``bytes_counter`` is given.
+    """
+
+    def __init__(
+        self,
+        histogram: Histogram,
+        timing_name: str,
+        bytes_counter: Counter | None = None,
+        **labels: str,
+    ) -> None:
+        self.histogram = histogram
+        self.timing_name = timing_name
+        self.bytes_counter = bytes_counter
+        self.labels = labels
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._started = 0.0
+
+    def __enter__(self) -> "OperationTimer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        elapsed = time.perf_counter() - self._started
+        if "outcome" in self.histogram.label_names:
+            outcome = "error" if exc_type is not None else "ok"
+            self.histogram.observe(elapsed, outcome=outcome, **self.labels)
+        else:
+            self.histogram.observe(elapsed, **self.labels)
+        add_server_timing(self.timing_name, elapsed)
+
+        if self.bytes_counter is not None:
+            operation = self.labels.get("operation", self.timing_name)
+            if self.bytes_in:
+                self.bytes_counter.inc(
+                    self.bytes_in, operation=operation, direction="in"
+                )
+            if self.bytes_out:
+                self.bytes_counter.inc(
+                    self.bytes_out, operation=operation, direction="out"
+                )
+
+
+def track_storage(operation: str) -> OperationTimer:
+    """Time one blob storage call, tagged by operation."""
+    return OperationTimer(
+        STORAGE_DURATION, "storage", STORAGE_BYTES, operation=operation
+    )
+
+
+def track_yle(operation: str) -> OperationTimer:
+    """Time one YLE API call, tagged by operation."""
+    return OperationTimer(YLE_DURATION, "yle", operation=operation)
+
+
+def track_phase(phase: str) -> OperationTimer:
+    """Time one CPU-bound phase of request handling."""
+    return OperationTimer(PHASE_DURATION, phase, phase=phase)
+
+
+class MetricsMiddleware:
+    """Record per-route latency and attach a Server-Timing header."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: dict[str, float] = {}
+        token = _server_timing.set(timings)
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings["total"] = time.perf_counter() - started
+                headers = MutableHeaders(raw=message["headers"])
+                headers.append("Server-Timing", format_server_timing(timings))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _server_timing.reset(token)
+            route = scope.get("route")
+            REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
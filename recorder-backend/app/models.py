@@ -5,7 +5,7 @@ Uses discriminated unions to handle the polymorphic Item types.
 """
 
 from typing import Literal, Union, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 # ============================================================================
@@ -300,6 +300,31 @@ class InitUploadResponse(BaseModel):
     presignedUrl: str
 
 
+class InitResumableUploadRequest(InitUploadRequest):
+    """Request body for initializing a resumable, block-by-block upload"""
+
+    size: int = Field(..., gt=0, description="Size of the audio file in bytes")
+
+
+class ResumableUploadStatus(BaseModel):
+    """Progress of a resumable upload and what is left to send"""
+
+    uploadId: str
+    blockUrl: Optional[str] = Field(
+        None,
+        description="SAS URL for Put Block; append &comp=block&blockid=<blockId>. "
+        "None once the upload is committed",
+    )
+    size: int
+    blockSize: int
+    blockIds: list[str] = Field(
+        ..., description="Base64 block IDs; block i holds bytes from i * blockSize"
+    )
+    receivedBlocks: list[int] = Field(..., description="Indexes of staged blocks")
+    missingBlocks: list[int] = Field(..., description="Indexes still to be sent")
+    committed: bool
+
+
 # ============================================================================
 # API Response Wrappers
 # ============================================================================
@@ -324,3 +349,21 @@ class ThemeAvailability(BaseModel):
 
     id: str
     availableLanguages: list[str]
+
+
+class ThemeBundle(BaseModel):
+    """Several language versions of one theme"""
+
+    id: str
+    themes: dict[str, Theme] = Field(..., description="Themes keyed by language")
+    missingLanguages: list[str] = Field(
+        default_factory=list, description="Requested languages that were not found"
+    )
+
+
+# ============================================================================
+# Precompiled Adapters
+# ============================================================================
+
+# Built once at import time so request handlers never pay for schema building.
+THEME_ADAPTER: TypeAdapter[Theme] = TypeAdapter(Theme)
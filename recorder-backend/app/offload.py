@@ -0,0 +1,106 @@
+"""Running CPU-heavy request steps off the event loop.
+
+Validating, rewriting and compressing a large theme takes tens of
+milliseconds. Done on the event loop, that stalls every other request the
+worker is serving, including media streams and uploads. Steps whose input
+is at least ``CPU_OFFLOAD_THRESHOLD_BYTES`` run on a small thread pool
+instead; smaller inputs stay inline, where a thread hand-off would cost
+more than it saves. Compression releases the GIL, so the loop keeps
+serving I/O meanwhile. Validation (pydantic-core) and orjson encoding do
+not: each call holds the GIL until it returns, so the loop can still wait
+for one call, but no longer for the whole chain of steps, and the Python
+rewrite between them yields to the loop at the interpreter's switch
+interval.
+
+The loop lag monitor measures how late the loop wakes up from a short
+sleep, which is the time it was blocked by whatever ran before it.
+"""
+
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from app.metrics import REGISTRY, Counter, Histogram
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CPU_TASKS = REGISTRY.register(
+    Counter(
+        "cpu_tasks_total",
+        "CPU-heavy steps by where they ran (inline on the loop or executor).",
+        ("task", "where"),
+    )
+)
+LOOP_LAG = REGISTRY.register(
+    Histogram(
+        "event_loop_lag_seconds",
+        "How late the event loop woke up from a scheduled sleep.",
+    )
+)
+
+# Lag above this is logged, so single long stalls show up next to requests.
+LOOP_LAG_WARNING_SECONDS = 0.1
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_settings().cpu_executor_workers,
+            thread_name_prefix="cpu",
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Stop the executor's threads after their current tasks."""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_cpu_bound(
+    task: str, size: int, func: Callable[..., T], *args: object
+) -> T:
+    """Run func(*args) inline or on the executor depending on input size.
+
+    The call keeps the caller's context, so Server-Timing phases recorded
+    inside it still land on the current request.
+
+    Args:
+        task: Name used in the cpu_tasks_total metric
+        size: Input size in bytes, compared against the offload threshold
+        func: Synchronous function to run
+        *args: Positional arguments for func
+
+    Returns:
+        What func returned
+    """
+    if size < get_settings().cpu_offload_threshold_bytes:
+        CPU_TASKS.inc(task=task, where="inline")
+        return func(*args)
+
+    CPU_TASKS.inc(task=task, where="executor")
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), context.run, func, *args)
+
+
+async def monitor_loop_lag(interval_seconds: float) -> None:
+    """Record event loop lag every interval until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval_seconds)
+        lag = max(0.0, loop.time() - started - interval_seconds)
+        LOOP_LAG.observe(lag)
+        if lag > LOOP_LAG_WARNING_SECONDS:
+            logger.warning(f"Event loop was blocked for {lag * 1000:.0f}ms")
@@ -0,0 +1,224 @@
+"""Deadlines, retries and hedging for idempotent blob storage reads.
+
+Blob read latency has a long tail: most reads answer in milliseconds, but
+the occasional one stalls for seconds or fails with a transient error.
+Every read goes through read_with_policy(), which
+
+* bounds the whole read, retries included, by a per-operation deadline,
+* gives up on a single attempt after a per-operation attempt timeout
+  (whole-blob downloads and listings get longer ones than small reads),
+* retries transient failures with full-jitter exponential backoff, and
+* optionally starts a second (hedged) request when the first has taken
+  longer than the p95 latency observed for that operation, returning
+  whichever answers first.
+
+Only reads go through here; writes and deletes are not retried.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+from azure.core.exceptions import (
+    AzureError,
+    HttpResponseError,
+    ResourceNotFoundError,
+)
+
+from app.metrics import REGISTRY, Counter
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+READ_RETRIES = REGISTRY.register(
+    Counter(
+        "storage_read_retries_total",
+        "Blob reads retried after a timeout or transient error.",
+        ("operation", "reason"),
+    )
+)
+HEDGED_READS = REGISTRY.register(
+    Counter(
+        "storage_hedged_reads_total",
+        "Blob reads that started a hedged request, by which request answered.",
+        ("operation", "winner"),
+    )
+)
+
+# HTTP statuses worth retrying besides 5xx.
+RETRYABLE_STATUSES = frozenset({408, 429})
+
+
+# --- Observed Latency ---
+
+
+class LatencyWindow:
+    """The most recent successful call durations of one operation."""
+
+    def __init__(self, size: int = 256) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> float:
+        """Return the q-quantile of the window (nearest rank)."""
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_latencies: dict[str, LatencyWindow] = {}
+
+
+def clear_latency_samples() -> None:
+    """Forget observed latencies (used by tests)."""
+    _latencies.clear()
+
+
+def _hedge_delay(operation: str) -> float | None:
+    """Return how long to wait before hedging, or None to never hedge."""
+    settings = get_settings()
+    if not settings.storage_read_hedging:
+        return None
+    window = _latencies.get(operation)
+    if window is None or len(window) < settings.storage_read_hedge_min_samples:
+        return None
+    return window.quantile(0.95)
+
+
+# --- Attempts ---
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Return True for timeouts and transient storage errors."""
+    if isinstance(error, (ResourceNotFoundError, FileNotFoundError)):
+        return False
+    if isinstance(error, TimeoutError):
+        return True
+    if isinstance(error, HttpResponseError):
+        status = error.status_code
+        return status is None or status >= 500 or status in RETRYABLE_STATUSES
+    return isinstance(error, (AzureError, ConnectionError))
+
+
+async def _timed(operation: str, call: Callable[[], Awaitable[T]]) -> T:
+    started = time.perf_counter()
+    result = await call()
+    window = _latencies.get(operation)
+    if window is None:
+        window = _latencies[operation] = LatencyWindow()
+    window.add(time.perf_counter() - started)
+    return result
+
+
+async def _hedged(
+    operation: str, call: Callable[[], Awaitable[T]], hedge_after: float
+) -> T:
+    """Run call(), starting a second one if the first is slower than hedge_after."""
+    primary = asyncio.ensure_future(_timed(operation, call))
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        hedge = asyncio.ensure_future(_timed(operation, call))
+        tasks.append(hedge)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    winner = "primary" if task is primary else "hedge"
+                    HEDGED_READS.inc(operation=operation, winner=winner)
+                    return task.result()
+        # Both requests failed; report the primary's error.
+        return primary.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _attempt(
+    operation: str, call: Callable[[], Awaitable[T]], timeout: float
+) -> T:
+    hedge_after = _hedge_delay(operation)
+    async with asyncio.timeout(timeout):
+        if hedge_after is None or hedge_after >= timeout:
+            return await _timed(operation, call)
+        return await _hedged(operation, call, hedge_after)
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number attempt + 1."""
+    settings = get_settings()
+    ceiling = min(
+        settings.storage_read_backoff_max_seconds,
+        settings.storage_read_backoff_seconds * 2**attempt,
+    )
+    return random.uniform(0, ceiling)
+
+
+async def read_with_policy(operation: str, call: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run one idempotent storage read under its deadline and retry policy.
+
+    Args:
+        operation: Operation label, as used for storage metrics
+        call: Starts the read; called again for every retry or hedge
+
+    Returns:
+        The result of the first successful call
+
+    Raises:
+        TimeoutError: If no call succeeded within the operation's deadline
+        Exception: The last error when it is not transient or retries ran out
+    """
+    settings = get_settings()
+    deadline = settings.storage_read_deadlines.get(
+        operation, settings.storage_read_deadline_seconds
+    )
+    attempt_timeout = settings.storage_read_attempt_timeouts.get(
+        operation, settings.storage_read_attempt_timeout_seconds
+    )
+    loop = asyncio.get_running_loop()
+    expires = loop.time() + deadline
+
+    attempt = 0
+    while True:
+        remaining = expires - loop.time()
+        timeout = min(attempt_timeout, remaining)
+        try:
+            return await _attempt(operation, call, timeout)
+        except Exception as e:
+            if not is_retryable(e) or attempt >= settings.storage_read_retries:
+                raise _deadline_error(operation, deadline, e)
+            delay = _backoff(attempt)
+            if loop.time() + delay >= expires:
+                raise _deadline_error(operation, deadline, e)
+
+            reason = "timeout" if isinstance(e, TimeoutError) else "error"
+            READ_RETRIES.inc(operation=operation, reason=reason)
+            logger.warning(
+                f"Retrying storage {operation} after {reason} "
+                f"(attempt {attempt + 1}): {e!r}"
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def _deadline_error(operation: str, deadline: float, error: Exception) -> Exception:
+    """Give bare attempt timeouts a message naming the operation."""
+    if isinstance(error, TimeoutError) and not str(error):
+        return TimeoutError(f"Storage {operation} timed out (deadline {deadline}s)")
+    return error
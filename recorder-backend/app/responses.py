@@ -0,0 +1,113 @@
+"""Response classes shared by the application and its routers."""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from app.compression import compress_variants, encoded_etag, negotiate_encoding
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def dumps_json(content: Any) -> bytes:
+    """Encode content as compact UTF-8 JSON, using orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the fastest available encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+def make_etag(body: bytes) -> str:
+    """Return a strong ETag derived from the response body."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Return True when an If-None-Match header matches the given ETag."""
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+@dataclass(frozen=True)
+class EncodedJSON:
+    """A JSON response body encoded once, with its ETag and compressed variants."""
+
+    body: bytes
+    etag: str
+    variants: dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def from_bytes(cls, body: bytes) -> "EncodedJSON":
+        """Wrap pre-serialized JSON bytes, compressing them up front."""
+        return cls(body=body, etag=make_etag(body), variants=compress_variants(body))
+
+    def pack(self) -> bytes:
+        """Serialize body, ETag and variants into one byte string."""
+        header = {
+            "etag": self.etag,
+            "sizes": [len(self.body)] + [len(v) for v in self.variants.values()],
+            "encodings": list(self.variants),
+        }
+        return b"\n".join([dumps_json(header), self.body, *self.variants.values()])
+
+    @classmethod
+    def unpack(cls, packed: bytes) -> "EncodedJSON":
+        """Rebuild an instance from the output of pack()."""
+        header_end = packed.index(b"\n")
+        header = json.loads(packed[:header_end])
+        parts = []
+        offset = header_end + 1
+        for size in header["sizes"]:
+            parts.append(packed[offset : offset + size])
+            offset += size + 1
+        if offset - 1 != len(packed):
+            raise ValueError("Packed response has unexpected length")
+        return cls(
+            body=parts[0],
+            etag=header["etag"],
+            variants=dict(zip(header["encodings"], parts[1:])),
+        )
+
+
+def encoded_json_response(encoded: EncodedJSON, request: Request) -> Response:
+    """Serve pre-encoded JSON, honouring If-None-Match and Accept-Encoding."""
+    encoding = negotiate_encoding(
+        request.headers.get("accept-encoding"), encoded.variants
+    )
+    etag = encoded.etag if encoding is None else encoded_etag(encoded.etag, encoding)
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is None:
+        return Response(encoded.body, media_type="application/json", headers=headers)
+
+    headers["Content-Encoding"] = encoding
+    return Response(
+        encoded.variants[encoding], media_type="application/json", headers=headers
+    )
@@ -1,41 +1,293 @@
 """Theme content endpoints."""
 
+import asyncio
 import logging
+import sys
+from typing import Any, Awaitable, Callable, Hashable
+from urllib.parse import unquote
 
-from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from fastapi.responses import Response
 from pydantic import ValidationError
 
-from app.models import Theme, ThemeAvailability
-from app.schedule_processing import pre_process_schedule, map_local_media_url
+from app.cache import CacheLookup, TTLCache, get_or_revalidate
+from app.metrics import record_cache_lookup, track_phase
+from app.models import THEME_ADAPTER, Theme, ThemeAvailability, ThemeBundle
+from app.offload import run_cpu_bound
+from app.responses import EncodedJSON, dumps_json, encoded_json_response
+from app.routers.media import media_read_url
+from app.schedule_processing import UrlRewriteMap, pre_process_schedule
 from app.storage import (
-    load_blob_json,
-    list_blobs_with_prefix,
+    BlobNotFoundError,
+    load_blob_binary,
     build_theme_blob_name,
     list_available_languages_by_id,
     normalize_language_tag,
     StorageError,
 )
+from app.settings import get_settings
+from app.shared_cache import get_shared_cache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+THEME_PREFIX = "theme/"
+MAX_BUNDLE_LANGUAGES = 16
+
+# Expired themes and listings are kept this long to be served while they
+# are refreshed in the background or while storage is failing.
+_STALE_SECONDS = max(
+    get_settings().content_stale_while_revalidate_seconds,
+    get_settings().content_stale_if_error_seconds,
+)
+
+# Final response bodies per (theme ID, language), encoded once per load.
+_theme_cache: TTLCache[tuple[str, str], EncodedJSON] = TTLCache(
+    ttl_seconds=get_settings().theme_cache_ttl_seconds,
+    stale_seconds=_STALE_SECONDS,
+)
+
+# URL rewrites per theme ID, shared by all languages of that theme.
+_url_maps: TTLCache[str, UrlRewriteMap] = TTLCache(
+    ttl_seconds=get_settings().theme_cache_ttl_seconds
+)
+
+# Languages per theme ID from one listing of the theme/ prefix.
+_listing_cache: TTLCache[str, dict[str, list[str]]] = TTLCache(
+    ttl_seconds=get_settings().theme_cache_ttl_seconds,
+    stale_seconds=_STALE_SECONDS,
+)
+
+
+def clear_theme_cache() -> None:
+    """Drop every cached theme response body, URL map and listing."""
+    _theme_cache.clear()
+    _url_maps.clear()
+    _listing_cache.clear()
+
+
+async def _cached_content(
+    cache: TTLCache,
+    key: Hashable,
+    load: Callable[[], Awaitable[Any]],
+    cache_name: str,
+) -> CacheLookup:
+    """Look content up with stale-while-revalidate and stale-if-error.
+
+    Only transient storage failures are covered by a stale copy; content
+    deleted from storage stops being served once its TTL has passed.
+    """
+    settings = get_settings()
+    lookup = await get_or_revalidate(
+        cache,
+        key,
+        load,
+        stale_while_revalidate=settings.content_stale_while_revalidate_seconds,
+        stale_if_error=settings.content_stale_if_error_seconds,
+        errors=(StorageError,),
+        permanent_errors=(BlobNotFoundError,),
+    )
+    record_cache_lookup(cache_name, hit=not lookup.loaded)
+    return lookup
+
+
+def _mark_stale(response: Response, lookup: CacheLookup) -> None:
+    """Flag a response built from a value served past its TTL."""
+    if lookup.stale is None:
+        return
+    response.headers["Age"] = str(int(lookup.age))
+    response.headers["Warning"] = (
+        '110 - "Response is Stale"'
+        if lookup.stale == "revalidating"
+        else '111 - "Revalidation Failed"'
+    )
+
+
+async def _lookup_theme_languages() -> CacheLookup[dict[str, list[str]]]:
+    return await _cached_content(
+        _listing_cache,
+        THEME_PREFIX,
+        # Unbounded: per-theme lookups must see every theme.
+        lambda: list_available_languages_by_id(THEME_PREFIX, max_results=sys.maxsize),
+        "theme_listing",
+    )
+
+
+async def _get_theme_languages() -> dict[str, list[str]]:
+    """Return available languages per theme ID from the cached listing."""
+    return (await _lookup_theme_languages()).value
+
+
+def _url_map_for(theme_id: str) -> UrlRewriteMap:
+    url_map = _url_maps.get(theme_id)
+    if url_map is None:
+        inline = get_settings().media_delivery == "inline"
+        url_map = UrlRewriteMap(media_url=media_read_url if inline else None)
+        _url_maps.set(theme_id, url_map)
+    return url_map
+
+
+def _encode_theme(theme_id: str, data: bytes, url_map: UrlRewriteMap) -> EncodedJSON:
+    """Validate and preprocess raw theme JSON, returning its encoded body."""
+    with track_phase("validate"):
+        # Validate straight from the blob bytes; no intermediate dict tree.
+        theme = THEME_ADAPTER.validate_json(data)
+    theme.id = theme_id
+    with track_phase("preprocess"):
+        theme.mediaState.url = url_map.local_url(theme.mediaState.url)
+        if theme.schedule is not None:
+            theme.schedule = pre_process_schedule(theme.schedule, url_map)
+    with track_phase("encode"):
+        return EncodedJSON.from_bytes(THEME_ADAPTER.dump_json(theme))
+
+
+async def _load_encoded_theme(theme_id: str, lang: str) -> EncodedJSON:
+    """Load one theme from storage and encode it, off the loop when large."""
+    data = await load_blob_binary(build_theme_blob_name(theme_id, lang))
+    # Look the URL map up here: the cache holding it is not thread-safe.
+    url_map = _url_map_for(theme_id)
+    return await run_cpu_bound(
+        "theme_encode", len(data), _encode_theme, theme_id, data, url_map
+    )
+
+
+def _shared_theme_key(theme_id: str, lang: str) -> str:
+    return f"theme:{theme_id}:{lang}"
+
+
+def _get_shared_theme(theme_id: str, lang: str) -> EncodedJSON | None:
+    """Return a theme another worker process encoded, if any."""
+    shared = get_shared_cache()
+    if shared is None:
+        return None
+    packed = shared.get(
+        _shared_theme_key(theme_id, lang),
+        max_age=get_settings().theme_cache_ttl_seconds,
+    )
+    record_cache_lookup("shared_theme", hit=packed is not None)
+    if packed is None:
+        return None
+    try:
+        return EncodedJSON.unpack(packed)
+    except ValueError as e:
+        logger.warning(f"Discarding corrupt shared cache entry {theme_id}/{lang}: {e}")
+        return None
+
+
+async def _fetch_encoded_theme(theme_id: str, lang: str) -> EncodedJSON:
+    """Take a theme from the cache shared with other workers, or load it."""
+    encoded = _get_shared_theme(theme_id, lang)
+    if encoded is None:
+        encoded = await _load_encoded_theme(theme_id, lang)
+        shared = get_shared_cache()
+        if shared is not None:
+            shared.set(_shared_theme_key(theme_id, lang), encoded.pack())
+    return encoded
+
+
+async def _lookup_encoded_theme(theme_id: str, lang: str) -> CacheLookup[EncodedJSON]:
+    """Return the cached encoded theme, loading it on a miss.
+
+    Lookups go to this process's cache, then the cache shared with other
+    worker processes, and only then to storage.
+    """
+    lang = normalize_language_tag(lang)
+    return await _cached_content(
+        _theme_cache,
+        (theme_id, lang),
+        lambda: _fetch_encoded_theme(theme_id, lang),
+        "theme",
+    )
+
+
+async def _get_encoded_theme(theme_id: str, lang: str) -> EncodedJSON:
+    return (await _lookup_encoded_theme(theme_id, lang)).value
+
+
+async def preload_themes(concurrency: int = 16) -> tuple[int, int]:
+    """Load every theme in every language into the cache.
+
+    Returns:
+        Tuple of (loaded, failed) theme/language pairs
+    """
+    langs_by_id = await _get_theme_languages()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def preload(theme_id: str, lang: str) -> None:
+        async with semaphore:
+            await _get_encoded_theme(theme_id, lang)
+
+    results = await asyncio.gather(
+        *(
+            preload(theme_id, lang)
+            for theme_id, langs in langs_by_id.items()
+            for lang in langs
+        ),
+        return_exceptions=True,
+    )
+    failed = 0
+    for result in results:
+        if isinstance(result, BaseException):
+            failed += 1
+            logger.warning(f"Theme preload failed: {result}")
+    return len(results) - failed, failed
+
+
+def invalidate_theme_listing() -> None:
+    """Forget the cached theme listing so the next request lists again."""
+    _listing_cache.invalidate(THEME_PREFIX)
+
+
+async def refresh_theme(theme_id: str, lang: str) -> None:
+    """Drop one cached theme and, if it was cached, load the new version."""
+    lang = normalize_language_tag(lang)
+    cache_key = (theme_id, lang)
+    was_cached = _theme_cache.get_stale(cache_key) is not None
+    _theme_cache.invalidate(cache_key)
+    shared = get_shared_cache()
+    if shared is not None:
+        shared.invalidate(_shared_theme_key(theme_id, lang))
+    if not was_cached:
+        return
+    try:
+        await _get_encoded_theme(theme_id, lang)
+    except (StorageError, ValidationError) as e:
+        logger.warning(f"Could not refresh theme {theme_id}/{lang}: {e}")
+
+
+def referenced_media_files() -> set[str]:
+    """Return local media filenames referenced by the cached themes."""
+    filenames: set[str] = set()
+    for url_map in _url_maps.values():
+        for url in url_map.local.values():
+            if url.startswith("/v1/media/"):
+                filenames.add(unquote(url.removeprefix("/v1/media/")))
+    return filenames
+
+
+def _parse_languages(langs: str) -> list[str]:
+    """Split a comma-separated language list into unique normalized tags."""
+    languages: list[str] = []
+    for lang in langs.split(","):
+        lang = normalize_language_tag(lang)
+        if lang and lang not in languages:
+            languages.append(lang)
+    return languages
+
 
 @router.get("/v1/theme/{theme_id}", response_model=Theme)
 async def load_theme(
+    request: Request,
     theme_id: str = Path(..., description="Theme ID"),
     lang: str = Query(..., description="Language code, for example 'fi' or 'nb'"),
 ):
     """Load a specific theme file for one language."""
-    blob_name = build_theme_blob_name(theme_id, lang)
     try:
-        theme_dict = await load_blob_json(blob_name)
-        theme = Theme(**theme_dict)
-        theme.id = theme_id
-        theme.mediaState.url = map_local_media_url(theme.mediaState.url)
-        if theme.schedule is not None:
-            theme.schedule = pre_process_schedule(theme.schedule)
-        return theme
+        lookup = await _lookup_encoded_theme(theme_id, lang)
+        response = encoded_json_response(lookup.value, request)
+        _mark_stale(response, lookup)
+        return response
     except ValidationError as e:
         logger.error(f"Invalid theme payload for {theme_id}/{lang}: {e}")
         raise HTTPException(status_code=422, detail="Invalid theme payload")
@@ -44,11 +296,76 @@ async def load_theme(
         raise HTTPException(status_code=404, detail="Theme not found")
 
 
+@router.get("/v1/theme/{theme_id}/bundle", response_model=ThemeBundle)
+async def load_theme_bundle(
+    theme_id: str = Path(..., description="Theme ID"),
+    langs: str | None = Query(
+        None,
+        description=(
+            "Comma-separated language codes, for example 'se,sma,smj'. "
+            "Defaults to every available language."
+        ),
+    ),
+):
+    """Load several language versions of one theme in a single response."""
+    try:
+        if langs is None:
+            languages = (await _get_theme_languages()).get(theme_id, [])
+        else:
+            languages = _parse_languages(langs)
+    except StorageError as e:
+        logger.error(f"Error listing languages for theme {theme_id}: {e}")
+        raise HTTPException(status_code=500, detail="Error listing theme languages")
+
+    if not languages:
+        raise HTTPException(status_code=404, detail="Theme not found")
+    if len(languages) > MAX_BUNDLE_LANGUAGES:
+        raise HTTPException(status_code=400, detail="Too many languages requested")
+
+    results = await asyncio.gather(
+        *(_get_encoded_theme(theme_id, lang) for lang in languages),
+        return_exceptions=True,
+    )
+
+    # Splice the cached per-language bodies together instead of re-encoding.
+    parts: list[bytes] = []
+    missing: list[str] = []
+    for lang, result in zip(languages, results):
+        if isinstance(result, EncodedJSON):
+            parts.append(dumps_json(lang) + b":" + result.body)
+        elif isinstance(result, StorageError):
+            logger.error(f"Error loading theme {theme_id}/{lang}: {result}")
+            missing.append(lang)
+        elif isinstance(result, ValidationError):
+            logger.error(f"Invalid theme payload for {theme_id}/{lang}: {result}")
+            raise HTTPException(status_code=422, detail="Invalid theme payload")
+        else:
+            raise result
+
+    if not parts:
+        raise HTTPException(status_code=404, detail="Theme not found")
+
+    body = b"".join(
+        [
+            b'{"id":',
+            dumps_json(theme_id),
+            b',"themes":{',
+            b",".join(parts),
+            b'},"missingLanguages":',
+            dumps_json(missing),
+            b"}",
+        ]
+    )
+    return Response(body, media_type="application/json")
+
+
 @router.get("/v1/theme", response_model=list[ThemeAvailability])
-async def list_themes():
+async def list_themes(response: Response):
     """List all themes with their available languages."""
     try:
-        langs_by_id = await list_available_languages_by_id("theme/")
+        lookup = await _lookup_theme_languages()
+        _mark_stale(response, lookup)
+        langs_by_id = lookup.value
         return [
             ThemeAvailability(id=theme_id, availableLanguages=langs)
             for theme_id, langs in langs_by_id.items()
@@ -59,23 +376,18 @@ async def list_themes():
 
 
 @router.get("/v1/theme/{theme_id}/languages", response_model=ThemeAvailability)
-async def theme_languages(theme_id: str = Path(..., description="Theme ID")):
+async def theme_languages(
+    response: Response, theme_id: str = Path(..., description="Theme ID")
+):
     """Return which languages are available for one theme."""
     try:
-        blob_list = await list_blobs_with_prefix(f"theme/{theme_id}/")
-        prefix = f"theme/{theme_id}/"
-        languages = sorted(
-            {
-                normalize_language_tag(b[len(prefix) :][: -len(".json")])
-                for b in blob_list
-                if b.startswith(prefix)
-                and b.endswith(".json")
-                and "/" not in b[len(prefix) :]
-            }
-        )
-        if not languages:
-            raise HTTPException(status_code=404, detail="Theme not found")
-        return ThemeAvailability(id=theme_id, availableLanguages=languages)
+        lookup = await _lookup_theme_languages()
+        _mark_stale(response, lookup)
+        languages = lookup.value.get(theme_id)
     except StorageError as e:
         logger.error(f"Error listing languages for theme {theme_id}: {e}")
         raise HTTPException(status_code=500, detail="Error listing theme languages")
+
+    if not languages:
+        raise HTTPException(status_code=404, detail="Theme not found")
+    return ThemeAvailability(id=theme_id, availableLanguages=languages)
@@ -0,0 +1,60 @@
+"""Upload target for signed URLs issued by the filesystem storage backend."""
+
+import base64
+import binascii
+import logging
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+
+from app.storage_backends import FilesystemBackend, get_storage_backend
+from app.storage_backends.filesystem import UPLOAD_ROUTE
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.put(
+    f"{UPLOAD_ROUTE}/{{blob_name:path}}", status_code=201, include_in_schema=False
+)
+async def put_local_blob(
+    request: Request,
+    blob_name: str = Path(..., description="Blob path"),
+    se: int = Query(..., description="Expiry as a Unix timestamp"),
+    sig: str = Query(..., description="Upload signature"),
+    comp: Optional[Literal["block"]] = Query(None, description="Put Block"),
+    blockid: Optional[str] = Query(None, description="Base64 block ID"),
+):
+    """Store an uploaded file when running with the filesystem backend.
+
+    Like Azure, ``comp=block&blockid=<id>`` stages one block of a
+    resumable upload instead of writing the whole blob.
+    """
+    backend = get_storage_backend()
+    if not isinstance(backend, FilesystemBackend):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    if not backend.verify_upload_signature(blob_name, se, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+
+    if comp == "block":
+        try:
+            block_id = base64.b64decode(blockid or "", validate=True).decode("utf-8")
+        except (binascii.Error, UnicodeDecodeError):
+            block_id = ""
+        if not block_id:
+            raise HTTPException(status_code=400, detail="Invalid block ID")
+        try:
+            await backend.stage_block(blob_name, block_id, await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid blob name")
+        return {"message": f"Staged block of {blob_name}"}
+
+    try:
+        await backend.upload(blob_name, await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid blob name")
+
+    logger.info(f"Stored local upload {blob_name}")
+    return {"message": f"Stored {blob_name}"}
@@ -1,19 +1,193 @@
 """Media file serving endpoint."""
 
+import asyncio
 import logging
-from io import BytesIO
+import math
+import secrets
+import threading
+from typing import AsyncIterator, Awaitable, Callable
 
 from fastapi import APIRouter, Header, HTTPException, Path
-from fastapi.responses import StreamingResponse
+from fastapi.responses import (
+    FileResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
 
+from app.block_cache import BlockCache
+from app.byte_ranges import (
+    ByteRange,
+    MalformedRangeHeader,
+    RangeNotSatisfiable,
+    multipart_closing,
+    multipart_length,
+    multipart_part_header,
+    parse_range_header,
+)
+from app.cache import TTLCache
 from app.media_types import get_content_type_for_filename
-from app.storage import load_blob_binary, load_blob_binary_range, StorageError
+from app.metrics import record_cache_lookup
+from app.settings import get_settings
+from app.shared_cache import get_shared_cache
+from app.storage import (
+    BlobModifiedError,
+    generate_read_sas_url,
+    load_blob_binary,
+    load_blob_binary_range,
+    local_blob_path,
+    StorageError,
+)
 from app.yle_utils import map_yle_content
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Small, frequently requested media files kept in memory per blob name.
+_media_cache: TTLCache[str, bytes] = TTLCache(
+    ttl_seconds=get_settings().theme_cache_ttl_seconds,
+    max_bytes=get_settings().media_cache_max_bytes,
+)
+
+
+# Aligned blocks of larger media files, for range requests while seeking.
+_block_cache = BlockCache(
+    block_size=get_settings().media_block_size,
+    max_bytes=get_settings().media_block_cache_max_bytes,
+    properties_ttl_seconds=get_settings().theme_cache_ttl_seconds,
+)
+
+# Read-only SAS URLs per blob name, reused until half their lifetime is
+# gone so every URL handed out stays valid for a while. Also filled from
+# the CPU executor while themes are encoded, hence the lock.
+_read_urls: TTLCache[str, str] = TTLCache(
+    ttl_seconds=get_settings().media_read_url_expiry_minutes * 60 / 2
+)
+_read_urls_lock = threading.Lock()
+
+# Resolved YLE stream URLs per program ID.
+_yle_url_cache: TTLCache[str, str] = TTLCache(
+    ttl_seconds=get_settings().yle_url_cache_ttl_seconds
+)
+
+
+def clear_media_cache() -> None:
+    """Drop every cached media file, media block and resolved URL."""
+    _media_cache.clear()
+    _block_cache.clear()
+    with _read_urls_lock:
+        _read_urls.clear()
+    _yle_url_cache.clear()
+
+
+def invalidate_media(blob_name: str) -> None:
+    """Drop one cached media file."""
+    _media_cache.invalidate(blob_name)
+    _block_cache.invalidate(blob_name)
+
+
+def _read_url_expiry_minutes() -> int:
+    """Lifetime of newly signed read URLs.
+
+    In inline mode the URLs end up in theme bodies, which are cached for
+    the theme TTL in the shared cache, again for the TTL in each worker and
+    then served stale for up to the stale window. URLs are signed to
+    outlive all of that by the configured expiry.
+    """
+    settings = get_settings()
+    minutes = settings.media_read_url_expiry_minutes
+    if settings.media_delivery == "inline":
+        stale_seconds = max(
+            settings.content_stale_while_revalidate_seconds,
+            settings.content_stale_if_error_seconds,
+        )
+        body_seconds = 2 * settings.theme_cache_ttl_seconds + stale_seconds
+        minutes += math.ceil(body_seconds / 60)
+    return minutes
+
+
+def media_read_url(filename: str) -> str | None:
+    """Return a cached direct read URL for a media file.
+
+    Returns None when the storage backend has no direct URLs or signing
+    fails, in which case the media route should be used.
+    """
+    if "/" in filename or filename.startswith(".."):
+        return None
+    blob_name = f"media/{filename}"
+    with _read_urls_lock:
+        url = _read_urls.get(blob_name)
+    if url is not None:
+        return url
+
+    try:
+        url = generate_read_sas_url(
+            blob_name, expiry_minutes=_read_url_expiry_minutes()
+        )
+    except StorageError:
+        return None
+    if url is not None:
+        with _read_urls_lock:
+            _read_urls.set(blob_name, url)
+    return url
+
+
+async def preload_media(filenames: set[str], max_file_bytes: int) -> int:
+    """Load media files no larger than max_file_bytes into the memory cache.
+
+    Returns:
+        Number of files cached
+    """
+    cached = 0
+    for filename in sorted(filenames):
+        blob_name = f"media/{filename}"
+        if local_blob_path(blob_name) is not None or _media_cache.get(blob_name):
+            continue
+        try:
+            # One ranged read tells the size and, for small files, the content.
+            content, total_size = await load_blob_binary_range(
+                blob_name, offset=0, length=max_file_bytes
+            )
+        except StorageError as e:
+            logger.warning(f"Media preload failed for {filename}: {e}")
+            continue
+        if total_size <= max_file_bytes:
+            _media_cache.set(blob_name, content)
+            cached += 1
+    return cached
+
+
+async def _resolve_yle_url(yle_program_id: str) -> str:
+    """Map a YLE program ID to its stream URL, caching the result.
+
+    Resolution costs two YLE API calls, so results are kept in this process
+    and in the cache shared with other worker processes.
+    """
+    media_url = _yle_url_cache.get(yle_program_id)
+    record_cache_lookup("yle_url", hit=media_url is not None)
+    if media_url is not None:
+        return media_url
+
+    shared = get_shared_cache()
+    shared_key = f"yle:{yle_program_id}"
+    ttl = get_settings().yle_url_cache_ttl_seconds
+    if shared is not None:
+        stored = shared.get(shared_key, max_age=ttl)
+        record_cache_lookup("shared_yle_url", hit=stored is not None)
+        if stored is not None:
+            media_url = stored.decode("utf-8")
+            _yle_url_cache.set(yle_program_id, media_url)
+            return media_url
+
+    # The YLE client makes blocking HTTP calls; keep them off the event loop.
+    media_url = await asyncio.to_thread(map_yle_content, yle_program_id)
+    _yle_url_cache.set(yle_program_id, media_url)
+    if shared is not None:
+        shared.set(shared_key, media_url.encode("utf-8"))
+    return media_url
+
 
 @router.get("/v1/yle-media/{yle_program_id}")
 async def get_yle_media(
@@ -24,7 +198,7 @@ async def get_yle_media(
 
     This endpoint is used for YleAudioMediaItem and YleVideoMediaItem types.
     """
-    return map_yle_content(yle_program_id)
+    return await _resolve_yle_url(yle_program_id)
 
 
 @router.get("/v1/media/v1/yle-media/{yle_program_id}")
@@ -32,7 +206,127 @@ async def get_yle_media_compat(
     yle_program_id: str = Path(..., description="YLE program ID (e.g., 1-50525858)"),
 ):
     """Backward-compatible alias for clients that prepend /v1/media to YLE URLs."""
-    return map_yle_content(yle_program_id)
+    return await _resolve_yle_url(yle_program_id)
+
+
+# A chunk of a ranged response: inclusive start and end, and whether it may
+# go through the block cache.
+Chunk = tuple[int, int, bool]
+
+
+async def _load_range(
+    blob_name: str, start: int, end: int, etag: str, cacheable: bool
+) -> bytes:
+    """Load bytes start..end (inclusive) of the blob version with this ETag.
+
+    Cacheable ranges go through the block cache; others are read directly
+    so one large response does not evict the blocks of everyone seeking.
+    """
+    if cacheable:
+        return await _block_cache.read(blob_name, start, end)
+    try:
+        content, _ = await load_blob_binary_range(
+            blob_name, offset=start, length=end - start + 1, etag=etag
+        )
+    except BlobModifiedError:
+        _block_cache.invalidate(blob_name)
+        raise
+    return content
+
+
+def _chunks(byte_range: ByteRange, chunk_size: int, cacheable: bool) -> list[Chunk]:
+    """Split a range at multiples of chunk_size, so large ranges are streamed."""
+    start, end = byte_range
+    chunks = []
+    while start <= end:
+        chunk_end = min(end, (start // chunk_size + 1) * chunk_size - 1)
+        chunks.append((start, chunk_end, cacheable))
+        start = chunk_end + 1
+    return chunks
+
+
+async def _stream_pieces(
+    pieces: list[bytes | Chunk],
+    read: Callable[[Chunk], Awaitable[bytes]],
+    first: asyncio.Future,
+) -> AsyncIterator[bytes]:
+    """Yield literal pieces as they are and chunks as read, in order.
+
+    first is the read of the first chunk, already started. Each following
+    chunk is read while the one before it is sent, so at most two chunks
+    are held in memory at a time.
+    """
+    upcoming = iter([piece for piece in pieces if not isinstance(piece, bytes)][1:])
+    ahead: asyncio.Future | None = first
+    try:
+        for piece in pieces:
+            if isinstance(piece, bytes):
+                yield piece
+                continue
+            content = await ahead
+            following = next(upcoming, None)
+            ahead = (
+                None if following is None else asyncio.ensure_future(read(following))
+            )
+            yield content
+    finally:
+        if ahead is not None:
+            ahead.cancel()
+
+
+async def _ranged_response(
+    ranges: list[ByteRange],
+    read: Callable[[Chunk], Awaitable[bytes]],
+    cacheable: Callable[[ByteRange], bool],
+    total_size: int,
+    content_type: str,
+    headers: dict[str, str],
+) -> StreamingResponse:
+    """Stream one range, or several as multipart/byteranges, with a 206.
+
+    The first chunk is read before the response is returned, so a missing
+    or changed blob is still reported with an error status rather than as
+    a response cut off after its headers were sent.
+    """
+    chunk_size = _block_cache.block_size
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        pieces: list[bytes | Chunk] = _chunks(
+            ranges[0], chunk_size, cacheable(ranges[0])
+        )
+        media_type = content_type
+        headers = {
+            **headers,
+            "Content-Range": f"bytes {start}-{end}/{total_size}",
+            "Content-Length": str(end - start + 1),
+        }
+    else:
+        boundary = secrets.token_hex(13)
+        pieces = []
+        for byte_range in ranges:
+            pieces.append(
+                multipart_part_header(boundary, content_type, byte_range, total_size)
+            )
+            pieces.extend(_chunks(byte_range, chunk_size, cacheable(byte_range)))
+            pieces.append(b"\r\n")
+        pieces.append(multipart_closing(boundary))
+        media_type = f"multipart/byteranges; boundary={boundary}"
+        headers = {
+            **headers,
+            "Content-Length": str(
+                multipart_length(boundary, content_type, ranges, total_size)
+            ),
+        }
+
+    first_chunk = next(piece for piece in pieces if not isinstance(piece, bytes))
+    first = asyncio.ensure_future(read(first_chunk))
+    await first
+    return StreamingResponse(
+        _stream_pieces(pieces, read, first),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+    )
 
 
 @router.get("/v1/media/{filename}")
@@ -43,9 +337,13 @@ async def serve_media(
     """
     Serve media files (audio/video/images) for playback in the client app.
 
-    Supports HTTP range requests for streaming and seeking.
+    Supports HTTP range requests for streaming and seeking, including
+    multi-range requests answered as multipart/byteranges.
     Required for AVPlayer on iOS/macOS.
 
+    With MEDIA_DELIVERY set to redirect or inline, blob media is not proxied:
+    the response is a 302 to a short-lived read-only SAS URL instead.
+
     For YLE media, use the /v1/yle-media/{yle_program_id} endpoint instead.
     """
     if "/" in filename or filename.startswith(".."):
@@ -54,50 +352,74 @@ async def serve_media(
     blob_name = f"media/{filename}"
     content_type = get_content_type_for_filename(filename)
 
+    # Local files go to the server as-is (sendfile where supported), which
+    # also handles Range and conditional requests.
+    local_path = local_blob_path(blob_name)
+    if local_path is not None:
+        return FileResponse(
+            local_path,
+            media_type=content_type,
+            filename=filename,
+            content_disposition_type="inline",
+        )
+
+    if get_settings().media_delivery != "proxy":
+        read_url = media_read_url(filename)
+        if read_url is not None:
+            return RedirectResponse(read_url, status_code=302)
+
+    cached = _media_cache.get(blob_name)
+    record_cache_lookup("media", hit=cached is not None)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"inline; filename={filename}",
+    }
+
     try:
         if range:
+            if cached is not None:
+                total_size, etag = len(cached), ""
+            else:
+                total_size, etag = await _block_cache.properties(blob_name)
             try:
-                range_str = range.replace("bytes=", "")
-                if "-" in range_str:
-                    start_str, end_str = range_str.split("-", 1)
-                    start = int(start_str) if start_str else 0
-                    end = int(end_str) if end_str else None
-                else:
-                    start = int(range_str)
-                    end = None
-
-                content, total_size = await load_blob_binary_range(
-                    blob_name,
-                    offset=start,
-                    length=(end - start + 1) if end else None,
+                ranges = parse_range_header(range, total_size)
+            except MalformedRangeHeader as e:
+                return PlainTextResponse(str(e), status_code=400)
+            except RangeNotSatisfiable:
+                return Response(
+                    status_code=416,
+                    headers={**headers, "Content-Range": f"bytes */{total_size}"},
                 )
-                actual_end = start + len(content) - 1
-
-                return StreamingResponse(
-                    BytesIO(content),
-                    status_code=206,
-                    media_type=content_type,
-                    headers={
-                        "Content-Length": str(len(content)),
-                        "Content-Range": f"bytes {start}-{actual_end}/{total_size}",
-                        "Accept-Ranges": "bytes",
-                        "Content-Disposition": f"inline; filename={filename}",
-                    },
-                )
-            except (ValueError, AttributeError):
-                pass  # Fall through to full-file response.
 
-        content = await load_blob_binary(blob_name)
-        return StreamingResponse(
-            BytesIO(content),
-            media_type=content_type,
-            headers={
-                "Content-Length": str(len(content)),
-                "Accept-Ranges": "bytes",
-                "Content-Disposition": f"inline; filename={filename}",
-            },
-        )
+            async def read(chunk: Chunk) -> bytes:
+                start, end, cacheable = chunk
+                if cached is not None:
+                    return cached[start : end + 1]
+                return await _load_range(blob_name, start, end, etag, cacheable)
+
+            def cacheable(byte_range: ByteRange) -> bool:
+                return _block_cache.can_serve(byte_range[1] - byte_range[0] + 1)
 
+            return await _ranged_response(
+                ranges, read, cacheable, total_size, content_type, headers
+            )
+
+        if cached is not None:
+            content = cached
+        else:
+            content = await load_blob_binary(blob_name)
+            if len(content) <= get_settings().media_cache_max_file_bytes:
+                _media_cache.set(blob_name, content)
+
+        return Response(content, media_type=content_type, headers=headers)
+
+    except BlobModifiedError:
+        # The response was sized for the old version; let the client ask again.
+        raise HTTPException(
+            status_code=503,
+            detail="Media file changed during the request",
+            headers={"Retry-After": "1"},
+        )
     except StorageError:
         raise HTTPException(status_code=404, detail="Media file not found")
     except Exception as e:
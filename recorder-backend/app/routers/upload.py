@@ -1,14 +1,40 @@
 """Upload initialisation and recording deletion endpoints."""
 
+import asyncio
+import base64
+import hashlib
+import json
 import logging
+import math
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Path
+from fastapi import APIRouter, Header, HTTPException, Path, Response
+from fastapi.responses import StreamingResponse
 
+from app.cache import TTLCache
+from app.export import export_blob_names, stream_client_archive
+from app.manifests import RESUMABLE_UPLOAD_PREFIX, delete_client_blobs, record_upload
 from app.media_types import is_allowed_upload_audio_extension
-from app.models import InitUploadRequest, InitUploadResponse
+from app.models import (
+    InitResumableUploadRequest,
+    InitUploadRequest,
+    InitUploadResponse,
+    ResumableUploadStatus,
+)
+from app.metrics import record_cache_lookup
+from app.settings import get_settings
+from app.shared_cache import get_shared_cache
+from app.single_flight import SingleFlight
 from app.storage import (
-    delete_by_prefix,
+    BlobNotFoundError,
+    commit_staged_blocks,
     generate_upload_sas_url,
+    get_blob_properties,
+    list_staged_blocks,
+    load_blob_json,
     store_metadata,
     StorageError,
 )
@@ -18,15 +44,56 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Azure allows at most this many blocks in one block blob.
+MAX_BLOCKS = 50_000
 
-@router.post("/v1/upload", response_model=InitUploadResponse)
-async def init_upload(request: InitUploadRequest):
+# Longest Idempotency-Key accepted.
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Lifetime of the upload URL returned by POST /v1/upload.
+UPLOAD_URL_EXPIRY_MINUTES = 6
+
+# How long a duplicate waits for another worker's request with the same
+# Idempotency-Key to finish, and how often it checks.
+IDEMPOTENCY_WAIT_SECONDS = 10.0
+IDEMPOTENCY_POLL_SECONDS = 0.05
+
+# A reservation left behind by a worker that died is ignored after this long.
+IDEMPOTENCY_PENDING_SECONDS = 60.0
+
+# Recent upload initialisations by idempotency key, stored as JSON with the
+# blob they created and a fingerprint of the request they answered.
+_upload_responses: TTLCache[str, bytes] = TTLCache(
+    ttl_seconds=get_settings().idempotency_ttl_seconds,
+    max_entries=get_settings().idempotency_max_entries,
+)
+
+
+def clear_upload_responses() -> None:
+    """Forget remembered upload responses (used by tests)."""
+    _upload_responses.clear()
+
+
+# Upload initialisations in flight in this process, by idempotency key.
+_upload_inits = SingleFlight()
+
+
+async def _store_upload_metadata(
+    request: InitUploadRequest, extra_blob_names: tuple[str, ...] = ()
+) -> str:
     """
-    Initialize an upload by storing metadata and generating a SAS URL.
+    Validate an upload request, record it in the client's manifest and
+    store its metadata.
 
-    1. Validates the filename and metadata
-    2. Stores metadata as JSON in Azure Blob Storage
-    3. Returns a SAS URL for the client to upload the audio file directly
+    Args:
+        request: The upload request
+        extra_blob_names: Other blobs the upload will create
+
+    Returns:
+        The blob name the audio file is to be uploaded to
+
+    Raises:
+        HTTPException: 400 for invalid requests, 500 if storing fails
     """
     filename = request.filename
     metadata = request.metadata
@@ -55,7 +122,13 @@ async def init_upload(request: InitUploadRequest):
         f"uploads/audio_and_metadata/metadata/{storage_prefix}{file_prefix}.json"
     )
 
+    audio_blob_name = f"uploads/audio_and_metadata/{storage_prefix}{filename}"
+
     try:
+        # Recorded before any blob is written, so deletion never misses one.
+        await record_upload(
+            metadata.clientId, [metadata_blob_name, audio_blob_name, *extra_blob_names]
+        )
         metadata_dict = metadata.model_dump(exclude_none=True)
         await store_metadata(metadata_blob_name, metadata_dict)
         logger.info(f"Stored metadata for client {metadata.clientId}")
@@ -63,29 +136,368 @@ async def init_upload(request: InitUploadRequest):
         logger.error(f"Error storing metadata: {e}")
         raise HTTPException(status_code=500, detail="Error storing metadata")
 
-    audio_blob_name = f"uploads/audio_and_metadata/{storage_prefix}{filename}"
+    return audio_blob_name
+
+
+# --- Idempotency ---
+
+
+def _idempotency_key(
+    request: InitUploadRequest, header: Optional[str]
+) -> Optional[str]:
+    """Return the cache key for a request, or None if it has no key.
+
+    Keys are scoped to the client so two clients cannot collide.
+    """
+    key = header or request.metadata.recordingId
+    if not key:
+        return None
+    if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+    return f"upload:{request.metadata.clientId}:{key}"
+
+
+def _fingerprint(request: InitUploadRequest) -> str:
+    return hashlib.sha256(request.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def _remembered_response(key: str) -> Optional[dict]:
+    """Look a finished initialisation up in this process, then in the shared cache."""
+    stored = _upload_responses.get(key)
+    record_cache_lookup("upload_idempotency", hit=stored is not None)
+    if stored is None:
+        shared = get_shared_cache()
+        if shared is not None:
+            stored = shared.get(
+                f"upload-init:{key}", max_age=get_settings().idempotency_ttl_seconds
+            )
+            record_cache_lookup("shared_upload_idempotency", hit=stored is not None)
+            if stored is not None:
+                _upload_responses.set(key, stored)
+    return None if stored is None else json.loads(stored)
+
+
+def _remember_response(key: str, record: dict) -> None:
+    stored = json.dumps(record).encode("utf-8")
+    _upload_responses.set(key, stored)
+    shared = get_shared_cache()
+    if shared is not None:
+        shared.set(f"upload-init:{key}", stored)
+
+
+async def _initialise_once(
+    key: str, fingerprint: str, request: InitUploadRequest
+) -> tuple[dict, bool]:
+    """Store the upload's metadata unless another worker is already doing so.
+
+    A pending marker in the shared cache reserves the key across worker
+    processes. A duplicate that finds the marker waits for the first
+    request's record instead of storing the metadata a second time.
+
+    Returns:
+        The remembered record, and whether it came from an earlier request
+    """
+    shared = get_shared_cache()
+    pending_key = f"upload-init-pending:{key}"
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while shared is not None and not shared.add(
+        pending_key, b"", max_age=IDEMPOTENCY_PENDING_SECONDS
+    ):
+        remembered = _remembered_response(key)
+        if remembered is not None:
+            return remembered, True
+        if time.monotonic() > deadline:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is in progress",
+            )
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+    try:
+        # Another worker may have finished between the lookup and the reservation.
+        remembered = _remembered_response(key)
+        if remembered is not None:
+            return remembered, True
+        record = {
+            "fingerprint": fingerprint,
+            "blobName": await _store_upload_metadata(request),
+        }
+        _remember_response(key, record)
+        return record, False
+    finally:
+        if shared is not None:
+            shared.invalidate(pending_key)
 
+
+async def _upload_url(blob_name: str, content_type: Optional[str]) -> str:
     try:
-        sas_url = await generate_upload_sas_url(
-            blob_name=audio_blob_name,
-            content_type=metadata.contentType,
-            expiry_minutes=6,
+        return await generate_upload_sas_url(
+            blob_name=blob_name,
+            content_type=content_type,
+            expiry_minutes=UPLOAD_URL_EXPIRY_MINUTES,
         )
-        return InitUploadResponse(presignedUrl=sas_url)
     except StorageError as e:
         logger.error(f"Error generating SAS URL: {e}")
         raise HTTPException(status_code=500, detail="Error generating upload URL")
 
 
+@router.post("/v1/upload", response_model=InitUploadResponse)
+async def init_upload(
+    request: InitUploadRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Initialize an upload by storing metadata and generating a SAS URL.
+
+    1. Validates the filename and metadata
+    2. Stores metadata as JSON in Azure Blob Storage
+    3. Returns a SAS URL for the client to upload the audio file directly
+
+    Retries carrying the same Idempotency-Key (by default the recordingId)
+    within IDEMPOTENCY_TTL_SECONDS reuse the original upload without storing
+    the metadata again; a duplicate arriving while the first request is
+    still running waits for it. Each response carries a freshly signed URL,
+    so a replay never hands out one that is about to expire. Reusing a key
+    for a different request is a 422.
+    """
+    key = _idempotency_key(request, idempotency_key)
+    fingerprint = _fingerprint(request)
+    if key is None:
+        blob_name = await _store_upload_metadata(request)
+    else:
+        record = _remembered_response(key)
+        replayed = record is not None
+        if record is None:
+            led = []
+
+            async def initialise() -> tuple[dict, bool]:
+                led.append(True)
+                return await _initialise_once(key, fingerprint, request)
+
+            record, replayed = await _upload_inits.run(key, "init_upload", initialise)
+            # Callers that joined another caller's initialisation are replays too.
+            replayed = replayed or not led
+        if record["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used for another request",
+            )
+        if replayed:
+            response.headers["Idempotency-Replayed"] = "true"
+        blob_name = record["blobName"]
+
+    sas_url = await _upload_url(blob_name, request.metadata.contentType)
+    return InitUploadResponse(presignedUrl=sas_url)
+
+
+# --- Resumable Uploads ---
+
+
+def _block_id(index: int) -> str:
+    """Return the block ID of one block; IDs of a blob must all be equal length."""
+    return f"{index:06d}"
+
+
+def _block_length(upload: dict, index: int) -> int:
+    return min(upload["blockSize"], upload["size"] - index * upload["blockSize"])
+
+
+async def _load_upload(upload_id: str) -> dict:
+    if not validate_uuid_v4(upload_id):
+        raise HTTPException(status_code=400, detail="Invalid uploadId")
+    try:
+        return await load_blob_json(f"{RESUMABLE_UPLOAD_PREFIX}{upload_id}.json")
+    except BlobNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except StorageError as e:
+        logger.error(f"Error loading resumable upload {upload_id}: {e}")
+        raise HTTPException(status_code=500, detail="Error reading upload")
+
+
+async def _blob_committed(upload: dict) -> bool:
+    """Return True if the upload's blob exists with its full size."""
+    try:
+        size, _ = await get_blob_properties(upload["blobName"])
+    except BlobNotFoundError:
+        return False
+    return size == upload["size"]
+
+
+async def _upload_status(upload_id: str, upload: dict) -> ResumableUploadStatus:
+    """Compare the staged blocks against the plan and issue a fresh block URL.
+
+    No block URL is issued once the upload is committed.
+
+    Sets ``upload["committed"]`` when the blocks turn out to be committed
+    although the upload record does not say so yet.
+    """
+    block_count = math.ceil(upload["size"] / upload["blockSize"])
+    if upload.get("committed"):
+        received = list(range(block_count))
+    else:
+        staged = await list_staged_blocks(upload["blobName"])
+        received = [
+            index
+            for index in range(block_count)
+            if staged.get(_block_id(index)) == _block_length(upload, index)
+        ]
+        # Committing discards the staged blocks, so a completion that failed
+        # after the commit leaves none behind.
+        if len(received) < block_count and await _blob_committed(upload):
+            upload["committed"] = True
+            received = list(range(block_count))
+    received_set = set(received)
+
+    # A committed recording must not be writable by whoever has the ID.
+    block_url = None
+    if not upload.get("committed"):
+        block_url = await generate_upload_sas_url(
+            blob_name=upload["blobName"],
+            content_type=upload.get("contentType"),
+            expiry_minutes=get_settings().resumable_upload_url_expiry_minutes,
+        )
+    return ResumableUploadStatus(
+        uploadId=upload_id,
+        blockUrl=block_url,
+        size=upload["size"],
+        blockSize=upload["blockSize"],
+        blockIds=[
+            base64.b64encode(_block_id(index).encode("utf-8")).decode("ascii")
+            for index in range(block_count)
+        ],
+        receivedBlocks=received,
+        missingBlocks=[i for i in range(block_count) if i not in received_set],
+        committed=bool(upload.get("committed")),
+    )
+
+
+@router.post("/v1/upload/resumable", response_model=ResumableUploadStatus)
+async def init_resumable_upload(request: InitResumableUploadRequest):
+    """
+    Initialize an upload that is sent block by block and can be resumed.
+
+    The client PUTs each block to ``blockUrl`` with ``comp=block`` and the
+    block's ID (Azure Put Block), in any order and over as many connections
+    and sessions as it needs, checks progress with
+    ``GET /v1/upload/{uploadId}`` and finally calls
+    ``POST /v1/upload/{uploadId}/complete``.
+    """
+    block_size = get_settings().resumable_upload_block_size
+    if math.ceil(request.size / block_size) > MAX_BLOCKS:
+        raise HTTPException(status_code=400, detail="File is too large")
+
+    upload_id = str(uuid.uuid4())
+    upload_blob_name = f"{RESUMABLE_UPLOAD_PREFIX}{upload_id}.json"
+    audio_blob_name = await _store_upload_metadata(request, (upload_blob_name,))
+    upload = {
+        "blobName": audio_blob_name,
+        "clientId": request.metadata.clientId,
+        "contentType": request.metadata.contentType,
+        "size": request.size,
+        "blockSize": block_size,
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+    }
+
+    try:
+        await store_metadata(upload_blob_name, upload)
+        return await _upload_status(upload_id, upload)
+    except StorageError as e:
+        logger.error(f"Error starting resumable upload: {e}")
+        raise HTTPException(status_code=500, detail="Error starting upload")
+
+
+@router.get("/v1/upload/{upload_id}", response_model=ResumableUploadStatus)
+async def resumable_upload_status(
+    upload_id: str = Path(..., description="Upload UUID"),
+):
+    """Report which blocks of a resumable upload have arrived."""
+    upload = await _load_upload(upload_id)
+    try:
+        return await _upload_status(upload_id, upload)
+    except StorageError as e:
+        logger.error(f"Error reading resumable upload {upload_id}: {e}")
+        raise HTTPException(status_code=500, detail="Error reading upload status")
+
+
+@router.post("/v1/upload/{upload_id}/complete", response_model=ResumableUploadStatus)
+async def complete_resumable_upload(
+    upload_id: str = Path(..., description="Upload UUID"),
+):
+    """Commit the staged blocks as the audio file (Azure Put Block List).
+
+    Answers 409 with the missing block indexes if some have not arrived.
+    Completing an already completed upload is a no-op.
+    """
+    upload = await _load_upload(upload_id)
+    recorded = bool(upload.get("committed"))
+    try:
+        status = await _upload_status(upload_id, upload)
+        if status.committed:
+            if not recorded:
+                # An earlier completion committed but failed to record it.
+                await store_metadata(
+                    f"{RESUMABLE_UPLOAD_PREFIX}{upload_id}.json", upload
+                )
+            return status
+        if status.missingBlocks:
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "message": "Upload is missing blocks",
+                    "missingBlocks": status.missingBlocks,
+                },
+            )
+
+        block_count = len(status.blockIds)
+        await commit_staged_blocks(
+            upload["blobName"],
+            [_block_id(index) for index in range(block_count)],
+            content_type=upload.get("contentType"),
+        )
+        upload["committed"] = True
+        await store_metadata(f"{RESUMABLE_UPLOAD_PREFIX}{upload_id}.json", upload)
+        logger.info(f"Completed resumable upload {upload_id}")
+        return status.model_copy(update={"committed": True, "blockUrl": None})
+    except StorageError as e:
+        logger.error(f"Error completing resumable upload {upload_id}: {e}")
+        raise HTTPException(status_code=500, detail="Error completing upload")
+
+
+@router.get("/v1/recordings/{client_id}/export")
+async def export_by_client_id(client_id: str = Path(..., description="Client UUID")):
+    """Stream all recordings and metadata of a client ID as a ZIP archive."""
+    if not validate_uuid_v4(client_id):
+        raise HTTPException(status_code=400, detail="Invalid clientId")
+
+    try:
+        blob_names = await export_blob_names(client_id)
+    except StorageError as e:
+        logger.error(f"Error listing data to export: {e}")
+        raise HTTPException(status_code=500, detail="Error exporting data")
+    if not blob_names:
+        raise HTTPException(status_code=404, detail="No data found for client")
+
+    logger.info(f"Exporting {len(blob_names)} blobs for client {client_id}")
+    return StreamingResponse(
+        stream_client_archive(blob_names),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="recordings-{client_id}.zip"'
+            )
+        },
+    )
+
+
 @router.delete("/v1/recordings/{client_id}")
 async def delete_by_client_id(client_id: str = Path(..., description="Client UUID")):
-    """Delete all recordings for a given client ID."""
+    """Delete all recordings, metadata and upload records of a client ID."""
     if not validate_uuid_v4(client_id):
         raise HTTPException(status_code=400, detail="Invalid clientId")
 
-    prefix = f"uploads/audio_and_metadata/{client_id}/"
     try:
-        await delete_by_prefix(prefix)
+        await delete_client_blobs(client_id)
         return {"message": f"Deleted all data for client {client_id}"}
     except StorageError as e:
         logger.error(f"Error deleting by client ID: {e}")
@@ -101,9 +513,8 @@ async def delete_by_session_id(
     if not validate_uuid_v4(client_id) or not validate_uuid_v4(session_id):
         raise HTTPException(status_code=400, detail="Invalid clientId or sessionId")
 
-    prefix = f"uploads/audio_and_metadata/{client_id}/{session_id}/"
     try:
-        await delete_by_prefix(prefix)
+        await delete_client_blobs(client_id, session_id)
         return {"message": f"Deleted all data for session {session_id}"}
     except StorageError as e:
         logger.error(f"Error deleting by session ID: {e}")
@@ -122,9 +533,8 @@ async def delete_by_recording_id(
             status_code=400, detail="Invalid clientId, sessionId, or recordingId"
         )
 
-    prefix = f"uploads/audio_and_metadata/{client_id}/{session_id}/{recording_id}"
     try:
-        await delete_by_prefix(prefix)
+        await delete_client_blobs(client_id, session_id, recording_id)
         return {"message": f"Deleted recording {recording_id}"}
     except StorageError as e:
         logger.error(f"Error deleting recording: {e}")
@@ -1,22 +1,46 @@
 """Schedule preprocessing helpers."""
 
 import logging
-from urllib.parse import quote
+from dataclasses import dataclass, field
+from typing import Callable
+from urllib.parse import quote, unquote
 
-from app.models import Schedule, ScheduleItem, YleAudioMediaItem, YleVideoMediaItem
+from app.models import Schedule, YleAudioMediaItem, YleVideoMediaItem
 
 logger = logging.getLogger(__name__)
 
+# Item types whose state URLs are YLE program IDs rather than media filenames.
+_YLE_ITEM_TYPES: frozenset[type] = frozenset({YleAudioMediaItem, YleVideoMediaItem})
+
+_STATE_ATTRS = ("start", "recording", "finish")
+
+MEDIA_ROUTE = "/v1/media/"
+
+# Per item type: whether it is a YLE item and which state fields it declares.
+_item_plans: dict[type, tuple[bool, tuple[str, ...]]] = {}
+
+
+def _item_plan(item_type: type) -> tuple[bool, tuple[str, ...]]:
+    """Return (is_yle, state_attrs) for an item type, computed once per type."""
+    plan = _item_plans.get(item_type)
+    if plan is None:
+        fields = getattr(item_type, "model_fields", {})
+        plan = _item_plans[item_type] = (
+            item_type in _YLE_ITEM_TYPES,
+            tuple(attr for attr in _STATE_ATTRS if attr in fields),
+        )
+    return plan
+
 
 def map_local_media_url(url: str | None) -> str | None:
     """Map local media filenames to the media-serving route."""
     if not url:
         return url
 
-    if url.startswith(("http://", "https://", "/v1/media/", "/v1/yle-media/")):
+    if url.startswith(("http://", "https://", MEDIA_ROUTE, "/v1/yle-media/")):
         return url
 
-    return f"/v1/media/{quote(url, safe='')}"
+    return f"{MEDIA_ROUTE}{quote(url, safe='')}"
 
 
 def map_yle_program_url(url: str | None) -> str | None:
@@ -30,43 +54,68 @@ def map_yle_program_url(url: str | None) -> str | None:
     return f"/v1/yle-media/{quote(url, safe='')}"
 
 
-def _map_yle_urls_in_states(
-    item: YleAudioMediaItem | YleVideoMediaItem,
-) -> None:
-    """Map YLE program IDs in media-state URLs to lazy endpoint URLs."""
-    for state_attr in ("start", "recording", "finish"):
-        state = getattr(item, state_attr, None)
-        if not state:
-            continue
-        state.url = map_yle_program_url(state.url)
-
-
-def _map_local_media_urls_in_states(item: ScheduleItem) -> None:
-    """Map local media filenames in item states to route URLs."""
-    for state_attr in ("start", "recording", "finish"):
-        state = getattr(item, state_attr, None)
-        if not state:
-            continue
-        state.url = map_local_media_url(state.url)
+@dataclass
+class UrlRewriteMap:
+    """Raw URL to route URL mappings, shared by every language of one theme.
+
+    Languages of a theme reference the same media files and YLE programs, so
+    each raw URL is quoted once and later lookups are plain dict hits.
+
+    With ``media_url`` set, media route URLs are replaced by what it returns
+    for the filename (for example a direct blob URL), when not None.
+    """
+
+    local: dict[str, str] = field(default_factory=dict)
+    yle: dict[str, str] = field(default_factory=dict)
+    media_url: Callable[[str], str | None] | None = None
+
+    def local_url(self, url: str | None) -> str | None:
+        """Return the media route URL for a raw local URL."""
+        if not url:
+            return url
+        mapped = self.local.get(url)
+        if mapped is None:
+            mapped = map_local_media_url(url) or url
+            if self.media_url is not None and mapped.startswith(MEDIA_ROUTE):
+                direct = self.media_url(unquote(mapped.removeprefix(MEDIA_ROUTE)))
+                mapped = direct or mapped
+            self.local[url] = mapped
+        return mapped
+
+    def yle_url(self, url: str | None) -> str | None:
+        """Return the lazy YLE route URL for a raw program ID."""
+        if not url:
+            return url
+        mapped = self.yle.get(url)
+        if mapped is None:
+            mapped = self.yle[url] = map_yle_program_url(url) or url
+        return mapped
 
 
 def pre_process_schedule(
     schedule: Schedule,
+    url_map: UrlRewriteMap | None = None,
 ) -> Schedule:
-    """Map schedule URLs in-place and return the schedule."""
-    processed_items: list[ScheduleItem] = []
+    """Map schedule URLs in-place and return the schedule.
+
+    Pass the same url_map for every language of a theme to reuse mappings.
+    """
+    if url_map is None:
+        url_map = UrlRewriteMap()
 
-    if schedule.start:
-        schedule.start.url = map_local_media_url(schedule.start.url)
-    if schedule.finish:
-        schedule.finish.url = map_local_media_url(schedule.finish.url)
+    if schedule.start and schedule.start.url:
+        schedule.start.url = url_map.local_url(schedule.start.url)
+    if schedule.finish and schedule.finish.url:
+        schedule.finish.url = url_map.local_url(schedule.finish.url)
 
+    local_url = url_map.local_url
+    yle_url = url_map.yle_url
     for item in schedule.items:
-        if isinstance(item, (YleAudioMediaItem, YleVideoMediaItem)):
-            _map_yle_urls_in_states(item)
-        else:
-            _map_local_media_urls_in_states(item)
-        processed_items.append(item)
+        is_yle, state_attrs = _item_plan(type(item))
+        map_url = yle_url if is_yle else local_url
+        for state_attr in state_attrs:
+            state = getattr(item, state_attr)
+            if state is not None and state.url:
+                state.url = map_url(state.url)
 
-    schedule.items = processed_items
     return schedule
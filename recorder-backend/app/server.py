@@ -0,0 +1,53 @@
+"""Production server entry point with a configurable number of worker processes.
+
+Run with ``python -m app.server``. Uvicorn's supervisor starts
+``WEB_CONCURRENCY`` workers, replaces workers that die or stop answering
+its health checks, and on SIGHUP restarts them one at a time so the
+service keeps accepting connections. On SIGTERM in-flight requests get
+``GRACEFUL_SHUTDOWN_SECONDS`` to finish.
+"""
+
+import argparse
+import os
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+from app.settings import get_settings
+
+SHM_DIRECTORY = Path("/dev/shm")
+
+
+def default_shared_cache_dir() -> str:
+    """Return a directory for the shared cache, preferring tmpfs."""
+    base = SHM_DIRECTORY if SHM_DIRECTORY.is_dir() else Path(tempfile.gettempdir())
+    return str(base / "recorder-backend-cache")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=80)
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    workers = max(1, settings.web_concurrency)
+    if workers > 1 and not settings.shared_cache_dir:
+        # Workers read settings from the environment they inherit.
+        os.environ["SHARED_CACHE_DIR"] = default_shared_cache_dir()
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        timeout_graceful_shutdown=settings.graceful_shutdown_seconds,
+        limit_max_requests=settings.worker_max_requests,
+        proxy_headers=True,
+        log_level="info",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -13,6 +14,82 @@ class Settings(BaseSettings):
     yle_client_id: str | None = None
     yle_client_key: str | None = None
 
+    theme_cache_ttl_seconds: float = 60.0
+    content_stale_while_revalidate_seconds: float = 300.0
+    content_stale_if_error_seconds: float = 3600.0
+    compression_minimum_size: int = 500
+
+    media_cache_max_bytes: int = 64 * 1024 * 1024
+    media_cache_max_file_bytes: int = 512 * 1024
+    media_block_size: int = 256 * 1024
+    media_block_cache_max_bytes: int = 128 * 1024 * 1024
+    media_delivery: Literal["proxy", "redirect", "inline"] = "proxy"
+    media_read_url_expiry_minutes: int = 60
+
+    warmup_enabled: bool = True
+    warmup_budget_seconds: float = 30.0
+    warmup_concurrency: int = 16
+
+    content_watch_interval_seconds: float = 30.0
+
+    web_concurrency: int = 1
+    graceful_shutdown_seconds: int = 30
+    worker_max_requests: int | None = None
+    shared_cache_dir: str | None = None
+    shared_cache_max_bytes: int = 256 * 1024 * 1024
+    yle_url_cache_ttl_seconds: float = 300.0
+
+    cpu_offload_threshold_bytes: int = 4 * 1024
+    cpu_executor_workers: int = 2
+    loop_lag_interval_seconds: float = 0.5
+
+    storage_read_deadline_seconds: float = 10.0
+    # Whole-blob downloads and listings grow with the data they return, so
+    # they get their own, longer limits.
+    storage_read_deadlines: dict[str, float] = {
+        "load_binary": 180.0,
+        "list_blobs": 90.0,
+        "list_etags": 90.0,
+    }
+    storage_read_attempt_timeout_seconds: float = 4.0
+    storage_read_attempt_timeouts: dict[str, float] = {
+        "load_binary": 60.0,
+        "list_blobs": 30.0,
+        "list_etags": 30.0,
+    }
+    storage_read_retries: int = 2
+    storage_read_backoff_seconds: float = 0.1
+    storage_read_backoff_max_seconds: float = 1.0
+    storage_read_hedging: bool = False
+    storage_read_hedge_min_samples: int = 50
+
+    idempotency_ttl_seconds: float = 300.0
+    idempotency_max_entries: int = 10_000
+
+    resumable_upload_block_size: int = 4 * 1024 * 1024
+    resumable_upload_url_expiry_minutes: int = 30
+
+    export_chunk_size: int = 1024 * 1024
+    export_prefetch_blobs: int = 4
+
+    admission_control_enabled: bool = True
+    admission_upload_concurrency: int = 16
+    admission_upload_queue_depth: int = 32
+    admission_media_concurrency: int = 64
+    admission_media_queue_depth: int = 128
+    admission_content_concurrency: int = 64
+    admission_content_queue_depth: int = 128
+    admission_export_concurrency: int = 4
+    admission_export_queue_depth: int = 8
+    admission_queue_timeout_seconds: float = 2.0
+    admission_retry_after_seconds: int = 1
+
+    storage_backend: Literal["azure", "filesystem"] = "azure"
+    local_storage_root: str = "../recorder-content"
+    local_storage_env: str = "dev"
+    local_storage_public_url: str = "http://localhost:8000"
+    local_storage_signing_key: str | None = None
+
 
 @lru_cache
 def get_settings() -> Settings:
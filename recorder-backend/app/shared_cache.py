@@ -0,0 +1,166 @@
+"""Cache shared by the worker processes of one host.
+
+With several workers each process keeps its own in-memory caches, so
+without a shared tier every worker would load and encode the same themes
+and resolve the same YLE URLs against the upstream services. Entries are
+stored as files in one directory, which on Linux is best placed on tmpfs
+(``/dev/shm``) so reads and writes stay in memory.
+
+Writes go to a temporary file that is renamed into place, so readers in
+other processes see either the old or the new value, never a partial one.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Prune once this fraction of the byte budget has been written since the last prune.
+PRUNE_AFTER_FRACTION = 0.1
+
+
+class SharedDiskCache:
+    """Byte-string cache stored as files in a directory shared across processes.
+
+    Entries expire ``ttl_seconds`` after they were written, or sooner for
+    lookups that pass ``max_age``. When the files exceed ``max_bytes`` the
+    oldest ones are deleted.
+    """
+
+    def __init__(self, directory: Path, ttl_seconds: float, max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._written_since_prune = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return self.directory / digest
+
+    def get(self, key: str, max_age: float | None = None) -> bytes | None:
+        """Return the stored value, or None when missing or expired.
+
+        Args:
+            key: Cache key
+            max_age: Expiry in seconds for this lookup, at most ttl_seconds
+
+        Returns:
+            The stored bytes, or None
+        """
+        ttl = self.ttl_seconds if max_age is None else min(max_age, self.ttl_seconds)
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                if time.time() - os.fstat(f.fileno()).st_mtime > ttl:
+                    return None
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Shared cache read failed for {key}: {e}")
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store a value, replacing any previous one atomically."""
+        try:
+            fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(value)
+                os.replace(tmp_name, self._path(key))
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+        except OSError as e:
+            logger.warning(f"Shared cache write failed for {key}: {e}")
+            return
+
+        self._written_since_prune += len(value)
+        if self._written_since_prune > self.max_bytes * PRUNE_AFTER_FRACTION:
+            self.prune()
+
+    def add(self, key: str, value: bytes, max_age: float | None = None) -> bool:
+        """Store a value unless a live one exists; return True if stored.
+
+        The entry is created with a hard link, which fails if it exists, so
+        of several processes adding the same key at once only one succeeds.
+        An entry older than ``max_age`` counts as absent. If the cache
+        cannot be written at all, True is returned so callers go ahead.
+        """
+        path = self._path(key)
+        if path.exists() and self.get(key, max_age=max_age) is None:
+            path.unlink(missing_ok=True)
+        try:
+            fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(value)
+                os.link(tmp_name, path)
+            finally:
+                os.unlink(tmp_name)
+        except FileExistsError:
+            return False
+        except OSError as e:
+            logger.warning(f"Shared cache write failed for {key}: {e}")
+        return True
+
+    def invalidate(self, key: str) -> None:
+        """Drop one entry if present."""
+        self._path(key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                Path(entry.path).unlink(missing_ok=True)
+
+    def prune(self) -> None:
+        """Delete expired entries, then the oldest ones while over budget."""
+        self._written_since_prune = 0
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                Path(entry.path).unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            Path(path).unlink(missing_ok=True)
+            total -= size
+
+
+@lru_cache
+def get_shared_cache() -> SharedDiskCache | None:
+    """Return the configured shared cache, or None when it is disabled."""
+    settings = get_settings()
+    if not settings.shared_cache_dir:
+        return None
+    try:
+        return SharedDiskCache(
+            Path(settings.shared_cache_dir),
+            ttl_seconds=max(
+                settings.theme_cache_ttl_seconds,
+                settings.yle_url_cache_ttl_seconds,
+                settings.idempotency_ttl_seconds,
+            ),
+            max_bytes=settings.shared_cache_max_bytes,
+        )
+    except OSError as e:
+        logger.warning(f"Shared cache disabled: {e}")
+        return None
@@ -0,0 +1,67 @@
+"""Coalescing of concurrent identical storage reads.
+
+When many clients ask for the same blob at once (a newly published theme,
+a popular image) only the first caller downloads it; callers arriving
+while that download is in flight wait for it and share its result or
+exception.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from app.metrics import REGISTRY, Counter, Gauge
+
+T = TypeVar("T")
+
+COALESCED_READS = REGISTRY.register(
+    Counter(
+        "storage_coalesced_reads_total",
+        "Storage reads that started a download (leader) or joined one (follower).",
+        ("operation", "role"),
+    )
+)
+COALESCING_RATIO = REGISTRY.register(
+    Gauge(
+        "storage_coalescing_ratio",
+        "Share of storage reads served by joining a download already in flight.",
+        ("operation",),
+    )
+)
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its outcome."""
+
+    def __init__(self) -> None:
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+
+    def _record(self, operation: str, role: str) -> None:
+        COALESCED_READS.inc(operation=operation, role=role)
+        leaders = COALESCED_READS.value(operation=operation, role="leader")
+        followers = COALESCED_READS.value(operation=operation, role="follower")
+        COALESCING_RATIO.set(followers / (leaders + followers), operation=operation)
+
+    async def run(
+        self, key: Hashable, operation: str, call: Callable[[], Awaitable[T]]
+    ) -> T:
+        """Return call()'s result, sharing it with concurrent callers of key.
+
+        The call runs in its own task, so a caller that is cancelled (for
+        example when its client disconnects) does not cancel the others.
+        """
+        task = self._in_flight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self._record(operation, "leader")
+        else:
+            self._record(operation, "follower")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved when every caller has gone away.
+            task.exception()
@@ -1,23 +1,30 @@
 """
-Azure Blob Storage abstraction layer.
-
-This module provides async functions for interacting with Azure Blob Storage,
-replacing the boto3 S3 client used in the Lambda version.
+Blob storage abstraction layer.
+
+This module provides async functions for interacting with blob storage,
+replacing the boto3 S3 client used in the Lambda version. The actual
+storage is a pluggable backend (Azure Blob Storage or the local
+filesystem, see app.storage_backends) selected by the STORAGE_BACKEND
+setting; this module adds logging, metrics and uniform StorageError
+handling on top.
 """
 
 import json
 import logging
-import os
-from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from typing import Dict, List, Optional
 
-from azure.storage.blob.aio import BlobServiceClient
-from azure.storage.blob import (
-    BlobSasPermissions,
-    generate_blob_sas,
-    ContentSettings,
+from azure.core.exceptions import (
+    AzureError,
+    HttpResponseError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
 )
-from azure.core.exceptions import ResourceNotFoundError, AzureError
+
+from app.metrics import track_storage
+from app.read_policy import read_with_policy
+from app.single_flight import SingleFlight
+from app.storage_backends import get_storage_backend
 
 logger = logging.getLogger(__name__)
 
@@ -28,41 +35,26 @@ class StorageError(Exception):
     pass
 
 
-# --- Configuration ---
-
+class BlobNotFoundError(StorageError):
+    """The blob a storage operation needed does not exist."""
 
-def _resolve_storage_connection_string() -> str:
-    """Resolve a non-empty Azure Storage connection string."""
-    value = os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
-    if value and value.strip():
-        return value
+    pass
 
-    # For local development with Azurite
-    return (
-        "DefaultEndpointsProtocol=http;"
-        "AccountName=devstoreaccount1;"
-        "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
-        "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
-    )
 
+class AppendBlobFullError(StorageError):
+    """The append blob has taken the most appends Azure allows."""
 
-STORAGE_CONNECTION_STRING: str = _resolve_storage_connection_string()
-CONTAINER_NAME = os.environ.get("AZURE_STORAGE_CONTAINER_NAME", "recorder-content")
+    pass
 
 
-def get_blob_service_client() -> BlobServiceClient:
-    """Create and return a BlobServiceClient."""
-    return BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING)
+class BlobModifiedError(StorageError):
+    """The blob no longer has the ETag a conditional read asked for."""
 
+    pass
 
-def _is_container_not_found(error: Exception) -> bool:
-    """Return True when Azure reports a missing container."""
-    status_code = getattr(error, "status_code", None)
-    if status_code == 404:
-        return True
 
-    response = getattr(error, "response", None)
-    return getattr(response, "status_code", None) == 404
+# Missing blobs as reported by the Azure and filesystem backends.
+NOT_FOUND_ERRORS = (ResourceNotFoundError, FileNotFoundError)
 
 
 # --- Language-Aware Blob Helpers ---
@@ -138,7 +130,7 @@ async def list_available_languages_by_id(
 
 async def store_metadata(blob_name: str, metadata: dict) -> None:
     """
-    Store metadata as JSON in Azure Blob Storage.
+    Store metadata as JSON in blob storage.
 
     Args:
         blob_name: The blob path/name
@@ -148,17 +140,11 @@ async def store_metadata(blob_name: str, metadata: dict) -> None:
         StorageError: If the operation fails
     """
     try:
-        async with get_blob_service_client() as client:
-            blob_client = client.get_blob_client(
-                container=CONTAINER_NAME, blob=blob_name
-            )
-
-            json_data = json.dumps(metadata)
-
-            await blob_client.upload_blob(
-                json_data,
-                overwrite=True,
-                content_settings=ContentSettings(content_type="application/json"),
+        with track_storage("store_metadata") as op:
+            json_data = json.dumps(metadata).encode("utf-8")
+            op.bytes_out = len(json_data)
+            await get_storage_backend().upload(
+                blob_name, json_data, content_type="application/json"
             )
 
             logger.info(f"Stored metadata to {blob_name}")
@@ -190,34 +176,10 @@ async def generate_upload_sas_url(
         StorageError: If URL generation fails
     """
     try:
-        async with get_blob_service_client() as client:
-            # Extract account name and key from connection string
-            conn_parts = dict(
-                item.split("=", 1)
-                for item in STORAGE_CONNECTION_STRING.split(";")
-                if "=" in item
-            )
-            account_name = conn_parts.get("AccountName")
-            account_key = conn_parts.get("AccountKey")
-
-            if not account_name or not account_key:
-                raise StorageError("Invalid connection string format")
-
-            # Generate SAS token
-            sas_token = generate_blob_sas(
-                account_name=account_name,
-                container_name=CONTAINER_NAME,
-                blob_name=blob_name,
-                account_key=account_key,
-                permission=BlobSasPermissions(write=True, create=True),
-                expiry=datetime.now(timezone.utc) + timedelta(minutes=expiry_minutes),
-            )
-
-            # Construct the full URL
-            blob_client = client.get_blob_client(
-                container=CONTAINER_NAME, blob=blob_name
+        with track_storage("generate_upload_sas"):
+            sas_url = await get_storage_backend().generate_upload_url(
+                blob_name, content_type=content_type, expiry_minutes=expiry_minutes
             )
-            sas_url = f"{blob_client.url}?{sas_token}"
 
             logger.info(f"Generated SAS URL for {blob_name}")
             return sas_url
@@ -244,15 +206,8 @@ async def delete_by_prefix(prefix: str) -> int:
         StorageError: If deletion fails
     """
     try:
-        async with get_blob_service_client() as client:
-            container_client = client.get_container_client(CONTAINER_NAME)
-
-            deleted_count = 0
-            async for blob in container_client.list_blobs(name_starts_with=prefix):
-                blob_client = container_client.get_blob_client(blob.name)
-                await blob_client.delete_blob()
-                deleted_count += 1
-                logger.debug(f"Deleted blob: {blob.name}")
+        with track_storage("delete_by_prefix"):
+            deleted_count = await get_storage_backend().delete_prefix(prefix)
 
             logger.info(f"Deleted {deleted_count} blobs with prefix: {prefix}")
             return deleted_count
@@ -265,6 +220,172 @@ async def delete_by_prefix(prefix: str) -> int:
         raise StorageError(f"Failed to delete blobs: {e}")
 
 
+async def append_blob(blob_name: str, data: bytes) -> None:
+    """
+    Append data to an existing append blob.
+
+    Args:
+        blob_name: The blob path/name
+        data: Bytes to append
+
+    Raises:
+        BlobNotFoundError: If the blob doesn't exist yet
+        AppendBlobFullError: If the blob can't take another append
+        StorageError: If the append fails
+    """
+    try:
+        with track_storage("append") as op:
+            op.bytes_out = len(data)
+            await get_storage_backend().append(blob_name, data)
+
+    except NOT_FOUND_ERRORS:
+        raise BlobNotFoundError(f"Blob not found: {blob_name}")
+    except HttpResponseError as e:
+        if e.error_code == "BlockCountExceedsLimit":
+            raise AppendBlobFullError(f"Append blob is full: {blob_name}")
+        logger.error(f"Azure Storage error appending to {blob_name}: {e}")
+        raise StorageError(f"Failed to append to blob: {e}")
+    except AzureError as e:
+        logger.error(f"Azure Storage error appending to {blob_name}: {e}")
+        raise StorageError(f"Failed to append to blob: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error appending to {blob_name}: {e}")
+        raise StorageError(f"Failed to append to blob: {e}")
+
+
+async def create_append_blob(blob_name: str, data: bytes) -> bool:
+    """
+    Create an append blob with initial content unless it already exists.
+
+    Args:
+        blob_name: The blob path/name
+        data: Initial content
+
+    Returns:
+        True if the blob was created, False if it already existed
+
+    Raises:
+        StorageError: If the operation fails
+    """
+    try:
+        with track_storage("create_append") as op:
+            op.bytes_out = len(data)
+            return await get_storage_backend().create_append(blob_name, data)
+
+    except AzureError as e:
+        logger.error(f"Azure Storage error creating {blob_name}: {e}")
+        raise StorageError(f"Failed to create blob: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error creating {blob_name}: {e}")
+        raise StorageError(f"Failed to create blob: {e}")
+
+
+async def delete_blobs(blob_names: List[str]) -> int:
+    """
+    Delete the named blobs in batches; missing blobs are skipped.
+
+    Args:
+        blob_names: Blob paths/names to delete
+
+    Returns:
+        Number of blobs deleted
+
+    Raises:
+        StorageError: If deletion fails
+    """
+    if not blob_names:
+        return 0
+    try:
+        with track_storage("delete_blobs"):
+            deleted_count = await get_storage_backend().delete_blobs(blob_names)
+
+            logger.info(f"Deleted {deleted_count} of {len(blob_names)} named blobs")
+            return deleted_count
+
+    except AzureError as e:
+        logger.error(f"Azure Storage error deleting blobs: {e}")
+        raise StorageError(f"Failed to delete blobs: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error deleting blobs: {e}")
+        raise StorageError(f"Failed to delete blobs: {e}")
+
+
+async def list_staged_blocks(blob_name: str) -> Dict[str, int]:
+    """
+    List the uncommitted blocks staged for a block blob.
+
+    Args:
+        blob_name: The blob path/name
+
+    Returns:
+        Dictionary of block ID to block size in bytes (empty if none)
+
+    Raises:
+        StorageError: If listing fails
+    """
+    try:
+        with track_storage("list_blocks"):
+            backend = get_storage_backend()
+            return await read_with_policy(
+                "list_blocks", lambda: backend.staged_blocks(blob_name)
+            )
+
+    except AzureError as e:
+        logger.error(f"Azure Storage error listing blocks of {blob_name}: {e}")
+        raise StorageError(f"Failed to list blocks: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error listing blocks of {blob_name}: {e}")
+        raise StorageError(f"Failed to list blocks: {e}")
+
+
+async def commit_staged_blocks(
+    blob_name: str, block_ids: List[str], content_type: Optional[str] = None
+) -> None:
+    """
+    Commit staged blocks, in the given order, as the content of a blob.
+
+    Args:
+        blob_name: The blob path/name
+        block_ids: IDs of staged blocks in content order
+        content_type: Optional MIME type for the blob
+
+    Raises:
+        StorageError: If the commit fails
+    """
+    try:
+        with track_storage("commit_blocks"):
+            await get_storage_backend().commit_blocks(
+                blob_name, block_ids, content_type=content_type
+            )
+
+            logger.info(f"Committed {len(block_ids)} blocks to {blob_name}")
+    except AzureError as e:
+        logger.error(f"Azure Storage error committing blocks: {e}")
+        raise StorageError(f"Failed to commit blocks: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error committing blocks: {e}")
+        raise StorageError(f"Failed to commit blocks: {e}")
+
+
+# Concurrent identical reads share one download; see app.single_flight.
+_reads = SingleFlight()
+
+
+async def _download(blob_name: str, operation: str) -> bytes:
+    """Download a whole blob, once for all concurrent callers."""
+
+    async def download() -> bytes:
+        with track_storage(operation) as op:
+            backend = get_storage_backend()
+            content = await read_with_policy(
+                operation, lambda: backend.download(blob_name)
+            )
+            op.bytes_in = len(content)
+            return content
+
+    return await _reads.run(("download", blob_name), "download", download)
+
+
 async def load_blob_json(blob_name: str) -> dict:
     """
     Load a JSON blob from storage.
@@ -279,19 +400,12 @@ async def load_blob_json(blob_name: str) -> dict:
         StorageError: If the blob doesn't exist or can't be parsed
     """
     try:
-        async with get_blob_service_client() as client:
-            blob_client = client.get_blob_client(
-                container=CONTAINER_NAME, blob=blob_name
-            )
-
-            download_stream = await blob_client.download_blob()
-            content = await download_stream.readall()
-
-            return json.loads(content)
+        content = await _download(blob_name, "load_json")
+        return json.loads(content)
 
-    except ResourceNotFoundError:
+    except NOT_FOUND_ERRORS:
         logger.error(f"Blob not found: {blob_name}")
-        raise StorageError(f"Blob not found: {blob_name}")
+        raise BlobNotFoundError(f"Blob not found: {blob_name}")
     except json.JSONDecodeError as e:
         logger.error(f"Invalid JSON in blob {blob_name}: {e}")
         raise StorageError(f"Invalid JSON in blob: {e}")
@@ -317,22 +431,11 @@ async def load_blob_binary(blob_name: str) -> bytes:
         StorageError: If the blob doesn't exist or can't be loaded
     """
     try:
-        async with get_blob_service_client() as client:
-            blob_client = client.get_blob_client(
-                container=CONTAINER_NAME, blob=blob_name
-            )
-
-            download_stream = await blob_client.download_blob()
-            content = await download_stream.readall()
-
-            if isinstance(content, str):
-                content = content.encode("utf-8")
+        return await _download(blob_name, "load_binary")
 
-            return content
-
-    except ResourceNotFoundError:
+    except NOT_FOUND_ERRORS:
         logger.error(f"Blob not found: {blob_name}")
-        raise StorageError(f"Blob not found: {blob_name}")
+        raise BlobNotFoundError(f"Blob not found: {blob_name}")
     except AzureError as e:
         logger.error(f"Azure Storage error loading blob: {e}")
         raise StorageError(f"Failed to load blob: {e}")
@@ -342,7 +445,10 @@ async def load_blob_binary(blob_name: str) -> bytes:
 
 
 async def load_blob_binary_range(
-    blob_name: str, offset: int = 0, length: Optional[int] = None
+    blob_name: str,
+    offset: int = 0,
+    length: Optional[int] = None,
+    etag: Optional[str] = None,
 ) -> tuple[bytes, int]:
     """
     Load a portion of a binary blob from storage.
@@ -351,41 +457,39 @@ async def load_blob_binary_range(
         blob_name: The blob path/name
         offset: Starting byte offset (default: 0)
         length: Number of bytes to read (default: all remaining bytes)
+        etag: Only read the blob if it still has this ETag
 
     Returns:
         Tuple of (content bytes, total blob size)
 
     Raises:
+        BlobModifiedError: If etag is given and the blob has changed
         StorageError: If the blob doesn't exist or can't be loaded
     """
-    try:
-        async with get_blob_service_client() as client:
-            blob_client = client.get_blob_client(
-                container=CONTAINER_NAME, blob=blob_name
-            )
 
-            # Get blob properties to know total size
-            blob_properties = await blob_client.get_blob_properties()
-            total_size = blob_properties.size
-
-            # If no length specified, read to end
-            if length is None:
-                length = total_size - offset
-
-            # Download the specified range
-            download_stream = await blob_client.download_blob(
-                offset=offset, length=length
+    async def download_range() -> tuple[bytes, int]:
+        with track_storage("load_range") as op:
+            backend = get_storage_backend()
+            content, total_size = await read_with_policy(
+                "load_range",
+                lambda: backend.download_range(
+                    blob_name, offset=offset, length=length, etag=etag
+                ),
             )
-            content = await download_stream.readall()
-
-            if isinstance(content, str):
-                content = content.encode("utf-8")
-
+            op.bytes_in = len(content)
             return content, total_size
 
-    except ResourceNotFoundError:
+    try:
+        return await _reads.run(
+            ("range", blob_name, offset, length, etag), "load_range", download_range
+        )
+
+    except NOT_FOUND_ERRORS:
         logger.error(f"Blob not found: {blob_name}")
-        raise StorageError(f"Blob not found: {blob_name}")
+        raise BlobNotFoundError(f"Blob not found: {blob_name}")
+    except ResourceModifiedError:
+        logger.warning(f"Blob changed during a conditional read: {blob_name}")
+        raise BlobModifiedError(f"Blob changed: {blob_name}")
     except AzureError as e:
         logger.error(f"Azure Storage error loading blob: {e}")
         raise StorageError(f"Failed to load blob: {e}")
@@ -394,6 +498,41 @@ async def load_blob_binary_range(
         raise StorageError(f"Failed to load blob: {e}")
 
 
+async def get_blob_properties(blob_name: str) -> tuple[int, str]:
+    """
+    Look up the size and ETag of one blob without downloading it.
+
+    Args:
+        blob_name: The blob path/name
+
+    Returns:
+        Tuple of (size in bytes, ETag)
+
+    Raises:
+        StorageError: If the blob doesn't exist or can't be inspected
+    """
+
+    async def properties() -> tuple[int, str]:
+        with track_storage("properties"):
+            backend = get_storage_backend()
+            return await read_with_policy(
+                "properties", lambda: backend.properties(blob_name)
+            )
+
+    try:
+        return await _reads.run(("properties", blob_name), "properties", properties)
+
+    except NOT_FOUND_ERRORS:
+        logger.error(f"Blob not found: {blob_name}")
+        raise BlobNotFoundError(f"Blob not found: {blob_name}")
+    except AzureError as e:
+        logger.error(f"Azure Storage error reading blob properties: {e}")
+        raise StorageError(f"Failed to read blob properties: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error reading blob properties: {e}")
+        raise StorageError(f"Failed to read blob properties: {e}")
+
+
 async def list_blobs_with_prefix(prefix: str, max_results: int = 1000) -> List[str]:
     """
     List all blob names with a given prefix.
@@ -409,32 +548,82 @@ async def list_blobs_with_prefix(prefix: str, max_results: int = 1000) -> List[s
         StorageError: If listing fails
     """
     try:
-        async with get_blob_service_client() as client:
-            container_client = client.get_container_client(CONTAINER_NAME)
-
-            blob_names = []
-            count = 0
-
-            async for blob in container_client.list_blobs(name_starts_with=prefix):
-                blob_names.append(blob.name)
-                count += 1
-                if count >= max_results:
-                    break
+        with track_storage("list_blobs"):
+            backend = get_storage_backend()
+            blob_names = await read_with_policy(
+                "list_blobs",
+                lambda: backend.list_names(prefix, max_results=max_results),
+            )
 
             logger.info(f"Listed {len(blob_names)} blobs with prefix: {prefix}")
             return blob_names
 
     except AzureError as e:
-        if _is_container_not_found(e):
-            logger.warning(
-                "Container '%s' not found while listing '%s'; returning empty list.",
-                CONTAINER_NAME,
-                prefix,
+        logger.error(f"Azure Storage error listing blobs: {e}")
+        raise StorageError(f"Failed to list blobs: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error listing blobs: {e}")
+        raise StorageError(f"Failed to list blobs: {e}")
+
+
+async def list_blob_etags(prefix: str) -> Dict[str, str]:
+    """
+    List blob names with a given prefix together with their ETags.
+
+    Args:
+        prefix: The blob name prefix to match
+
+    Returns:
+        Dictionary of blob name to ETag
+
+    Raises:
+        StorageError: If listing fails
+    """
+    try:
+        with track_storage("list_etags"):
+            backend = get_storage_backend()
+            return await read_with_policy(
+                "list_etags", lambda: backend.list_etags(prefix)
             )
-            return []
 
+    except AzureError as e:
         logger.error(f"Azure Storage error listing blobs: {e}")
         raise StorageError(f"Failed to list blobs: {e}")
     except Exception as e:
         logger.error(f"Unexpected error listing blobs: {e}")
         raise StorageError(f"Failed to list blobs: {e}")
+
+
+def local_blob_path(blob_name: str) -> Optional[Path]:
+    """
+    Return a local file holding the blob, if the backend has one.
+
+    Lets routes hand the file to the server (sendfile) instead of copying
+    its bytes through Python. Always None for the Azure backend.
+    """
+    return get_storage_backend().local_path(blob_name)
+
+
+def generate_read_sas_url(blob_name: str, expiry_minutes: int = 60) -> Optional[str]:
+    """
+    Generate a read-only SAS URL clients can fetch the blob from directly.
+
+    Signing is local (no storage round trip), so this is synchronous.
+
+    Args:
+        blob_name: The blob path/name
+        expiry_minutes: How long the URL stays valid (default 60 minutes)
+
+    Returns:
+        The URL, or None when the backend has no direct read URLs
+
+    Raises:
+        StorageError: If URL generation fails
+    """
+    try:
+        with track_storage("generate_read_sas"):
+            return get_storage_backend().read_url(blob_name, expiry_minutes)
+
+    except Exception as e:
+        logger.error(f"Error generating read SAS URL for {blob_name}: {e}")
+        raise StorageError(f"Failed to generate read SAS URL: {e}")
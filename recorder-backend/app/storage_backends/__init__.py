@@ -0,0 +1,37 @@
+"""Pluggable blob storage backends behind app.storage."""
+
+from functools import lru_cache
+from pathlib import Path
+
+from app.settings import get_settings
+from app.storage_backends.azure import AzureBlobBackend
+from app.storage_backends.base import StorageBackend
+from app.storage_backends.filesystem import FilesystemBackend
+
+__all__ = [
+    "AzureBlobBackend",
+    "FilesystemBackend",
+    "StorageBackend",
+    "close_storage_backend",
+    "get_storage_backend",
+]
+
+
+@lru_cache
+def get_storage_backend() -> StorageBackend:
+    """Return the backend selected by the STORAGE_BACKEND setting."""
+    settings = get_settings()
+    if settings.storage_backend == "filesystem":
+        return FilesystemBackend(
+            Path(settings.local_storage_root) / settings.local_storage_env,
+            public_url=settings.local_storage_public_url,
+            signing_key=settings.local_storage_signing_key,
+        )
+    return AzureBlobBackend()
+
+
+async def close_storage_backend() -> None:
+    """Close the active backend and forget it, e.g. on application shutdown."""
+    if get_storage_backend.cache_info().currsize:
+        await get_storage_backend().close()
+    get_storage_backend.cache_clear()
@@ -0,0 +1,326 @@
+"""Azure Blob Storage backend (also used with Azurite for local development)."""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    AzureError,
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from azure.storage.blob import (
+    BlobBlock,
+    BlobSasPermissions,
+    ContentSettings,
+    generate_blob_sas,
+)
+from azure.storage.blob.aio import BlobServiceClient
+
+logger = logging.getLogger(__name__)
+
+# Most blobs one batch delete request may name.
+DELETE_BATCH_SIZE = 256
+
+
+# --- Configuration ---
+
+
+def _resolve_storage_connection_string() -> str:
+    """Resolve a non-empty Azure Storage connection string."""
+    value = os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
+    if value and value.strip():
+        return value
+
+    # For local development with Azurite
+    return (
+        "DefaultEndpointsProtocol=http;"
+        "AccountName=devstoreaccount1;"
+        "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+        "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+    )
+
+
+STORAGE_CONNECTION_STRING: str = _resolve_storage_connection_string()
+CONTAINER_NAME = os.environ.get("AZURE_STORAGE_CONTAINER_NAME", "recorder-content")
+
+
+def get_blob_service_client() -> BlobServiceClient:
+    """Create and return a BlobServiceClient."""
+    return BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING)
+
+
+def _is_container_not_found(error: Exception) -> bool:
+    """Return True when Azure reports a missing container."""
+    status_code = getattr(error, "status_code", None)
+    if status_code == 404:
+        return True
+
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 404
+
+
+def _account_credentials() -> tuple[str, str]:
+    """Extract account name and key from the connection string."""
+    conn_parts = dict(
+        item.split("=", 1)
+        for item in STORAGE_CONNECTION_STRING.split(";")
+        if "=" in item
+    )
+    account_name = conn_parts.get("AccountName")
+    account_key = conn_parts.get("AccountKey")
+    if not account_name or not account_key:
+        raise ValueError("Invalid connection string format")
+    return account_name, account_key
+
+
+class AzureBlobBackend:
+    """Blob operations against one Azure Storage container.
+
+    One BlobServiceClient (and so one connection pool) is created on first
+    use and shared by every call until close().
+    """
+
+    name = "azure"
+
+    def __init__(self, container_name: str = CONTAINER_NAME) -> None:
+        self.container_name = container_name
+        self._client: BlobServiceClient | None = None
+
+    def _service(self) -> BlobServiceClient:
+        if self._client is None:
+            self._client = get_blob_service_client()
+        return self._client
+
+    async def close(self) -> None:
+        """Close the shared client and its connections."""
+        client, self._client = self._client, None
+        if client is not None:
+            await client.close()
+
+    async def upload(
+        self, blob_name: str, data: bytes, content_type: Optional[str] = None
+    ) -> None:
+        client = self._service()
+        blob_client = client.get_blob_client(
+            container=self.container_name, blob=blob_name
+        )
+        await blob_client.upload_blob(
+            data,
+            overwrite=True,
+            content_settings=ContentSettings(content_type=content_type),
+        )
+
+    async def download(self, blob_name: str) -> bytes:
+        client = self._service()
+        blob_client = client.get_blob_client(
+            container=self.container_name, blob=blob_name
+        )
+        download_stream = await blob_client.download_blob()
+        content = await download_stream.readall()
+
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        return content
+
+    async def download_range(
+        self,
+        blob_name: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        etag: Optional[str] = None,
+    ) -> tuple[bytes, int]:
+        client = self._service()
+        blob_client = client.get_blob_client(
+            container=self.container_name, blob=blob_name
+        )
+        conditions = (
+            {"etag": etag, "match_condition": MatchConditions.IfNotModified}
+            if etag is not None
+            else {}
+        )
+
+        if length is None:
+            # Get blob properties to know total size and read to end
+            blob_properties = await blob_client.get_blob_properties(**conditions)
+            length = blob_properties.size - offset
+            if length <= 0:
+                return b"", blob_properties.size
+
+        try:
+            download_stream = await blob_client.download_blob(
+                offset=offset, length=length, **conditions
+            )
+        except HttpResponseError as e:
+            # Azure answers 416 to any range of an empty blob.
+            if e.status_code == 416 and offset == 0:
+                return b"", 0
+            raise
+        content = await download_stream.readall()
+        # "bytes <start>-<end>/<total>" carries the size without a second call.
+        total_size = int(download_stream.properties.content_range.rsplit("/", 1)[1])
+
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        return content, total_size
+
+    async def properties(self, blob_name: str) -> tuple[int, str]:
+        client = self._service()
+        blob_client = client.get_blob_client(
+            container=self.container_name, blob=blob_name
+        )
+        blob_properties = await blob_client.get_blob_properties()
+        return blob_properties.size, blob_properties.etag
+
+    async def list_names(self, prefix: str, max_results: int = 1000) -> list[str]:
+        try:
+            client = self._service()
+            container_client = client.get_container_client(self.container_name)
+
+            blob_names = []
+            async for blob in container_client.list_blobs(name_starts_with=prefix):
+                blob_names.append(blob.name)
+                if len(blob_names) >= max_results:
+                    break
+            return blob_names
+        except AzureError as e:
+            if not _is_container_not_found(e):
+                raise
+            logger.warning(
+                "Container '%s' not found while listing '%s'; returning empty list.",
+                self.container_name,
+                prefix,
+            )
+            return []
+
+    async def list_etags(self, prefix: str) -> dict[str, str]:
+        client = self._service()
+        container_client = client.get_container_client(self.container_name)
+        return {
+            blob.name: blob.etag
+            async for blob in container_client.list_blobs(name_starts_with=prefix)
+        }
+
+    async def delete_prefix(self, prefix: str) -> int:
+        client = self._service()
+        container_client = client.get_container_client(self.container_name)
+
+        deleted_count = 0
+        async for blob in container_client.list_blobs(name_starts_with=prefix):
+            blob_client = container_client.get_blob_client(blob.name)
+            await blob_client.delete_blob()
+            deleted_count += 1
+            logger.debug(f"Deleted blob: {blob.name}")
+        return deleted_count
+
+    async def stage_block(self, blob_name: str, block_id: str, data: bytes) -> None:
+        client = self._service()
+        blob_client = client.get_blob_client(
+            container=self.container_name, blob=blob_name
+        )
+        await blob_client.stage_block(block_id, data, length=len(data))
+
+    async def staged_blocks(self, blob_name: str) -> dict[str, int]:
+        client = self._service()
+        blob_client = client.get_blob_client(
+            container=self.container_name, blob=blob_name
+        )
+        try:
+            _, uncommitted = await blob_client.get_block_list("uncommitted")
+        except ResourceNotFoundError:
+            # Nothing staged yet and no committed blob either.
+            return {}
+        return {block.id: block.size for block in uncommitted}
+
+    async def commit_blocks(
+        self, blob_name: str, block_ids: list[str], content_type: Optional[str] = None
+    ) -> None:
+        client = self._service()
+        blob_client = client.get_blob_client(
+            container=self.container_name, blob=blob_name
+        )
+        await blob_client.commit_block_list(
+            [BlobBlock(block_id=block_id) for block_id in block_ids],
+            content_settings=ContentSettings(content_type=content_type),
+        )
+
+    async def append(self, blob_name: str, data: bytes) -> None:
+        client = self._service()
+        blob_client = client.get_blob_client(
+            container=self.container_name, blob=blob_name
+        )
+        await blob_client.append_block(data, length=len(data))
+
+    async def create_append(self, blob_name: str, data: bytes) -> bool:
+        client = self._service()
+        blob_client = client.get_blob_client(
+            container=self.container_name, blob=blob_name
+        )
+        try:
+            await blob_client.create_append_blob(
+                etag="*", match_condition=MatchConditions.IfMissing
+            )
+        except (ResourceExistsError, ResourceModifiedError):
+            return False
+        await blob_client.append_block(data, length=len(data))
+        return True
+
+    async def delete_blobs(self, blob_names: list[str]) -> int:
+        client = self._service()
+        container_client = client.get_container_client(self.container_name)
+
+        deleted_count = 0
+        for start in range(0, len(blob_names), DELETE_BATCH_SIZE):
+            batch = blob_names[start : start + DELETE_BATCH_SIZE]
+            responses = await container_client.delete_blobs(
+                *batch, raise_on_any_failure=False
+            )
+            async for response in responses:
+                if response.status_code == 202:
+                    deleted_count += 1
+                elif response.status_code != 404:
+                    raise AzureError(
+                        f"Batch delete failed with status {response.status_code}"
+                    )
+        return deleted_count
+
+    def _sas_url(
+        self, blob_name: str, permission: BlobSasPermissions, expiry_minutes: int
+    ) -> str:
+        account_name, account_key = _account_credentials()
+
+        sas_token = generate_blob_sas(
+            account_name=account_name,
+            container_name=self.container_name,
+            blob_name=blob_name,
+            account_key=account_key,
+            permission=permission,
+            expiry=datetime.now(timezone.utc) + timedelta(minutes=expiry_minutes),
+        )
+
+        client = self._service()
+        blob_client = client.get_blob_client(
+            container=self.container_name, blob=blob_name
+        )
+        return f"{blob_client.url}?{sas_token}"
+
+    async def generate_upload_url(
+        self,
+        blob_name: str,
+        content_type: Optional[str] = None,
+        expiry_minutes: int = 6,
+    ) -> str:
+        return self._sas_url(
+            blob_name, BlobSasPermissions(write=True, create=True), expiry_minutes
+        )
+
+    def read_url(self, blob_name: str, expiry_minutes: int) -> Optional[str]:
+        return self._sas_url(blob_name, BlobSasPermissions(read=True), expiry_minutes)
+
+    def local_path(self, blob_name: str) -> Optional[Path]:
+        return None
@@ -0,0 +1,104 @@
+"""Storage backend protocol shared by the Azure and filesystem backends."""
+
+from pathlib import Path
+from typing import Optional, Protocol
+
+
+class StorageBackend(Protocol):
+    """Blob operations app.storage builds on.
+
+    Missing blobs raise FileNotFoundError or the Azure ResourceNotFoundError;
+    app.storage turns every backend failure into a StorageError.
+    """
+
+    name: str
+
+    async def upload(
+        self, blob_name: str, data: bytes, content_type: Optional[str] = None
+    ) -> None:
+        """Create or overwrite one blob."""
+        ...
+
+    async def download(self, blob_name: str) -> bytes:
+        """Return the full content of one blob."""
+        ...
+
+    async def download_range(
+        self,
+        blob_name: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        etag: Optional[str] = None,
+    ) -> tuple[bytes, int]:
+        """Return (content, total blob size) for a byte range of one blob.
+
+        With etag, the read fails with the Azure ResourceModifiedError unless
+        the blob still has that ETag.
+        """
+        ...
+
+    async def properties(self, blob_name: str) -> tuple[int, str]:
+        """Return (size, ETag) of one blob."""
+        ...
+
+    async def list_names(self, prefix: str, max_results: int = 1000) -> list[str]:
+        """Return blob names starting with prefix in lexicographic order."""
+        ...
+
+    async def list_etags(self, prefix: str) -> dict[str, str]:
+        """Return an ETag per blob name starting with prefix."""
+        ...
+
+    async def delete_prefix(self, prefix: str) -> int:
+        """Delete every blob starting with prefix and return how many."""
+        ...
+
+    async def stage_block(self, blob_name: str, block_id: str, data: bytes) -> None:
+        """Stage one uncommitted block of a block blob (Put Block)."""
+        ...
+
+    async def staged_blocks(self, blob_name: str) -> dict[str, int]:
+        """Return the size of every uncommitted block of a blob by block ID."""
+        ...
+
+    async def commit_blocks(
+        self, blob_name: str, block_ids: list[str], content_type: Optional[str] = None
+    ) -> None:
+        """Assemble staged blocks, in order, into the blob (Put Block List)."""
+        ...
+
+    async def append(self, blob_name: str, data: bytes) -> None:
+        """Append data to an existing append blob."""
+        ...
+
+    async def create_append(self, blob_name: str, data: bytes) -> bool:
+        """Create an append blob holding data unless the blob exists.
+
+        Returns False, leaving the blob untouched, when it already existed.
+        """
+        ...
+
+    async def delete_blobs(self, blob_names: list[str]) -> int:
+        """Delete the named blobs, skipping missing ones, and return how many."""
+        ...
+
+    async def generate_upload_url(
+        self,
+        blob_name: str,
+        content_type: Optional[str] = None,
+        expiry_minutes: int = 6,
+    ) -> str:
+        """Return a time-limited URL the client can PUT the blob to."""
+        ...
+
+    def read_url(self, blob_name: str, expiry_minutes: int) -> Optional[str]:
+        """Return a time-limited read-only URL for the blob, if supported."""
+        ...
+
+    def local_path(self, blob_name: str) -> Optional[Path]:
+        """Return a local file for the blob when it can be served directly."""
+        ...
+
+    async def close(self) -> None:
+        """Release connections held by the backend."""
+        ...
@@ -0,0 +1,326 @@
+"""Local filesystem backend serving straight from recorder-content/<env>/.
+
+Blob names map onto the content checkout the same way the storage init
+tool uploads it: ``theme/<id>/<lang>.json`` is read from
+``themes/<id>/<lang>.json`` and ``media/<file>`` from ``media/<file>``.
+Any other blob (uploaded metadata and recordings) lives under the same
+relative path inside the environment directory. No network is involved,
+which makes this backend usable for offline kiosks and for benchmarks.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import mmap
+import os
+import secrets
+import shutil
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+from urllib.parse import quote, urlencode
+
+from azure.core.exceptions import ResourceModifiedError
+
+# Blob prefix to directory inside the environment directory.
+PREFIX_DIRECTORIES = {"theme/": "themes", "media/": "media"}
+
+# Content authoring folders that are not blobs.
+IGNORED_DIRECTORIES = {"excel"}
+
+UPLOAD_ROUTE = "/v1/local-blobs"
+
+# Uncommitted blocks of resumable uploads, one directory per blob. Hidden,
+# so the directory never shows up in listings.
+STAGING_DIRECTORY = ".blocks"
+
+
+class FilesystemBackend:
+    """Blob operations on files below one content environment directory."""
+
+    name = "filesystem"
+
+    def __init__(
+        self,
+        root: Path,
+        public_url: str = "http://localhost:8000",
+        signing_key: Optional[str] = None,
+    ) -> None:
+        self.root = Path(root).resolve()
+        self.public_url = public_url.rstrip("/")
+        self._signing_key = (signing_key or secrets.token_hex(32)).encode("utf-8")
+
+    # --- Path mapping ---
+
+    def path_for(self, blob_name: str) -> Path:
+        """Map a blob name to its file, rejecting names that escape the root."""
+        parts = blob_name.split("/")
+        if not blob_name or any(part in ("", ".", "..") for part in parts):
+            raise ValueError(f"Invalid blob name: {blob_name}")
+
+        for prefix, directory in PREFIX_DIRECTORIES.items():
+            if blob_name.startswith(prefix):
+                return self.root / directory / blob_name[len(prefix) :]
+        if parts[0] in PREFIX_DIRECTORIES.values() or parts[0] in IGNORED_DIRECTORIES:
+            raise ValueError(f"Invalid blob name: {blob_name}")
+        return self.root / blob_name
+
+    def local_path(self, blob_name: str) -> Optional[Path]:
+        try:
+            path = self.path_for(blob_name)
+        except ValueError:
+            return None
+        return path if path.is_file() else None
+
+    def read_url(self, blob_name: str, expiry_minutes: int) -> Optional[str]:
+        # Local files are served by the app itself.
+        return None
+
+    async def close(self) -> None:
+        return None
+
+    def _sources(self, prefix: str) -> Iterator[tuple[Path, str]]:
+        """Yield (directory, blob prefix) pairs that can hold names under prefix."""
+        for blob_prefix, directory in PREFIX_DIRECTORIES.items():
+            if prefix.startswith(blob_prefix) or blob_prefix.startswith(prefix):
+                yield self.root / directory, blob_prefix
+        if not any(prefix.startswith(p) for p in PREFIX_DIRECTORIES):
+            yield self.root, ""
+
+    def _scan(self, directory: Path, blob_prefix: str, prefix: str) -> Iterator[str]:
+        """Yield names below directory, descending only where prefix can match."""
+        try:
+            entries = list(os.scandir(directory))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if not blob_prefix and (
+                    entry.name in PREFIX_DIRECTORIES.values()
+                    or entry.name in IGNORED_DIRECTORIES
+                ):
+                    continue
+                subdirectory = f"{blob_prefix}{entry.name}/"
+                if not (
+                    subdirectory.startswith(prefix) or prefix.startswith(subdirectory)
+                ):
+                    continue
+                yield from self._scan(Path(entry.path), subdirectory, prefix)
+            elif entry.is_file():
+                yield f"{blob_prefix}{entry.name}"
+
+    def _list_sync(self, prefix: str) -> list[str]:
+        names: list[str] = []
+        for directory, blob_prefix in self._sources(prefix):
+            # Start the scan at the deepest directory the prefix names.
+            relative = (
+                prefix[len(blob_prefix) :] if prefix.startswith(blob_prefix) else ""
+            )
+            subdirectory = relative.rpartition("/")[0]
+            start = directory / subdirectory if subdirectory else directory
+            scan_prefix = (
+                f"{blob_prefix}{subdirectory}/" if subdirectory else blob_prefix
+            )
+            names.extend(
+                name
+                for name in self._scan(start, scan_prefix, prefix)
+                if name.startswith(prefix)
+            )
+        return sorted(names)
+
+    # --- Reads ---
+
+    @classmethod
+    def _read_sync(
+        cls, path: Path, offset: int, length: Optional[int], etag: Optional[str]
+    ) -> tuple[bytes, int]:
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            if etag is not None and cls._etag(stat) != etag:
+                raise ResourceModifiedError(f"Blob changed: {path.name}")
+            total_size = stat.st_size
+            end = total_size if length is None else min(total_size, offset + length)
+            if offset >= end:
+                return b"", total_size
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[offset:end], total_size
+
+    async def download(self, blob_name: str) -> bytes:
+        content, _ = await asyncio.to_thread(
+            self._read_sync, self.path_for(blob_name), 0, None, None
+        )
+        return content
+
+    async def download_range(
+        self,
+        blob_name: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        etag: Optional[str] = None,
+    ) -> tuple[bytes, int]:
+        return await asyncio.to_thread(
+            self._read_sync, self.path_for(blob_name), offset, length, etag
+        )
+
+    async def list_names(self, prefix: str, max_results: int = 1000) -> list[str]:
+        names = await asyncio.to_thread(self._list_sync, prefix)
+        return names[:max_results]
+
+    def _etags_sync(self, prefix: str) -> dict[str, str]:
+        etags: dict[str, str] = {}
+        for name in self._list_sync(prefix):
+            try:
+                stat = self.path_for(name).stat()
+            except FileNotFoundError:
+                continue
+            etags[name] = self._etag(stat)
+        return etags
+
+    @staticmethod
+    def _etag(stat: os.stat_result) -> str:
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    async def properties(self, blob_name: str) -> tuple[int, str]:
+        stat = await asyncio.to_thread(self.path_for(blob_name).stat)
+        return stat.st_size, self._etag(stat)
+
+    async def list_etags(self, prefix: str) -> dict[str, str]:
+        return await asyncio.to_thread(self._etags_sync, prefix)
+
+    # --- Writes ---
+
+    @staticmethod
+    def _write_sync(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{path.name}.{secrets.token_hex(4)}.tmp")
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+
+    async def upload(
+        self, blob_name: str, data: bytes, content_type: Optional[str] = None
+    ) -> None:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        await asyncio.to_thread(self._write_sync, self.path_for(blob_name), data)
+
+    def _delete_sync(self, names: list[str]) -> int:
+        deleted = 0
+        for name in names:
+            path = self.path_for(name)
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            deleted += 1
+            # Prune directories left empty, but never the content folders.
+            parent = path.parent
+            while parent != self.root and parent.parent != self.root:
+                try:
+                    parent.rmdir()
+                except OSError:
+                    break
+                parent = parent.parent
+        return deleted
+
+    @staticmethod
+    def _append_sync(path: Path, data: bytes, create: bool) -> bool:
+        if create:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            # Appends of a few hundred bytes are atomic with O_APPEND.
+            with open(path, "xb" if create else "ab") as file:
+                file.write(data)
+        except FileExistsError:
+            return False
+        return True
+
+    async def append(self, blob_name: str, data: bytes) -> None:
+        path = self.path_for(blob_name)
+        if not path.is_file():
+            raise FileNotFoundError(f"Blob not found: {blob_name}")
+        await asyncio.to_thread(self._append_sync, path, data, False)
+
+    async def create_append(self, blob_name: str, data: bytes) -> bool:
+        return await asyncio.to_thread(
+            self._append_sync, self.path_for(blob_name), data, True
+        )
+
+    async def delete_blobs(self, blob_names: list[str]) -> int:
+        return await asyncio.to_thread(self._delete_sync, blob_names)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        names = await asyncio.to_thread(self._list_sync, prefix)
+        return await asyncio.to_thread(self._delete_sync, names)
+
+    # --- Block staging ---
+
+    def _staging_path(self, blob_name: str) -> Path:
+        self.path_for(blob_name)
+        digest = hashlib.sha256(blob_name.encode("utf-8")).hexdigest()
+        return self.root / STAGING_DIRECTORY / digest
+
+    def _staged_sync(self, staging: Path) -> dict[str, int]:
+        try:
+            entries = list(os.scandir(staging))
+        except FileNotFoundError:
+            return {}
+        return {
+            bytes.fromhex(entry.name).decode("utf-8"): entry.stat().st_size
+            for entry in entries
+            if not entry.name.startswith(".")
+        }
+
+    def _commit_sync(self, staging: Path, path: Path, block_ids: list[str]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{path.name}.{secrets.token_hex(4)}.tmp")
+        with open(temporary, "wb") as target:
+            for block_id in block_ids:
+                with open(staging / block_id.encode("utf-8").hex(), "rb") as block:
+                    shutil.copyfileobj(block, target)
+        os.replace(temporary, path)
+        # Like Azure, committing discards every block left uncommitted.
+        shutil.rmtree(staging, ignore_errors=True)
+
+    async def stage_block(self, blob_name: str, block_id: str, data: bytes) -> None:
+        path = self._staging_path(blob_name) / block_id.encode("utf-8").hex()
+        await asyncio.to_thread(self._write_sync, path, data)
+
+    async def staged_blocks(self, blob_name: str) -> dict[str, int]:
+        return await asyncio.to_thread(self._staged_sync, self._staging_path(blob_name))
+
+    async def commit_blocks(
+        self, blob_name: str, block_ids: list[str], content_type: Optional[str] = None
+    ) -> None:
+        await asyncio.to_thread(
+            self._commit_sync,
+            self._staging_path(blob_name),
+            self.path_for(blob_name),
+            block_ids,
+        )
+
+    # --- Signed upload URLs ---
+
+    def _signature(self, blob_name: str, expires: int) -> str:
+        message = f"{blob_name}\n{expires}".encode("utf-8")
+        return hmac.new(self._signing_key, message, hashlib.sha256).hexdigest()
+
+    def verify_upload_signature(
+        self, blob_name: str, expires: int, signature: str
+    ) -> bool:
+        """Check a signature produced by generate_upload_url and its expiry."""
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(blob_name, expires), signature)
+
+    async def generate_upload_url(
+        self,
+        blob_name: str,
+        content_type: Optional[str] = None,
+        expiry_minutes: int = 6,
+    ) -> str:
+        self.path_for(blob_name)
+        expires = int(time.time()) + expiry_minutes * 60
+        query = urlencode({"se": expires, "sig": self._signature(blob_name, expires)})
+        return f"{self.public_url}{UPLOAD_ROUTE}/{quote(blob_name)}?{query}"
@@ -0,0 +1,83 @@
+"""Startup warm-up of the content caches and the readiness state it drives.
+
+A cold container otherwise pays for storage client creation, the theme
+listing, every theme download and validation, and the first media reads on
+its first requests. The warm-up runs once in the background at startup and
+the readiness endpoint reports ready only when it has finished or its time
+budget has run out.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass
+
+from app.metrics import REGISTRY, Gauge
+from app.routers.content import preload_themes, referenced_media_files
+from app.routers.media import preload_media
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+WARMUP_DURATION = REGISTRY.register(
+    Gauge("warmup_duration_seconds", "Time the startup warm-up took.")
+)
+
+
+@dataclass
+class WarmupState:
+    """Progress of the startup warm-up, reported by the readiness endpoint."""
+
+    ready: bool = False
+    timed_out: bool = False
+    themes_loaded: int = 0
+    themes_failed: int = 0
+    media_cached: int = 0
+    seconds: float | None = None
+    error: str | None = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+warmup_state = WarmupState()
+
+
+async def _warm_caches(state: WarmupState) -> None:
+    settings = get_settings()
+    state.themes_loaded, state.themes_failed = await preload_themes(
+        concurrency=settings.warmup_concurrency
+    )
+    state.media_cached = await preload_media(
+        referenced_media_files(), settings.media_cache_max_file_bytes
+    )
+
+
+async def run_warmup(state: WarmupState = warmup_state) -> WarmupState:
+    """Warm the caches within the configured budget, then mark ready.
+
+    Failures and timeouts are logged and still end in the ready state:
+    a partially warm instance serves requests better than one that never
+    becomes ready.
+    """
+    budget = get_settings().warmup_budget_seconds
+    started = time.perf_counter()
+    try:
+        async with asyncio.timeout(budget):
+            await _warm_caches(state)
+    except TimeoutError:
+        state.timed_out = True
+        logger.warning(f"Warm-up did not finish within {budget:.1f}s budget")
+    except Exception as e:
+        state.error = str(e)
+        logger.error(f"Warm-up failed: {e}")
+    finally:
+        state.seconds = round(time.perf_counter() - started, 3)
+        WARMUP_DURATION.set(state.seconds)
+        state.ready = True
+
+    logger.info(
+        f"Warm-up finished in {state.seconds}s: {state.themes_loaded} themes, "
+        f"{state.media_cached} media files cached"
+    )
+    return state
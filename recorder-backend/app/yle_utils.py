@@ -2,6 +2,7 @@ import os
 import logging
 import requests
 
+from app.metrics import track_yle
 from app.settings import get_settings
 
 logger = logging.getLogger(__name__)
@@ -46,8 +47,9 @@ def map_yle_content(yle_program_id: str) -> str:
     try:
         media_url = get_media_url(yle_program_id)
 
-        media_response = requests.get(media_url, timeout=10)
-        media_response.raise_for_status()
+        with track_yle("playouts"):
+            media_response = requests.get(media_url, timeout=10)
+            media_response.raise_for_status()
         media_data = media_response.json().get("data", {})
         hls = media_data.get("hls", {})
         media_item_url = hls.get("url")
@@ -78,8 +80,9 @@ def get_media_url(yle_program_id: str) -> str:
     base_url = f"https://programs.api.yle.fi/v3/schema/v1/items/{yle_program_id}?app_id={client_id}&app_key={client_key}"
 
     try:
-        response = requests.get(base_url, timeout=10)
-        response.raise_for_status()
+        with track_yle("program"):
+            response = requests.get(base_url, timeout=10)
+            response.raise_for_status()
         program_data = response.json()
 
         publication_events = program_data.get("data", {}).get("publicationEvent", [])
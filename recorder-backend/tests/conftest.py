@@ -1 +1,28 @@
 """Shared pytest fixtures for models and API testing."""
+
+import pytest
+
+from app.admission import get_route_limiters
+from app.read_policy import clear_latency_samples
+from app.routers.content import clear_theme_cache
+from app.routers.media import clear_media_cache
+from app.routers.upload import clear_upload_responses
+from app.storage_backends import get_storage_backend
+
+
+@pytest.fixture(autouse=True)
+def _clear_content_caches():
+    """Keep caches, storage clients and read latencies from leaking between tests."""
+    clear_theme_cache()
+    clear_media_cache()
+    get_storage_backend.cache_clear()
+    clear_latency_samples()
+    get_route_limiters.cache_clear()
+    clear_upload_responses()
+    yield
+    clear_theme_cache()
+    clear_media_cache()
+    get_storage_backend.cache_clear()
+    clear_latency_samples()
+    get_route_limiters.cache_clear()
+    clear_upload_responses()
@@ -0,0 +1,255 @@
+"""In-memory stand-in for the async Azure BlobServiceClient.
+
+Implements the subset of the azure-storage-blob aio API used by the
+Azure storage backend, so app.storage (and everything built on it) runs
+unchanged against blobs held in a dict. The store can be seeded from
+recorder-content/<env>/ using the same blob layout as
+``recorder-tooling storage init``.
+"""
+
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import quote
+
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ServiceResponseError,
+)
+
+CONTENT_ROOT = Path(__file__).resolve().parents[2] / "recorder-content"
+
+
+@dataclass
+class FakeBlobProperties:
+    name: str
+    size: int
+    etag: str
+
+
+@dataclass
+class FakeBlobStore:
+    """Blob name to content mapping shared by every fake client."""
+
+    blobs: dict[str, bytes] = field(default_factory=dict)
+    # Uncommitted blocks per blob name, by block ID.
+    staged: dict[str, dict[str, bytes]] = field(default_factory=dict)
+    account_url: str = "http://127.0.0.1:10000/devstoreaccount1"
+    # Seconds every read waits before answering.
+    latency: float = 0.0
+    # Per-read delays overriding latency, consumed one per read.
+    delays: list[float] = field(default_factory=list)
+    # Number of upcoming reads that fail with a transient error.
+    failures: int = 0
+    # Reads answered or failed so far.
+    reads: int = 0
+    # Batch delete requests made so far.
+    deletes: int = 0
+    # Blocks each append blob may hold, like Azure's 50,000.
+    max_append_blocks: int = 50_000
+    # Blocks per append blob.
+    append_blocks: dict[str, int] = field(default_factory=dict)
+
+    def put(self, name: str, data: bytes) -> None:
+        self.blobs[name] = data
+
+    async def inject_faults(self) -> None:
+        """Apply the configured latency and transient failures to one read."""
+        self.reads += 1
+        delay = self.delays.pop(0) if self.delays else self.latency
+        if delay:
+            await asyncio.sleep(delay)
+        if self.failures:
+            self.failures -= 1
+            raise ServiceResponseError("Injected transient failure")
+
+    def properties(self, name: str) -> FakeBlobProperties:
+        data = self.blobs.get(name)
+        if data is None:
+            raise ResourceNotFoundError(f"Blob not found: {name}")
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        return FakeBlobProperties(name=name, size=len(data), etag=etag)
+
+    def seed_from_content(self, env: str = "dev") -> "FakeBlobStore":
+        """Load themes and media from recorder-content/<env>/."""
+        root = CONTENT_ROOT / env
+        for folder, prefix in (("themes", "theme/"), ("media", "media/")):
+            base = root / folder
+            if not base.is_dir():
+                continue
+            for path in sorted(base.rglob("*")):
+                if path.is_file():
+                    self.put(
+                        prefix + path.relative_to(base).as_posix(), path.read_bytes()
+                    )
+        return self
+
+    def client(self) -> "FakeBlobServiceClient":
+        return FakeBlobServiceClient(self)
+
+
+@dataclass
+class FakeBlock:
+    id: str
+    size: int
+
+
+@dataclass
+class _FakeBatchResponse:
+    status_code: int
+
+
+@dataclass
+class _FakeDownloadProperties:
+    content_range: str
+
+
+class _FakeDownload:
+    def __init__(self, data: bytes, offset: int, total_size: int):
+        self._data = data
+        self.properties = _FakeDownloadProperties(
+            f"bytes {offset}-{offset + len(data) - 1}/{total_size}"
+        )
+
+    async def readall(self) -> bytes:
+        return self._data
+
+
+class FakeBlobClient:
+    def __init__(self, store: FakeBlobStore, container: str, blob: str):
+        self._store = store
+        self.blob_name = blob
+        # Quoted the way the Azure SDK quotes blob names in URLs.
+        self.url = f"{store.account_url}/{container}/{quote(blob, safe='~/')}"
+
+    def _check_etag(self, etag: str | None) -> None:
+        if etag is not None and self._store.properties(self.blob_name).etag != etag:
+            raise ResourceModifiedError(f"Blob changed: {self.blob_name}")
+
+    async def get_blob_properties(
+        self, etag: str | None = None, **kwargs
+    ) -> FakeBlobProperties:
+        await self._store.inject_faults()
+        self._check_etag(etag)
+        return self._store.properties(self.blob_name)
+
+    async def download_blob(
+        self,
+        offset: int | None = None,
+        length: int | None = None,
+        etag: str | None = None,
+        **kwargs,
+    ) -> _FakeDownload:
+        await self._store.inject_faults()
+        data = self._store.blobs.get(self.blob_name)
+        if data is None:
+            raise ResourceNotFoundError(f"Blob not found: {self.blob_name}")
+        self._check_etag(etag)
+        total_size = len(data)
+        if offset is not None and offset >= total_size:
+            # Like Azure, which also refuses every range of an empty blob.
+            error = HttpResponseError(f"Range not satisfiable: {self.blob_name}")
+            error.status_code = 416
+            raise error
+        offset = offset or 0
+        end = None if length is None else offset + length
+        return _FakeDownload(data[offset:end], offset, total_size)
+
+    async def upload_blob(self, data, overwrite: bool = False, **kwargs) -> None:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._store.put(self.blob_name, bytes(data))
+
+    async def stage_block(self, block_id: str, data: bytes, **kwargs) -> None:
+        self._store.staged.setdefault(self.blob_name, {})[block_id] = bytes(data)
+
+    async def get_block_list(
+        self, block_list_type: str = "committed"
+    ) -> tuple[list[FakeBlock], list[FakeBlock]]:
+        staged = self._store.staged.get(self.blob_name)
+        if staged is None and self.blob_name not in self._store.blobs:
+            raise ResourceNotFoundError(f"Blob not found: {self.blob_name}")
+        uncommitted = [
+            FakeBlock(block_id, len(data)) for block_id, data in (staged or {}).items()
+        ]
+        return [], uncommitted
+
+    async def commit_block_list(self, block_list, **kwargs) -> None:
+        staged = self._store.staged.pop(self.blob_name, {})
+        self._store.put(
+            self.blob_name, b"".join(staged[block.id] for block in block_list)
+        )
+
+    async def create_append_blob(self, **kwargs) -> None:
+        if self.blob_name in self._store.blobs:
+            raise ResourceExistsError(f"Blob already exists: {self.blob_name}")
+        self._store.put(self.blob_name, b"")
+        self._store.append_blocks[self.blob_name] = 0
+
+    async def append_block(self, data: bytes, **kwargs) -> None:
+        existing = self._store.blobs.get(self.blob_name)
+        if existing is None:
+            raise ResourceNotFoundError(f"Blob not found: {self.blob_name}")
+        blocks = self._store.append_blocks.get(self.blob_name, 0)
+        if blocks >= self._store.max_append_blocks:
+            error = HttpResponseError(f"Append blob is full: {self.blob_name}")
+            error.error_code = "BlockCountExceedsLimit"
+            raise error
+        self._store.append_blocks[self.blob_name] = blocks + 1
+        self._store.put(self.blob_name, existing + bytes(data))
+
+    async def delete_blob(self) -> None:
+        if self._store.blobs.pop(self.blob_name, None) is None:
+            raise ResourceNotFoundError(f"Blob not found: {self.blob_name}")
+
+
+class FakeContainerClient:
+    def __init__(self, store: FakeBlobStore, container: str):
+        self._store = store
+        self._container = container
+
+    def get_blob_client(self, blob: str) -> FakeBlobClient:
+        return FakeBlobClient(self._store, self._container, blob)
+
+    async def list_blobs(self, name_starts_with: str | None = None):
+        prefix = name_starts_with or ""
+        for name in sorted(self._store.blobs):
+            if name.startswith(prefix):
+                yield self._store.properties(name)
+
+    async def delete_blobs(self, *names: str, raise_on_any_failure: bool = True):
+        self._store.deletes += 1
+        responses = []
+        for name in names:
+            found = self._store.blobs.pop(name, None) is not None
+            responses.append(_FakeBatchResponse(202 if found else 404))
+
+        async def iterate():
+            for response in responses:
+                yield response
+
+        return iterate()
+
+
+class FakeBlobServiceClient:
+    def __init__(self, store: FakeBlobStore):
+        self._store = store
+
+    async def __aenter__(self) -> "FakeBlobServiceClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+    def get_blob_client(self, container: str, blob: str) -> FakeBlobClient:
+        return FakeBlobClient(self._store, container, blob)
+
+    def get_container_client(self, container: str) -> FakeContainerClient:
+        return FakeContainerClient(self._store, container)
@@ -0,0 +1,152 @@
+"""Tests for per-route admission control and load shedding."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.admission import (
+    ADMISSION_SHED,
+    ADMISSION_WAIT,
+    Overloaded,
+    RouteLimiter,
+    route_class,
+)
+from app.main import app
+from app.metrics import REGISTRY
+from app.settings import get_settings
+
+pytestmark = pytest.mark.anyio
+
+UPLOAD = {
+    "filename": "test-recording.m4a",
+    "metadata": {
+        "clientId": "550e8400-e29b-41d4-a716-446655440000",
+        "contentType": "audio/m4a",
+    },
+}
+
+
+@pytest.mark.parametrize(
+    ("method", "path", "expected"),
+    [
+        ("POST", "/v1/upload", "upload"),
+        ("DELETE", "/v1/recordings/abc", "upload"),
+        ("GET", "/v1/recordings/abc/export", "export"),
+        ("PUT", "/v1/local-blobs/uploads/a.m4a", "upload"),
+        ("GET", "/v1/media/clip.mp4", "media"),
+        ("GET", "/v1/yle-media/1-2", "media"),
+        ("GET", "/v1/theme", "content"),
+        ("GET", "/v1/theme/t/bundle", "content"),
+        ("OPTIONS", "/v1/upload", None),
+        ("GET", "/metrics", None),
+        ("GET", "/ready", None),
+    ],
+)
+def test_route_class(method, path, expected):
+    assert route_class(method, path) == expected
+
+
+async def test_limiter_queues_then_sheds():
+    limiter = RouteLimiter("upload", concurrency=1, queue_depth=1)
+    await limiter.acquire(timeout=1.0)
+    queued = asyncio.create_task(limiter.acquire(timeout=1.0))
+    await asyncio.sleep(0)
+
+    with pytest.raises(Overloaded, match="queue_full"):
+        await limiter.acquire(timeout=1.0)
+
+    limiter.release()
+    assert await queued >= 0.0
+    limiter.release()
+    assert await limiter.acquire(timeout=1.0) == 0.0
+
+
+async def test_limiter_times_out_waiters():
+    limiter = RouteLimiter("media", concurrency=1, queue_depth=5)
+    await limiter.acquire(timeout=1.0)
+
+    with pytest.raises(Overloaded, match="timeout"):
+        await limiter.acquire(timeout=0.01)
+
+    limiter.release()
+    assert await limiter.acquire(timeout=0.01) == 0.0
+
+
+@pytest.fixture
+def one_upload_slot(monkeypatch):
+    REGISTRY.reset()
+    settings = get_settings()
+    monkeypatch.setattr(settings, "admission_upload_concurrency", 1)
+    monkeypatch.setattr(settings, "admission_upload_queue_depth", 1)
+    monkeypatch.setattr(settings, "admission_retry_after_seconds", 3)
+    release = asyncio.Event()
+
+    async def slow_store(blob_name, metadata):
+        await release.wait()
+
+    with (
+        patch("app.routers.upload.record_upload"),
+        patch("app.routers.upload.store_metadata", side_effect=slow_store),
+        patch(
+            "app.routers.upload.generate_upload_sas_url",
+            return_value="https://example.test/sas",
+        ),
+    ):
+        yield release
+    REGISTRY.reset()
+
+
+async def test_upload_burst_is_shed_without_blocking_other_routes(one_upload_slot):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        uploads = [
+            asyncio.create_task(client.post("/v1/upload", json=UPLOAD))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.05)
+        shed = await client.post("/v1/upload", json=UPLOAD)
+        health = await client.get("/")
+        one_upload_slot.set()
+        admitted = await asyncio.gather(*uploads)
+
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "3"
+    assert health.status_code == 200
+    assert [r.status_code for r in admitted] == [200, 200]
+    assert ADMISSION_SHED.value(route_class="upload", reason="queue_full") == 1
+    assert ADMISSION_WAIT.count(route_class="upload") == 2
+
+
+async def test_shed_response_carries_cors_headers(one_upload_slot):
+    origin = {"Origin": "https://recorder.example"}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        uploads = [
+            asyncio.create_task(client.post("/v1/upload", json=UPLOAD))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.05)
+        shed = await client.post("/v1/upload", json=UPLOAD, headers=origin)
+        one_upload_slot.set()
+        await asyncio.gather(*uploads)
+
+    assert shed.status_code == 503
+    assert shed.headers["access-control-allow-origin"] == origin["Origin"]
+    assert "retry-after" in shed.headers["access-control-expose-headers"].lower()
+
+
+async def test_admission_control_can_be_disabled(one_upload_slot, monkeypatch):
+    monkeypatch.setattr(get_settings(), "admission_control_enabled", False)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        uploads = [
+            asyncio.create_task(client.post("/v1/upload", json=UPLOAD))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        one_upload_slot.set()
+        responses = await asyncio.gather(*uploads)
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
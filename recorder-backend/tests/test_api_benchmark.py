@@ -0,0 +1,270 @@
+"""Throughput and latency benchmark for the API hot paths.
+
+Runs the app in-process against an in-memory blob store seeded from
+recorder-content/dev and drives each endpoint with concurrent requests.
+Results are written as JSON so runs can be compared between commits:
+
+    BENCHMARK_OUTPUT=bench.json pytest tests/test_api_benchmark.py -s
+
+BENCHMARK_REQUESTS and BENCHMARK_CONCURRENCY scale the run, and
+BENCHMARK_BACKEND=filesystem swaps the in-memory Azure stand-in for the
+local filesystem backend. Without BENCHMARK_OUTPUT the results go to
+.benchmarks/api-<commit>.json.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+import uuid
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.main import app
+from app.routers.content import clear_theme_cache
+from app.storage_backends import FilesystemBackend
+from tests.fake_blob_storage import CONTENT_ROOT, FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+REQUESTS = int(os.environ.get("BENCHMARK_REQUESTS", "40"))
+CONCURRENCY = int(os.environ.get("BENCHMARK_CONCURRENCY", "8"))
+BACKEND = os.environ.get("BENCHMARK_BACKEND", "memory")
+RANGE_LENGTH = 64 * 1024
+
+RequestFactory = Callable[[AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+async def run_scenario(
+    client: AsyncClient,
+    send: RequestFactory,
+    expected_status: int,
+    requests: int = REQUESTS,
+    concurrency: int = CONCURRENCY,
+    before_each: Callable[[], None] | None = None,
+) -> dict:
+    """Issue requests with bounded concurrency and summarize their latency."""
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            if before_each is not None:
+                before_each()
+            started = time.perf_counter()
+            response = await send(client, index)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != expected_status:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 6),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            name: round(_percentile(latencies, fraction) * 1000, 3)
+            for name, fraction in (
+                ("p50", 0.50),
+                ("p90", 0.90),
+                ("p95", 0.95),
+                ("p99", 0.99),
+                ("max", 1.0),
+            )
+        },
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _output_path(commit: str | None) -> Path:
+    configured = os.environ.get("BENCHMARK_OUTPUT")
+    if configured:
+        return Path(configured)
+    return BACKEND_ROOT / ".benchmarks" / f"api-{commit or 'unknown'}.json"
+
+
+def _upload_payload(index: int) -> dict:
+    return {
+        "filename": f"{uuid.uuid4()}.m4a",
+        "metadata": {
+            "clientId": str(uuid.uuid4()),
+            "sessionId": str(uuid.uuid4()),
+            "contentType": "audio/m4a",
+            "recordingId": str(uuid.uuid4()),
+        },
+    }
+
+
+def _seed_recordings(store: FakeBlobStore, count: int) -> list[tuple[str, str, str]]:
+    ids = []
+    for _ in range(count):
+        client_id, session_id, recording_id = (str(uuid.uuid4()) for _ in range(3))
+        prefix = f"uploads/audio_and_metadata/{client_id}/{session_id}/"
+        store.put(f"{prefix}{recording_id}.m4a", b"\x00" * 4096)
+        store.put(f"{prefix}{recording_id}.json", b"{}")
+        ids.append((client_id, session_id, recording_id))
+    return ids
+
+
+@contextmanager
+def _use_backend(store: FakeBlobStore, root: Path) -> Iterator[None]:
+    """Route app.storage to the selected benchmark backend."""
+    if BACKEND == "filesystem":
+        # Link the checked-in content so uploads and deletes stay in root.
+        for folder in ("themes", "media"):
+            (root / folder).symlink_to(CONTENT_ROOT / "dev" / folder)
+        backend = FilesystemBackend(root)
+        for name, data in store.blobs.items():
+            if name.startswith("uploads/"):
+                FilesystemBackend._write_sync(backend.path_for(name), data)
+        with patch("app.storage.get_storage_backend", return_value=backend):
+            yield
+        return
+
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield
+
+
+@pytest.mark.skipif(
+    not (CONTENT_ROOT / "dev" / "themes").is_dir(),
+    reason="recorder-content not present",
+)
+async def test_api_benchmark(tmp_path):
+    store = FakeBlobStore().seed_from_content("dev")
+    theme_blob = next(name for name in store.blobs if name.startswith("theme/"))
+    _, theme_id, lang_file = theme_blob.split("/")
+    lang = lang_file.removesuffix(".json")
+    # A median-sized file keeps the run short while staying representative.
+    media = sorted(
+        (
+            (name, data)
+            for name, data in store.blobs.items()
+            if name.startswith("media/")
+        ),
+        key=lambda item: len(item[1]),
+    )
+    media_name, media_bytes = media[len(media) // 2]
+    media_file = media_name.removeprefix("media/")
+    range_start = len(media_bytes) // 2
+
+    recordings = _seed_recordings(store, REQUESTS * 3)
+    by_client = iter(recordings[:REQUESTS])
+    by_session = iter(recordings[REQUESTS : 2 * REQUESTS])
+    by_recording = iter(recordings[2 * REQUESTS :])
+
+    def theme_path(index: int) -> str:
+        return f"/v1/theme/{theme_id}?lang={lang}"
+
+    scenarios: dict[str, tuple[RequestFactory, int, dict]] = {
+        "list_themes": (lambda c, i: c.get("/v1/theme"), 200, {}),
+        "theme_cached": (lambda c, i: c.get(theme_path(i)), 200, {}),
+        "theme_cold": (
+            lambda c, i: c.get(theme_path(i)),
+            200,
+            {"concurrency": 1, "before_each": clear_theme_cache},
+        ),
+        "media_full": (lambda c, i: c.get(f"/v1/media/{media_file}"), 200, {}),
+        "media_range": (
+            lambda c, i: c.get(
+                f"/v1/media/{media_file}",
+                headers={
+                    "Range": f"bytes={range_start}-{range_start + RANGE_LENGTH - 1}"
+                },
+            ),
+            206,
+            {},
+        ),
+        "upload_init": (
+            lambda c, i: c.post("/v1/upload", json=_upload_payload(i)),
+            200,
+            {},
+        ),
+        "delete_client": (
+            lambda c, i: c.delete(f"/v1/recordings/{next(by_client)[0]}"),
+            200,
+            {},
+        ),
+        "delete_session": (
+            lambda c, i: c.delete("/v1/recordings/{}/{}".format(*next(by_session)[:2])),
+            200,
+            {},
+        ),
+        "delete_recording": (
+            lambda c, i: c.delete(
+                "/v1/recordings/{}/{}/{}".format(*next(by_recording))
+            ),
+            200,
+            {},
+        ),
+    }
+
+    results: dict[str, dict] = {}
+    with _use_backend(store, tmp_path):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, (send, status, options) in scenarios.items():
+                clear_theme_cache()
+                results[name] = await run_scenario(client, send, status, **options)
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "backend": BACKEND,
+        "media": {"file": media_file, "bytes": len(media_bytes)},
+        "scenarios": results,
+    }
+    output = _output_path(commit)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+
+    print(f"\nbenchmark results written to {output}")
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        print(
+            f"{name:>16}: {result['throughput_rps']:>9.1f} req/s  "
+            f"p50 {latency['p50']:.2f} ms  p95 {latency['p95']:.2f} ms  "
+            f"p99 {latency['p99']:.2f} ms"
+        )
+
+    assert all(result["errors"] == 0 for result in results.values()), results
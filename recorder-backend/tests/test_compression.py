@@ -0,0 +1,136 @@
+"""Tests for content-encoding negotiation and the compression middleware."""
+
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+from app.compression import (
+    CompressionMiddleware,
+    encoded_etag,
+    negotiate_encoding,
+    parse_accept_encoding,
+)
+from app.main import app
+from app.media_types import is_compressible_content_type
+
+pytestmark = pytest.mark.anyio
+
+
+def test_parse_accept_encoding_reads_q_values():
+    assert parse_accept_encoding("gzip;q=0.5, br, identity;q=0") == {
+        "gzip": 0.5,
+        "br": 1.0,
+        "identity": 0.0,
+    }
+
+
+def test_negotiate_encoding_prefers_server_order_on_ties():
+    assert negotiate_encoding("gzip, br", ("br", "gzip")) == "br"
+
+
+def test_negotiate_encoding_honours_client_q_values():
+    assert negotiate_encoding("gzip;q=1, br;q=0.1", ("br", "gzip")) == "gzip"
+
+
+def test_negotiate_encoding_skips_refused_encodings():
+    assert negotiate_encoding("br;q=0, *;q=0", ("br", "gzip")) is None
+    assert negotiate_encoding(None, ("br", "gzip")) is None
+
+
+def test_encoded_etag_differs_per_encoding():
+    assert encoded_etag('"abc"', "br") == '"abc-br"'
+    assert encoded_etag('W/"abc"', "gzip") == 'W/"abc-gzip"'
+
+
+async def test_dynamic_compression_changes_the_etag():
+    async def report(request):
+        return Response(b"x" * 2000, media_type="text/plain", headers={"ETag": '"r1"'})
+
+    inner = Starlette(routes=[Route("/report", report)])
+    transport = ASGITransport(app=CompressionMiddleware(inner))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        plain = await client.get("/report", headers={"Accept-Encoding": "identity"})
+        gzipped = await client.get("/report", headers={"Accept-Encoding": "gzip"})
+
+    assert plain.headers["etag"] == '"r1"'
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == '"r1-gzip"'
+
+
+def test_precompressed_media_types_are_not_compressible():
+    assert is_compressible_content_type("application/json")
+    assert is_compressible_content_type("image/svg+xml")
+    assert not is_compressible_content_type("image/jpeg")
+    assert not is_compressible_content_type("video/mp4")
+    assert not is_compressible_content_type("audio/mp4")
+    assert not is_compressible_content_type(None)
+
+
+@patch("app.routers.content.list_available_languages_by_id", new_callable=AsyncMock)
+async def test_large_json_response_is_gzipped(mock_list):
+    mock_list.return_value = {f"theme-{i}": ["fi", "se", "sma"] for i in range(50)}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/v1/theme", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert len(response.json()) == 50
+
+
+@patch("app.routers.content.list_available_languages_by_id", new_callable=AsyncMock)
+async def test_small_json_response_is_not_compressed(mock_list):
+    mock_list.return_value = {"theme-x": ["fi"]}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/v1/theme", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+@patch("app.routers.media.load_blob_binary", new_callable=AsyncMock)
+async def test_jpeg_media_is_not_compressed(mock_load):
+    mock_load.return_value = b"\xff\xd8" + b"\x00" * 4096
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(
+            "/v1/media/photo.jpg", headers={"Accept-Encoding": "gzip, br"}
+        )
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert len(response.content) == 4098
+
+
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+async def test_pre_encoded_theme_is_not_compressed_twice(mock_load):
+    payload = {
+        "mediaState": {"title": "t" * 2000, "body1": "b1", "body2": "b2"},
+        "schedule": {"items": []},
+    }
+    mock_load.return_value = json.dumps(payload).encode("utf-8")
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(
+            "/v1/theme/theme-1",
+            params={"lang": "fi"},
+            headers={"Accept-Encoding": "gzip"},
+        )
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].endswith('-gzip"')
+    # Decoding a single gzip layer must yield the JSON document.
+    assert response.json()["mediaState"]["title"] == "t" * 2000
@@ -1,5 +1,7 @@
 """Endpoint tests for language-aware theme loading."""
 
+import json
+import sys
 from unittest.mock import AsyncMock, patch
 
 import pytest
@@ -11,6 +13,10 @@ from app.storage import StorageError
 pytestmark = pytest.mark.anyio
 
 
+def _theme_bytes(payload: dict) -> bytes:
+    return json.dumps(payload).encode("utf-8")
+
+
 def _theme_payload() -> dict:
     return {
         "mediaState": {
@@ -34,9 +40,9 @@ async def test_theme_requires_lang_query_param():
     assert response.status_code == 422
 
 
-@patch("app.routers.content.load_blob_json", new_callable=AsyncMock)
-async def test_theme_loads_language_specific_blob(mock_load_blob_json):
-    mock_load_blob_json.return_value = _theme_payload()
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+async def test_theme_loads_language_specific_blob(mock_load_blob_binary):
+    mock_load_blob_binary.return_value = _theme_bytes(_theme_payload())
 
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as client:
@@ -44,14 +50,14 @@ async def test_theme_loads_language_specific_blob(mock_load_blob_json):
 
     assert response.status_code == 200
     assert response.json()["id"] == "theme-1"
-    mock_load_blob_json.assert_awaited_once_with("theme/theme-1/fi.json")
+    mock_load_blob_binary.assert_awaited_once_with("theme/theme-1/fi.json")
 
 
-@patch("app.routers.content.load_blob_json", new_callable=AsyncMock)
-async def test_theme_maps_local_media_url_to_media_route(mock_load_blob_json):
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+async def test_theme_maps_local_media_url_to_media_route(mock_load_blob_binary):
     payload = _theme_payload()
     payload["mediaState"]["url"] = "local image.jpg"
-    mock_load_blob_json.return_value = payload
+    mock_load_blob_binary.return_value = _theme_bytes(payload)
 
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as client:
@@ -61,9 +67,9 @@ async def test_theme_maps_local_media_url_to_media_route(mock_load_blob_json):
     assert response.json()["mediaState"]["url"] == "/v1/media/local%20image.jpg"
 
 
-@patch("app.routers.content.load_blob_json", new_callable=AsyncMock)
-async def test_theme_missing_language_returns_404(mock_load_blob_json):
-    mock_load_blob_json.side_effect = StorageError("not found")
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+async def test_theme_missing_language_returns_404(mock_load_blob_binary):
+    mock_load_blob_binary.side_effect = StorageError("not found")
 
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as client:
@@ -72,6 +78,75 @@ async def test_theme_missing_language_returns_404(mock_load_blob_json):
     assert response.status_code == 404
 
 
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+async def test_theme_invalid_json_returns_422(mock_load_blob_binary):
+    mock_load_blob_binary.return_value = b"{not json"
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/v1/theme/theme-bad", params={"lang": "fi"})
+
+    assert response.status_code == 422
+
+
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+async def test_theme_body_is_cached_between_requests(mock_load_blob_binary):
+    mock_load_blob_binary.return_value = _theme_bytes(_theme_payload())
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get("/v1/theme/theme-1", params={"lang": "fi"})
+        second = await client.get("/v1/theme/theme-1", params={"lang": "FI"})
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert first.headers["etag"] == second.headers["etag"]
+    mock_load_blob_binary.assert_awaited_once()
+
+
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+async def test_theme_if_none_match_returns_304(mock_load_blob_binary):
+    mock_load_blob_binary.return_value = _theme_bytes(_theme_payload())
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get("/v1/theme/theme-1", params={"lang": "fi"})
+        second = await client.get(
+            "/v1/theme/theme-1",
+            params={"lang": "fi"},
+            headers={"If-None-Match": first.headers["etag"]},
+        )
+
+    assert second.status_code == 304
+    assert second.content == b""
+
+
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+async def test_theme_serves_compressed_variant_when_accepted(mock_load_blob_binary):
+    mock_load_blob_binary.return_value = _theme_bytes(_theme_payload())
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        plain = await client.get(
+            "/v1/theme/theme-1",
+            params={"lang": "fi"},
+            headers={"Accept-Encoding": "identity"},
+        )
+        gzipped = await client.get(
+            "/v1/theme/theme-1",
+            params={"lang": "fi"},
+            headers={"Accept-Encoding": "gzip"},
+        )
+
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["content-type"] == "application/json"
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in gzipped.headers["vary"]
+    # A strong validator must differ between encodings of the same body.
+    assert gzipped.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+    assert gzipped.json() == plain.json()
+
+
 # ── list endpoints ────────────────────────────────────────────────────────────
 
 
@@ -90,12 +165,9 @@ async def test_list_themes_returns_availability(mock_list):
 # ── per-ID discovery endpoints ────────────────────────────────────────────────
 
 
-@patch("app.routers.content.list_blobs_with_prefix", new_callable=AsyncMock)
-async def test_theme_languages_returns_sorted_list(mock_list_blobs):
-    mock_list_blobs.return_value = [
-        "theme/theme-1/sma.json",
-        "theme/theme-1/fi.json",
-    ]
+@patch("app.routers.content.list_available_languages_by_id", new_callable=AsyncMock)
+async def test_theme_languages_returns_sorted_list(mock_list):
+    mock_list.return_value = {"theme-1": ["fi", "sma"]}
 
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as client:
@@ -105,12 +177,120 @@ async def test_theme_languages_returns_sorted_list(mock_list_blobs):
     assert response.json() == {"id": "theme-1", "availableLanguages": ["fi", "sma"]}
 
 
-@patch("app.routers.content.list_blobs_with_prefix", new_callable=AsyncMock)
-async def test_theme_languages_returns_404_when_empty(mock_list_blobs):
-    mock_list_blobs.return_value = []
+@patch("app.routers.content.list_available_languages_by_id", new_callable=AsyncMock)
+async def test_theme_languages_returns_404_when_empty(mock_list):
+    mock_list.return_value = {}
 
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as client:
         response = await client.get("/v1/theme/missing-id/languages")
 
     assert response.status_code == 404
+
+
+async def test_theme_languages_sees_themes_past_the_default_listing_cap():
+    names = [f"theme/theme-{i:04d}/fi.json" for i in range(1500)]
+
+    async def list_blobs(prefix, max_results=1000):
+        return names[:max_results]
+
+    transport = ASGITransport(app=app)
+    with patch("app.storage.list_blobs_with_prefix", side_effect=list_blobs):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/v1/theme/theme-1400/languages")
+
+    assert response.status_code == 200
+    assert response.json()["availableLanguages"] == ["fi"]
+
+
+@patch("app.routers.content.list_available_languages_by_id", new_callable=AsyncMock)
+async def test_theme_listing_is_shared_and_cached(mock_list):
+    mock_list.return_value = {"theme-1": ["fi", "sma"], "theme-2": ["se"]}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        listing = await client.get("/v1/theme")
+        first = await client.get("/v1/theme/theme-1/languages")
+        second = await client.get("/v1/theme/theme-2/languages")
+
+    assert len(listing.json()) == 2
+    assert first.json()["availableLanguages"] == ["fi", "sma"]
+    assert second.json()["availableLanguages"] == ["se"]
+    mock_list.assert_awaited_once_with("theme/", max_results=sys.maxsize)
+
+
+# ── bundle endpoint ───────────────────────────────────────────────────────────
+
+
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+async def test_theme_bundle_returns_requested_languages(mock_load_blob_binary):
+    def _load(blob_name: str) -> bytes:
+        payload = _theme_payload()
+        payload["mediaState"]["title"] = blob_name
+        return _theme_bytes(payload)
+
+    mock_load_blob_binary.side_effect = _load
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(
+            "/v1/theme/theme-1/bundle", params={"langs": "se, SMA,smj,se"}
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == "theme-1"
+    assert list(body["themes"]) == ["se", "sma", "smj"]
+    assert body["themes"]["sma"]["mediaState"]["title"] == "theme/theme-1/sma.json"
+    assert body["themes"]["smj"]["id"] == "theme-1"
+    assert body["missingLanguages"] == []
+    assert mock_load_blob_binary.await_count == 3
+
+
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+async def test_theme_bundle_reports_missing_languages(mock_load_blob_binary):
+    def _load(blob_name: str) -> bytes:
+        if blob_name.endswith("/sma.json"):
+            raise StorageError("not found")
+        return _theme_bytes(_theme_payload())
+
+    mock_load_blob_binary.side_effect = _load
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(
+            "/v1/theme/theme-1/bundle", params={"langs": "se,sma"}
+        )
+
+    assert response.status_code == 200
+    assert list(response.json()["themes"]) == ["se"]
+    assert response.json()["missingLanguages"] == ["sma"]
+
+
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+@patch("app.routers.content.list_available_languages_by_id", new_callable=AsyncMock)
+async def test_theme_bundle_defaults_to_available_languages(
+    mock_list, mock_load_blob_binary
+):
+    mock_list.return_value = {"theme-1": ["se", "smj"]}
+    mock_load_blob_binary.return_value = _theme_bytes(_theme_payload())
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/v1/theme/theme-1/bundle")
+
+    assert response.status_code == 200
+    assert list(response.json()["themes"]) == ["se", "smj"]
+
+
+@patch("app.routers.content.load_blob_binary", new_callable=AsyncMock)
+async def test_theme_bundle_returns_404_when_nothing_found(mock_load_blob_binary):
+    mock_load_blob_binary.side_effect = StorageError("not found")
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(
+            "/v1/theme/theme-404/bundle", params={"langs": "se,sma"}
+        )
+
+    assert response.status_code == 404
@@ -0,0 +1,130 @@
+"""Tests for serving stale themes and listings during refreshes and outages."""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.main import app
+from app.metrics import REGISTRY, STORAGE_DURATION
+from app.routers import content
+from app.settings import get_settings
+from app.storage import StorageError
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+
+def _theme(title: str) -> bytes:
+    return json.dumps(
+        {
+            "mediaState": {"title": title, "body1": "b1", "body2": "b2"},
+            "schedule": None,
+        }
+    ).encode("utf-8")
+
+
+@pytest.fixture
+def store():
+    REGISTRY.reset()
+    store = FakeBlobStore()
+    store.put("theme/theme-1/se.json", _theme("old"))
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield store
+    REGISTRY.reset()
+
+
+@pytest.fixture
+def expire_immediately():
+    with (
+        patch.object(content._theme_cache, "ttl_seconds", 0.0),
+        patch.object(content._listing_cache, "ttl_seconds", 0.0),
+    ):
+        yield
+
+
+async def _get_theme(client: AsyncClient):
+    return await client.get("/v1/theme/theme-1", params={"lang": "se"})
+
+
+async def test_stale_theme_is_served_while_one_refresh_runs(store, expire_immediately):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await _get_theme(client)
+        store.put("theme/theme-1/se.json", _theme("new"))
+        stale = await asyncio.gather(*(_get_theme(client) for _ in range(5)))
+        await asyncio.sleep(0.05)  # Let the background refresh finish.
+        loads = STORAGE_DURATION.count(operation="load_binary", outcome="ok")
+        refreshed = await _get_theme(client)
+
+    assert "warning" not in first.headers
+    assert {r.json()["mediaState"]["title"] for r in stale} == {"old"}
+    assert stale[0].headers["warning"] == '110 - "Response is Stale"'
+    assert refreshed.json()["mediaState"]["title"] == "new"
+    assert loads == 2
+
+
+async def test_stale_theme_is_served_when_storage_fails(
+    store, expire_immediately, monkeypatch
+):
+    monkeypatch.setattr(get_settings(), "content_stale_while_revalidate_seconds", 0)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await _get_theme(client)
+        with patch(
+            "app.routers.content.load_blob_binary", side_effect=StorageError("down")
+        ):
+            response = await _get_theme(client)
+
+    assert response.status_code == 200
+    assert response.json()["mediaState"]["title"] == "old"
+    assert response.headers["warning"] == '111 - "Revalidation Failed"'
+    assert "age" in response.headers
+
+
+@pytest.mark.parametrize("revalidate_seconds", [0, 300])
+async def test_deleted_theme_is_not_served_stale(
+    store, expire_immediately, monkeypatch, revalidate_seconds
+):
+    monkeypatch.setattr(
+        get_settings(), "content_stale_while_revalidate_seconds", revalidate_seconds
+    )
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await _get_theme(client)
+        del store.blobs["theme/theme-1/se.json"]
+        if revalidate_seconds:
+            # The first request after expiry still gets the stale copy while
+            # the background refresh finds the theme gone.
+            await _get_theme(client)
+            await asyncio.sleep(0.05)
+        response = await _get_theme(client)
+
+    assert response.status_code == 404
+
+
+async def test_listing_falls_back_to_stale_copy_on_error(
+    store, expire_immediately, monkeypatch
+):
+    monkeypatch.setattr(get_settings(), "content_stale_while_revalidate_seconds", 0)
+    transport = ASGITransport(app=app)
+    failing = patch(
+        "app.routers.content.list_available_languages_by_id",
+        side_effect=StorageError("down"),
+    )
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/v1/theme")
+        with failing:
+            stale = await client.get("/v1/theme")
+        content.clear_theme_cache()
+        with failing:
+            empty = await client.get("/v1/theme")
+
+    assert stale.status_code == 200
+    assert stale.json() == [{"id": "theme-1", "availableLanguages": ["se"]}]
+    assert stale.headers["warning"] == '111 - "Revalidation Failed"'
+    assert empty.status_code == 500
@@ -0,0 +1,100 @@
+"""Tests for the background content change watcher."""
+
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.content_watcher import CONTENT_VERSION_BLOB, ContentWatcher, diff_etags
+from app.main import app
+from app.routers.content import preload_themes
+from app.routers.media import preload_media
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+
+def _theme(title: str) -> bytes:
+    return json.dumps(
+        {
+            "mediaState": {"title": title, "body1": "b1", "body2": "b2"},
+            "schedule": None,
+        }
+    ).encode("utf-8")
+
+
+@pytest.fixture
+def store():
+    store = FakeBlobStore()
+    store.put("theme/theme-1/se.json", _theme("old se"))
+    store.put("theme/theme-1/fi.json", _theme("old fi"))
+    store.put("media/a.jpg", b"old")
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield store
+
+
+async def _get(path: str, **params):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(path, params=params)
+
+
+def test_diff_etags_reports_added_removed_and_modified():
+    old = {"a": "1", "b": "1", "c": "1"}
+    new = {"a": "1", "b": "2", "d": "1"}
+
+    assert diff_etags(old, new) == {"b", "c", "d"}
+
+
+async def test_changed_blobs_are_refreshed_and_others_kept(store):
+    await preload_themes()
+    await preload_media({"a.jpg"}, max_file_bytes=1024)
+    watcher = ContentWatcher()
+    assert await watcher.poll_once() == set()
+
+    store.put("theme/theme-1/se.json", _theme("new se"))
+    store.put("media/a.jpg", b"new")
+    store.put(CONTENT_VERSION_BLOB, b'{"version": 2}')
+    changed = await watcher.poll_once()
+
+    assert changed == {"theme/theme-1/se.json", "media/a.jpg"}
+    # The changed theme was reloaded eagerly; the unchanged one stays cached.
+    store.blobs.pop("theme/theme-1/se.json")
+    store.blobs.pop("theme/theme-1/fi.json")
+    se = await _get("/v1/theme/theme-1", lang="se")
+    fi = await _get("/v1/theme/theme-1", lang="fi")
+    assert se.json()["mediaState"]["title"] == "new se"
+    assert fi.json()["mediaState"]["title"] == "old fi"
+    assert (await _get("/v1/media/a.jpg")).content == b"new"
+
+
+async def test_unchanged_marker_skips_the_content_listing(store):
+    store.put(CONTENT_VERSION_BLOB, b'{"version": 1}')
+    watcher = ContentWatcher()
+    await watcher.poll_once()
+
+    store.put("theme/theme-1/se.json", _theme("sneaky"))
+    marker_etag = store.properties(CONTENT_VERSION_BLOB).etag
+    with patch(
+        "app.content_watcher.list_blob_etags", new_callable=AsyncMock
+    ) as mock_list:
+        mock_list.return_value = {CONTENT_VERSION_BLOB: marker_etag}
+        assert await watcher.poll_once() == set()
+    mock_list.assert_called_once_with(CONTENT_VERSION_BLOB)
+
+
+async def test_new_theme_invalidates_the_listing(store):
+    assert (await _get("/v1/theme")).json() == [
+        {"id": "theme-1", "availableLanguages": ["fi", "se"]}
+    ]
+    watcher = ContentWatcher()
+    await watcher.poll_once()
+
+    store.put("theme/theme-2/se.json", _theme("second"))
+    assert await watcher.poll_once() == {"theme/theme-2/se.json"}
+
+    listing = (await _get("/v1/theme")).json()
+    assert [theme["id"] for theme in listing] == ["theme-1", "theme-2"]
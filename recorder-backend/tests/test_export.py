@@ -0,0 +1,132 @@
+"""Tests for the streaming ZIP export of a client's uploads."""
+
+import asyncio
+import io
+import zipfile
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.export import stream_client_archive
+from app.main import app
+from app.manifests import record_upload
+from app.settings import get_settings
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+CLIENT_ID = "550e8400-e29b-41d4-a716-446655440000"
+SESSION_ID = "7c9e6679-7425-40de-944b-e07fc1f90ae7"
+AUDIO = f"uploads/audio_and_metadata/{CLIENT_ID}/{SESSION_ID}/take.flac"
+METADATA = f"uploads/audio_and_metadata/metadata/{CLIENT_ID}/{SESSION_ID}/take.json"
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(get_settings(), "export_chunk_size", 7)
+    monkeypatch.setattr(get_settings(), "export_prefetch_blobs", 2)
+
+
+@pytest.fixture
+def store():
+    store = FakeBlobStore()
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield store
+
+
+async def _export(client_id: str = CLIENT_ID):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(f"/v1/recordings/{client_id}/export")
+
+
+async def test_export_streams_audio_and_metadata(store):
+    audio = bytes(range(256)) * 3
+    await record_upload(CLIENT_ID, [METADATA, AUDIO])
+    store.put(AUDIO, audio)
+    store.put(METADATA, b'{"clientId": "' + CLIENT_ID.encode() + b'"}')
+    store.put("uploads/audio_and_metadata/other/take.flac", b"not exported")
+
+    response = await _export()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert f"recordings-{CLIENT_ID}.zip" in response.headers["content-disposition"]
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.testzip() is None
+        entries = {info.filename: info for info in archive.infolist()}
+        assert set(entries) == {
+            f"{CLIENT_ID}/{SESSION_ID}/take.flac",
+            f"metadata/{CLIENT_ID}/{SESSION_ID}/take.json",
+        }
+        audio_entry = entries[f"{CLIENT_ID}/{SESSION_ID}/take.flac"]
+        assert audio_entry.compress_type == zipfile.ZIP_STORED
+        assert archive.read(audio_entry) == audio
+        assert CLIENT_ID.encode() in archive.read(
+            f"metadata/{CLIENT_ID}/{SESSION_ID}/take.json"
+        )
+
+
+async def test_blobs_never_uploaded_are_left_out(store):
+    await record_upload(CLIENT_ID, [METADATA, AUDIO])
+    store.put(METADATA, b"{}")
+
+    response = await _export()
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == [f"metadata/{CLIENT_ID}/{SESSION_ID}/take.json"]
+
+
+async def test_empty_blobs_become_empty_entries(store):
+    await record_upload(CLIENT_ID, [METADATA, AUDIO])
+    store.put(AUDIO, b"")
+    store.put(METADATA, b"{}")
+
+    response = await _export()
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.testzip() is None
+        assert archive.read(f"{CLIENT_ID}/{SESSION_ID}/take.flac") == b""
+        assert archive.read(f"metadata/{CLIENT_ID}/{SESSION_ID}/take.json") == b"{}"
+
+
+async def test_many_blobs_keep_their_order(store):
+    names = [
+        f"uploads/audio_and_metadata/{CLIENT_ID}/take-{index:02d}.m4a"
+        for index in range(12)
+    ]
+    await record_upload(CLIENT_ID, names)
+    for index, name in enumerate(names):
+        store.put(name, f"audio {index}".encode() * index)
+
+    response = await _export()
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == [
+            f"{CLIENT_ID}/take-{i:02d}.m4a" for i in range(12)
+        ]
+        assert archive.read(f"{CLIENT_ID}/take-05.m4a") == b"audio 5" * 5
+
+
+async def test_closing_the_stream_stops_prefetching(store):
+    names = [f"uploads/audio_and_metadata/{CLIENT_ID}/take-{i}.m4a" for i in range(6)]
+    for name in names:
+        store.put(name, b"audio" * 10)
+    stream = stream_client_archive(names)
+
+    await anext(stream)
+    await stream.aclose()
+
+    fetches = [t for t in asyncio.all_tasks() if t.get_coro().__name__ == "_fetch"]
+    assert fetches == []
+
+
+async def test_unknown_and_invalid_clients(store):
+    unknown = await _export()
+    invalid = await _export("not-a-uuid")
+
+    assert unknown.status_code == 404
+    assert invalid.status_code == 400
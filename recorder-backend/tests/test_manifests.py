@@ -0,0 +1,189 @@
+"""Tests for per-client manifests of uploaded blobs."""
+
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app import manifests
+from app.main import app
+from app.manifests import (
+    client_blob_names,
+    load_manifest,
+    manifest_blob_name,
+    reconcile_manifests,
+)
+from app.storage_backends import FilesystemBackend
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+CLIENT_ID = "550e8400-e29b-41d4-a716-446655440000"
+SESSION_ID = "7c9e6679-7425-40de-944b-e07fc1f90ae7"
+OTHER_SESSION_ID = "3fa85f64-5717-4562-b3fc-2c963f66afa6"
+AUDIO = f"uploads/audio_and_metadata/{CLIENT_ID}"
+METADATA = f"uploads/audio_and_metadata/metadata/{CLIENT_ID}"
+
+
+@pytest.fixture
+def store():
+    store = FakeBlobStore()
+    manifests._current_segments.clear()
+    with (
+        patch(
+            "app.storage_backends.azure.get_blob_service_client",
+            side_effect=store.client,
+        ),
+        patch("app.routers.upload.generate_upload_sas_url", return_value="sas"),
+    ):
+        yield store
+
+
+@pytest.fixture
+async def client():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def _upload(client, store, filename: str, session_id: str | None = None):
+    metadata = {"clientId": CLIENT_ID, "contentType": "audio/m4a"}
+    if session_id:
+        metadata["sessionId"] = session_id
+    response = await client.post(
+        "/v1/upload", json={"filename": filename, "metadata": metadata}
+    )
+    assert response.status_code == 200
+    # The client uploads the audio itself with the SAS URL.
+    prefix = f"{AUDIO}/{session_id}/" if session_id else f"{AUDIO}/"
+    store.put(prefix + filename, b"audio")
+
+
+async def test_upload_is_recorded_before_its_blobs(store, client):
+    await _upload(client, store, "one.m4a")
+    await _upload(client, store, "two.m4a", SESSION_ID)
+
+    manifest = await load_manifest(CLIENT_ID)
+
+    assert manifest.complete
+    assert manifest.blob_names == {
+        f"{METADATA}/one.json",
+        f"{AUDIO}/one.m4a",
+        f"{METADATA}/{SESSION_ID}/two.json",
+        f"{AUDIO}/{SESSION_ID}/two.m4a",
+    }
+
+
+async def test_client_delete_uses_the_manifest(store, client):
+    await _upload(client, store, "one.m4a")
+    await _upload(client, store, "two.m4a", SESSION_ID)
+    store.put("uploads/audio_and_metadata/other/keep.m4a", b"audio")
+
+    with patch("app.manifests.list_blobs_with_prefix") as list_blobs:
+        response = await client.delete(f"/v1/recordings/{CLIENT_ID}")
+
+    assert response.status_code == 200
+    list_blobs.assert_not_called()
+    assert list(store.blobs) == ["uploads/audio_and_metadata/other/keep.m4a"]
+    assert store.deletes == 2
+
+
+async def test_session_delete_keeps_other_sessions(store, client):
+    await _upload(client, store, "one.m4a", SESSION_ID)
+    await _upload(client, store, "two.m4a", OTHER_SESSION_ID)
+
+    response = await client.delete(f"/v1/recordings/{CLIENT_ID}/{SESSION_ID}")
+
+    assert response.status_code == 200
+    assert set(store.blobs) == {
+        f"{METADATA}/{OTHER_SESSION_ID}/two.json",
+        f"{AUDIO}/{OTHER_SESSION_ID}/two.m4a",
+        manifest_blob_name(CLIENT_ID),
+    }
+
+
+async def test_session_delete_removes_resumable_upload_records(store, client):
+    response = await client.post(
+        "/v1/upload/resumable",
+        json={
+            "filename": "long.flac",
+            "metadata": {
+                "clientId": CLIENT_ID,
+                "sessionId": SESSION_ID,
+                "contentType": "audio/flac",
+            },
+            "size": 10,
+        },
+    )
+    record = f"uploads/resumable/{response.json()['uploadId']}.json"
+    assert record in store.blobs
+    await _upload(client, store, "two.m4a", OTHER_SESSION_ID)
+
+    await client.delete(f"/v1/recordings/{CLIENT_ID}/{SESSION_ID}")
+
+    assert record not in store.blobs
+    assert f"{AUDIO}/{OTHER_SESSION_ID}/two.m4a" in store.blobs
+
+
+async def test_full_manifest_rolls_over_to_a_new_segment(store, client, monkeypatch):
+    store.max_append_blocks = 2
+    monkeypatch.setattr(manifests, "MAX_APPEND_BLOCKS", 2)
+    filenames = [f"take-{index}.m4a" for index in range(5)]
+    for filename in filenames:
+        await _upload(client, store, filename)
+
+    manifest = await load_manifest(CLIENT_ID)
+
+    assert manifest.complete
+    assert manifest.segments == [
+        manifest_blob_name(CLIENT_ID),
+        manifest_blob_name(CLIENT_ID, 1),
+        manifest_blob_name(CLIENT_ID, 2),
+    ]
+    assert {f"{AUDIO}/{filename}" for filename in filenames} <= manifest.blob_names
+
+    await client.delete(f"/v1/recordings/{CLIENT_ID}")
+
+    assert not [name for name in store.blobs if name.startswith("uploads/")]
+
+
+async def test_legacy_uploads_are_listed_until_reconciled(store, client):
+    store.put(f"{AUDIO}/old.m4a", b"audio")
+    store.put(f"{METADATA}/old.json", b"{}")
+    await _upload(client, store, "new.m4a")
+
+    assert not (await load_manifest(CLIENT_ID)).complete
+    assert f"{AUDIO}/old.m4a" in await client_blob_names(CLIENT_ID)
+
+    repaired = await reconcile_manifests()
+    again = await reconcile_manifests()
+
+    manifest = await load_manifest(CLIENT_ID)
+    assert repaired == {CLIENT_ID: 2}
+    assert again == {}
+    assert manifest.complete
+    assert {f"{AUDIO}/old.m4a", f"{METADATA}/old.json"} <= manifest.blob_names
+
+
+async def test_filesystem_backend_keeps_manifests(tmp_path, client):
+    backend = FilesystemBackend(tmp_path, public_url="http://test")
+    with (
+        patch("app.storage.get_storage_backend", return_value=backend),
+        patch("app.routers.upload.generate_upload_sas_url", return_value="sas"),
+    ):
+        for filename in ("one.m4a", "two.m4a"):
+            response = await client.post(
+                "/v1/upload",
+                json={
+                    "filename": filename,
+                    "metadata": {"clientId": CLIENT_ID, "contentType": "audio/m4a"},
+                },
+            )
+            assert response.status_code == 200
+        names = await client_blob_names(CLIENT_ID)
+        deleted = await client.delete(f"/v1/recordings/{CLIENT_ID}")
+
+    assert len(names) == 4
+    assert deleted.status_code == 200
+    assert not (tmp_path / manifest_blob_name(CLIENT_ID)).exists()
+    assert not list((tmp_path / "uploads/audio_and_metadata").rglob("*.json"))
@@ -0,0 +1,94 @@
+"""Tests for the aligned-block cache behind media range requests."""
+
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.block_cache import BlockCache
+from app.main import app
+from app.metrics import REGISTRY, STORAGE_DURATION
+from app.storage import BlobModifiedError
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+VIDEO = bytes(range(256)) * 4
+
+
+def _block_loads() -> int:
+    return STORAGE_DURATION.count(operation="load_range", outcome="ok")
+
+
+@pytest.fixture
+def store():
+    REGISTRY.reset()
+    store = FakeBlobStore()
+    store.put("media/clip.mp4", VIDEO)
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield store
+    REGISTRY.reset()
+
+
+@pytest.fixture
+def block_cache():
+    cache = BlockCache(block_size=100, max_bytes=10_000, properties_ttl_seconds=60)
+    with patch("app.routers.media._block_cache", cache):
+        yield cache
+
+
+async def test_ranges_are_assembled_from_aligned_blocks(store, block_cache):
+    assert await block_cache.read("media/clip.mp4", 150, 349) == VIDEO[150:350]
+    assert _block_loads() == 3
+
+    # Overlapping reads inside the same blocks come from memory.
+    assert await block_cache.read("media/clip.mp4", 0, 1) == VIDEO[0:2]
+    assert await block_cache.read("media/clip.mp4", 120, 299) == VIDEO[120:300]
+    assert _block_loads() == 4
+
+    # The short last block is fetched with the right length.
+    assert await block_cache.read("media/clip.mp4", 1000, 1023) == VIDEO[1000:]
+
+
+async def test_changed_blob_is_not_served_from_old_blocks(store, block_cache):
+    await block_cache.read("media/clip.mp4", 0, 99)
+    store.put("media/clip.mp4", b"\x01" * 1024)
+    block_cache.invalidate("media/clip.mp4")
+
+    assert await block_cache.read("media/clip.mp4", 0, 9) == b"\x01" * 10
+
+
+async def test_overwrite_under_cached_properties_is_detected(store, block_cache):
+    await block_cache.read("media/clip.mp4", 0, 99)
+    # Overwritten while the cached size and ETag are still fresh.
+    store.put("media/clip.mp4", b"\x01" * 1024)
+
+    with pytest.raises(BlobModifiedError):
+        await block_cache.read("media/clip.mp4", 50, 149)
+    assert await block_cache.read("media/clip.mp4", 50, 149) == b"\x01" * 100
+
+
+async def test_seeking_requests_rarely_touch_storage(store, block_cache):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        probe = await client.get("/v1/media/clip.mp4", headers={"Range": "bytes=0-1"})
+        segments = [
+            await client.get(
+                "/v1/media/clip.mp4", headers={"Range": f"bytes={start}-{start + 49}"}
+            )
+            for start in (0, 25, 50, 75)
+        ]
+        tail = await client.get("/v1/media/clip.mp4", headers={"Range": "bytes=1000-"})
+
+    assert probe.status_code == 206
+    assert probe.content == VIDEO[0:2]
+    assert probe.headers["content-range"] == "bytes 0-1/1024"
+    assert [s.content for s in segments] == [
+        VIDEO[start : start + 50] for start in (0, 25, 50, 75)
+    ]
+    assert tail.headers["content-range"] == "bytes 1000-1023/1024"
+    assert tail.content == VIDEO[1000:]
+    assert STORAGE_DURATION.count(operation="properties", outcome="ok") == 1
+    assert _block_loads() == 3
@@ -0,0 +1,206 @@
+"""Tests for Range handling of blob-backed media, including multi-range."""
+
+import asyncio
+from email.parser import BytesParser
+from email.policy import HTTP
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.block_cache import BlockCache
+from app.byte_ranges import (
+    MAX_RANGES,
+    MalformedRangeHeader,
+    RangeNotSatisfiable,
+    parse_range_header,
+)
+from app.main import app
+from app.metrics import REGISTRY, STORAGE_DURATION
+from app.storage import load_blob_binary_range
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+VIDEO = bytes(range(256)) * 8
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        ("bytes=0-1", [(0, 1)]),
+        ("bytes=100-", [(100, 999)]),
+        ("bytes=-100", [(900, 999)]),
+        ("bytes=-5000", [(0, 999)]),
+        ("bytes=900-5000", [(900, 999)]),
+        ("bytes=500-599, 0-9", [(0, 9), (500, 599)]),
+        ("bytes=0-9,5-19,20-29", [(0, 29)]),
+        ("bytes=0-9,2000-3000", [(0, 9)]),
+    ],
+)
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, 1000) == expected
+
+
+@pytest.mark.parametrize(
+    "header", ["bytes", "bytes=", "items=0-1", "bytes=a-b", "bytes=5-1", "bytes=1"]
+)
+def test_parse_range_header_rejects_malformed(header):
+    with pytest.raises(MalformedRangeHeader):
+        parse_range_header(header, 1000)
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        "bytes=1000-",
+        "bytes=-0",
+    ],
+)
+def test_parse_range_header_unsatisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header(header, 1000)
+
+
+def test_too_many_ranges_are_merged_across_the_narrowest_gaps():
+    starts = [i * 50 for i in range(MAX_RANGES + 1)]
+    starts[5] = 202  # Only one byte after the range at 200.
+    header = "bytes=" + ",".join(f"{start}-{start}" for start in starts)
+
+    merged = parse_range_header(header, 1000)
+
+    assert len(merged) == MAX_RANGES
+    assert (200, 202) in merged
+    assert all(any(s <= b <= e for s, e in merged) for b in starts)
+
+
+@pytest.fixture
+def store():
+    REGISTRY.reset()
+    store = FakeBlobStore()
+    store.put("media/clip.mp4", VIDEO)
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield store
+    REGISTRY.reset()
+
+
+async def _get(range_header: str):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get("/v1/media/clip.mp4", headers={"Range": range_header})
+
+
+async def test_multi_range_request_returns_multipart_byteranges(store):
+    response = await _get("bytes=1000-1099,0-9,5-19")
+
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    assert _multipart_parts(response) == [
+        ("bytes 0-19/2048", VIDEO[0:20]),
+        ("bytes 1000-1099/2048", VIDEO[1000:1100]),
+    ]
+
+
+async def test_malformed_range_does_not_download_the_blob(store):
+    response = await _get("bytes=abc")
+
+    assert response.status_code == 400
+    assert STORAGE_DURATION.count(operation="load_binary", outcome="ok") == 0
+    assert STORAGE_DURATION.count(operation="load_range", outcome="ok") == 0
+
+
+async def test_unsatisfiable_range_returns_416(store):
+    response = await _get("bytes=5000-")
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */2048"
+
+
+async def test_suffix_range_returns_file_tail(store):
+    response = await _get("bytes=-48")
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 2000-2047/2048"
+    assert response.content == VIDEO[-48:]
+
+
+@pytest.fixture
+def small_blocks():
+    # Blocks of 100 bytes; ranges over 100 bytes bypass the block cache.
+    cache = BlockCache(block_size=100, max_bytes=400, properties_ttl_seconds=60)
+    with patch("app.routers.media._block_cache", cache):
+        yield cache
+
+
+def _multipart_parts(response) -> list[tuple[str, bytes]]:
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {response.headers['content-type']}\r\n\r\n".encode()
+        + response.content
+    )
+    return [
+        (part["Content-Range"], part.get_payload(decode=True))
+        for part in message.iter_parts()
+    ]
+
+
+async def test_large_range_is_streamed_in_block_sized_reads(store, small_blocks):
+    response = await _get("bytes=0-")
+
+    assert response.status_code == 206
+    assert response.headers["content-length"] == "2048"
+    assert response.content == VIDEO
+    # 21 reads of at most one block each, none of them kept in the block cache.
+    assert STORAGE_DURATION.count(operation="load_range", outcome="ok") == 21
+    assert len(small_blocks._blocks) == 0
+
+
+async def test_multipart_reads_at_most_one_chunk_ahead(store, small_blocks):
+    in_flight = 0
+    most_in_flight = 0
+
+    async def tracked_read(*args, **kwargs):
+        nonlocal in_flight, most_in_flight
+        in_flight += 1
+        most_in_flight = max(most_in_flight, in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            return await load_blob_binary_range(*args, **kwargs)
+        finally:
+            in_flight -= 1
+
+    with patch("app.routers.media.load_blob_binary_range", side_effect=tracked_read):
+        response = await _get("bytes=0-299,400-699,800-1099,1200-1499,1600-1899")
+
+    assert response.status_code == 206
+    assert _multipart_parts(response) == [
+        (f"bytes {start}-{start + 299}/2048", VIDEO[start : start + 300])
+        for start in (0, 400, 800, 1200, 1600)
+    ]
+    assert most_in_flight == 1
+
+
+async def test_blob_changed_before_streaming_is_a_503(store, small_blocks):
+    # Cache the size and ETag, then overwrite the blob.
+    await _get("bytes=0-1")
+    store.put("media/clip.mp4", VIDEO[::-1])
+
+    response = await _get("bytes=0-299,1000-1299")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+async def test_fragmented_range_header_is_served(store):
+    response = await _get("bytes=" + ",".join(f"{i * 40}-{i * 40}" for i in range(40)))
+
+    assert response.status_code == 206
+    parts = _multipart_parts(response)
+    assert len(parts) == MAX_RANGES
+    for content_range, content in parts:
+        start, end = map(int, content_range.split()[1].split("/")[0].split("-"))
+        assert content == VIDEO[start : end + 1]
@@ -0,0 +1,86 @@
+"""Tests for serving media through direct read-only blob URLs."""
+
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.main import app
+from app.settings import get_settings
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def store():
+    store = FakeBlobStore()
+    store.put("media/clip one.mp4", b"\x00" * 100)
+    theme = {
+        "mediaState": {"title": "T", "body1": "b1", "body2": "b2", "url": "clip one.mp4"},
+        "schedule": None,
+    }
+    store.put("theme/theme-1/se.json", json.dumps(theme).encode("utf-8"))
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield store
+
+
+async def test_redirect_mode_returns_cached_read_only_url(store, monkeypatch):
+    monkeypatch.setattr(get_settings(), "media_delivery", "redirect")
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get("/v1/media/clip%20one.mp4")
+        second = await client.get("/v1/media/clip%20one.mp4")
+
+    assert first.status_code == 302
+    location = urlsplit(first.headers["location"])
+    assert location.path == "/devstoreaccount1/recorder-content/media/clip%20one.mp4"
+    assert parse_qs(location.query)["sp"] == ["r"]
+    assert second.headers["location"] == first.headers["location"]
+
+
+async def test_inline_mode_puts_read_urls_into_themes(store, monkeypatch):
+    monkeypatch.setattr(get_settings(), "media_delivery", "inline")
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        theme = await client.get("/v1/theme/theme-1", params={"lang": "se"})
+        media = await client.get("/v1/media/clip%20one.mp4")
+
+    url = theme.json()["mediaState"]["url"]
+    assert url.startswith("http://127.0.0.1:10000/devstoreaccount1/recorder-content/")
+    assert url == media.headers["location"]
+
+
+async def test_inline_urls_outlive_stale_theme_bodies(store, monkeypatch):
+    monkeypatch.setattr(get_settings(), "media_delivery", "inline")
+    settings = get_settings()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        theme = await client.get("/v1/theme/theme-1", params={"lang": "se"})
+
+    query = parse_qs(urlsplit(theme.json()["mediaState"]["url"]).query)
+    expires = datetime.fromisoformat(query["se"][0].replace("Z", "+00:00"))
+    # A body served at the end of its stale window still has a valid URL.
+    body_lifetime = timedelta(
+        seconds=2 * settings.theme_cache_ttl_seconds
+        + settings.content_stale_if_error_seconds
+    )
+    assert expires - datetime.now(timezone.utc) > body_lifetime + timedelta(
+        minutes=settings.media_read_url_expiry_minutes - 1
+    )
+
+
+async def test_proxy_mode_serves_bytes(store):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        theme = await client.get("/v1/theme/theme-1", params={"lang": "se"})
+        media = await client.get("/v1/media/clip%20one.mp4")
+
+    assert theme.json()["mediaState"]["url"] == "/v1/media/clip%20one.mp4"
+    assert media.status_code == 200
+    assert media.content == b"\x00" * 100
@@ -0,0 +1,131 @@
+"""Tests for request metrics, storage instrumentation and Server-Timing."""
+
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.main import app
+from app.metrics import (
+    CACHE_REQUESTS,
+    REGISTRY,
+    REQUEST_DURATION,
+    STORAGE_BYTES,
+    STORAGE_DURATION,
+    Counter,
+    Histogram,
+    format_server_timing,
+)
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    REGISTRY.reset()
+    yield
+    REGISTRY.reset()
+
+
+def _theme_bytes() -> bytes:
+    return json.dumps(
+        {
+            "mediaState": {"title": "Title", "body1": "b1", "body2": "b2"},
+            "schedule": {"items": []},
+        }
+    ).encode("utf-8")
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test.", ("op",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, op="a")
+    histogram.observe(0.5, op="a")
+    histogram.observe(5.0, op="a")
+
+    lines = histogram.render()
+
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{op="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{op="a",le="1"} 2' in lines
+    assert 'test_seconds_bucket{op="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{op="a"} 3' in lines
+
+
+def test_counter_rejects_unknown_labels():
+    counter = Counter("test_total", "Test.", ("cache",))
+    with pytest.raises(ValueError):
+        counter.inc(result="hit")
+
+
+def test_format_server_timing():
+    assert (
+        format_server_timing({"storage": 0.0123, "total": 0.02})
+        == "storage;dur=12.3, total;dur=20.0"
+    )
+
+
+@patch("app.storage_backends.azure.get_blob_service_client")
+async def test_theme_request_records_route_storage_and_cache_metrics(mock_client):
+    body = _theme_bytes()
+    store = FakeBlobStore()
+    store.put("theme/theme-1/fi.json", body)
+    mock_client.side_effect = store.client
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get("/v1/theme/theme-1", params={"lang": "fi"})
+        second = await client.get("/v1/theme/theme-1", params={"lang": "fi"})
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+
+    timing = first.headers["server-timing"]
+    assert "storage;dur=" in timing
+    assert "validate;dur=" in timing
+    assert "total;dur=" in timing
+    assert "storage" not in second.headers["server-timing"]
+
+    assert (
+        REQUEST_DURATION.count(method="GET", route="/v1/theme/{theme_id}", status="200")
+        == 2
+    )
+    assert STORAGE_DURATION.count(operation="load_binary", outcome="ok") == 1
+    assert STORAGE_BYTES.value(operation="load_binary", direction="in") == len(body)
+    assert CACHE_REQUESTS.value(cache="theme", result="miss") == 1
+    assert CACHE_REQUESTS.value(cache="theme", result="hit") == 1
+
+
+@patch("app.storage_backends.azure.get_blob_service_client")
+async def test_failed_storage_call_is_recorded_as_error(mock_client):
+    mock_client.side_effect = RuntimeError("boom")
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/v1/theme/theme-1", params={"lang": "fi"})
+
+    assert response.status_code == 404
+    assert STORAGE_DURATION.count(operation="load_binary", outcome="error") == 1
+
+
+@patch("app.routers.content.list_available_languages_by_id", new_callable=AsyncMock)
+async def test_metrics_endpoint_exposes_prometheus_text(mock_list):
+    mock_list.return_value = {"theme-1": ["fi"]}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/v1/theme")
+        await client.get("/does-not-exist")
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/v1/theme",status="200"} 1'
+        in text
+    )
+    assert 'route="unmatched",status="404"' in text
+    assert 'cache_requests_total{cache="theme_listing",result="miss"} 1' in text
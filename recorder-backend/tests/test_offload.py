@@ -0,0 +1,88 @@
+"""Tests for running CPU-heavy steps off the event loop."""
+
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.main import app
+from app.metrics import REGISTRY, _server_timing, add_server_timing
+from app.offload import CPU_TASKS, LOOP_LAG, monitor_loop_lag, run_cpu_bound
+from app.settings import get_settings
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    REGISTRY.reset()
+    yield
+    REGISTRY.reset()
+
+
+def _thread_name(seconds: float) -> str:
+    add_server_timing("work", seconds)
+    return threading.current_thread().name
+
+
+async def test_small_inputs_run_inline_and_large_ones_on_the_executor(monkeypatch):
+    monkeypatch.setattr(get_settings(), "cpu_offload_threshold_bytes", 100)
+    timings: dict[str, float] = {}
+    token = _server_timing.set(timings)
+    try:
+        inline = await run_cpu_bound("test", 99, _thread_name, 0.5)
+        offloaded = await run_cpu_bound("test", 100, _thread_name, 0.25)
+    finally:
+        _server_timing.reset(token)
+
+    assert inline == threading.current_thread().name
+    assert offloaded.startswith("cpu")
+    # The executor thread still records into the request's Server-Timing.
+    assert timings == {"work": 0.75}
+    assert CPU_TASKS.value(task="test", where="inline") == 1
+    assert CPU_TASKS.value(task="test", where="executor") == 1
+
+
+async def test_large_theme_is_encoded_off_the_loop(monkeypatch):
+    monkeypatch.setattr(get_settings(), "cpu_offload_threshold_bytes", 0)
+    store = FakeBlobStore()
+    theme = {
+        "mediaState": {"title": "T", "body1": "b1", "body2": "b2"},
+        "schedule": None,
+    }
+    store.put("theme/theme-1/se.json", json.dumps(theme).encode("utf-8"))
+    transport = ASGITransport(app=app)
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/v1/theme/theme-1", params={"lang": "se"})
+
+    assert response.status_code == 200
+    assert response.json()["id"] == "theme-1"
+    assert "validate;dur=" in response.headers["server-timing"]
+    assert CPU_TASKS.value(task="theme_encode", where="executor") == 1
+
+
+def _spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def test_loop_lag_monitor_reports_blocking(caplog):
+    monitor = asyncio.create_task(monitor_loop_lag(0.01))
+    await asyncio.sleep(0)
+    # Deliberately hold the loop with CPU work, the way an inline theme
+    # encode would, so the monitor has a stall to report.
+    _spin(0.15)
+    await asyncio.sleep(0.05)
+    monitor.cancel()
+
+    assert LOOP_LAG.count() >= 1
+    assert "Event loop was blocked" in caplog.text
@@ -1,6 +1,6 @@
 """Unit tests for pre_process_schedule YLE item conversion behavior."""
 
-from app.schedule_processing import pre_process_schedule
+from app.schedule_processing import UrlRewriteMap, pre_process_schedule
 from app.models import (
     Schedule,
     YleAudioMediaItem,
@@ -161,3 +161,35 @@ def test_pre_process_schedule_maps_local_media_urls_for_non_yle_items():
     assert item.start is not None and item.start.url == "/v1/media/photo%20one.jpg"
     assert item.recording is not None and item.recording.url == "/v1/media/photo-two.jpg"
     assert item.finish is not None and item.finish.url == "/v1/media/photo-three.jpg"
+
+
+def test_pre_process_schedule_shares_url_map_between_schedules():
+    def _schedule() -> Schedule:
+        return Schedule(
+            items=[
+                ImageMediaItem(
+                    kind="media",
+                    itemType="image",
+                    itemId="image-shared",
+                    isRecording=False,
+                    start=_state("image-start", url="shared photo.jpg"),
+                ),
+                YleAudioMediaItem(
+                    kind="media",
+                    itemType="yle-audio",
+                    itemId="yle-shared",
+                    isRecording=True,
+                    recording=_state("yle-recording", url="1-50000093"),
+                ),
+            ]
+        )
+
+    url_map = UrlRewriteMap()
+    first = pre_process_schedule(_schedule(), url_map)
+    second = pre_process_schedule(_schedule(), url_map)
+
+    assert url_map.local == {"shared photo.jpg": "/v1/media/shared%20photo.jpg"}
+    assert url_map.yle == {"1-50000093": "/v1/yle-media/1-50000093"}
+    for processed in (first, second):
+        assert processed.items[0].start.url == "/v1/media/shared%20photo.jpg"
+        assert processed.items[1].recording.url == "/v1/yle-media/1-50000093"
@@ -0,0 +1,81 @@
+"""Micro-benchmark for pre_process_schedule URL rewriting.
+
+Run with ``pytest tests/test_pre_process_schedule_benchmark.py -s`` to see
+timings.
+"""
+
+import time
+from pathlib import Path
+
+import pytest
+
+from app.models import THEME_ADAPTER, Schedule
+from app.schedule_processing import (
+    UrlRewriteMap,
+    map_local_media_url,
+    map_yle_program_url,
+    pre_process_schedule,
+)
+
+THEMES_ROOT = Path(__file__).resolve().parents[2] / "recorder-content" / "dev" / "themes"
+ITERATIONS = 200
+
+
+def _schedules() -> list[Schedule]:
+    schedules = []
+    for path in sorted(THEMES_ROOT.glob("*/*.json")):
+        theme = THEME_ADAPTER.validate_json(path.read_bytes())
+        if theme.schedule is not None:
+            schedules.append(theme.schedule)
+    return schedules
+
+
+def _per_item_rewrite(schedule: Schedule) -> Schedule:
+    """Reference rewrite: dispatch and quote every URL on every call."""
+    for state in (schedule.start, schedule.finish):
+        if state:
+            state.url = map_local_media_url(state.url)
+    for item in schedule.items:
+        is_yle = item.itemType in ("yle-audio", "yle-video")
+        for state_attr in ("start", "recording", "finish"):
+            state = getattr(item, state_attr, None)
+            if state:
+                state.url = (map_yle_program_url if is_yle else map_local_media_url)(
+                    state.url
+                )
+    return schedule
+
+
+def _time_per_schedule(rewrite, schedules: list[Schedule]) -> float:
+    copies = [
+        [schedule.model_copy(deep=True) for schedule in schedules]
+        for _ in range(ITERATIONS)
+    ]
+    started = time.perf_counter()
+    for batch in copies:
+        for schedule in batch:
+            rewrite(schedule)
+    return (time.perf_counter() - started) / (ITERATIONS * len(schedules))
+
+
+@pytest.mark.skipif(not THEMES_ROOT.is_dir(), reason="recorder-content not present")
+def test_pre_process_schedule_benchmark():
+    schedules = _schedules()
+    assert schedules
+
+    shared_map = UrlRewriteMap()
+    for schedule in schedules:
+        expected = _per_item_rewrite(schedule.model_copy(deep=True))
+        assert pre_process_schedule(schedule.model_copy(deep=True), shared_map) == expected
+
+    per_item_seconds = _time_per_schedule(_per_item_rewrite, schedules)
+    shared_seconds = _time_per_schedule(
+        lambda schedule: pre_process_schedule(schedule, shared_map), schedules
+    )
+
+    print(
+        f"\nschedule URL rewrite over {len(schedules)} schedules: "
+        f"per-item {per_item_seconds * 1e6:.1f} µs, "
+        f"shared map {shared_seconds * 1e6:.1f} µs "
+        f"({per_item_seconds / shared_seconds:.2f}x)"
+    )
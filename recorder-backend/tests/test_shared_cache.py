@@ -0,0 +1,126 @@
+"""Tests for the cache shared by worker processes."""
+
+import json
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.main import app
+from app.responses import EncodedJSON
+from app.routers.content import clear_theme_cache, refresh_theme
+from app.routers.media import clear_media_cache
+from app.shared_cache import SharedDiskCache
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def shared(tmp_path):
+    shared = SharedDiskCache(tmp_path / "shared", ttl_seconds=60, max_bytes=1024)
+    with (
+        patch("app.routers.content.get_shared_cache", return_value=shared),
+        patch("app.routers.media.get_shared_cache", return_value=shared),
+    ):
+        yield shared
+
+
+@pytest.fixture
+def store():
+    store = FakeBlobStore()
+    theme = {
+        "mediaState": {"title": "T", "body1": "b1", "body2": "b2"},
+        "schedule": None,
+    }
+    store.put("theme/theme-1/se.json", json.dumps(theme).encode("utf-8"))
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield store
+
+
+def test_disk_cache_round_trip_and_expiry(tmp_path):
+    cache = SharedDiskCache(tmp_path, ttl_seconds=60, max_bytes=1024)
+    cache.set("a", b"value")
+
+    assert cache.get("a") == b"value"
+    assert cache.get("a", max_age=-1) is None
+    assert cache.get("missing") is None
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+
+def test_disk_cache_add_only_stores_when_absent(tmp_path):
+    cache = SharedDiskCache(tmp_path, ttl_seconds=60, max_bytes=1024)
+
+    assert cache.add("a", b"first") is True
+    assert cache.add("a", b"second") is False
+    assert cache.get("a") == b"first"
+    # An entry older than max_age is replaced.
+    assert cache.add("a", b"third", max_age=-1) is True
+    assert cache.get("a") == b"third"
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".tmp-")] == []
+
+
+def test_disk_cache_prunes_oldest_entries_over_budget(tmp_path):
+    cache = SharedDiskCache(tmp_path, ttl_seconds=60, max_bytes=250)
+    for key in ("a", "b", "c"):
+        cache.set(key, b"x" * 100)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == cache.get("c") == b"x" * 100
+    assert not list(tmp_path.glob(".tmp-*"))
+
+
+def test_encoded_json_pack_round_trip():
+    encoded = EncodedJSON.from_bytes(b'{"text":"' + b"\n" * 600 + b'"}')
+
+    assert EncodedJSON.unpack(encoded.pack()) == encoded
+    with pytest.raises(ValueError):
+        EncodedJSON.unpack(encoded.pack()[:-1])
+
+
+async def test_theme_loaded_by_one_worker_is_served_to_another(store, shared):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get("/v1/theme/theme-1", params={"lang": "se"})
+        # Another worker starts with empty process caches and no storage access.
+        clear_theme_cache()
+        store.blobs.clear()
+        second = await client.get("/v1/theme/theme-1", params={"lang": "se"})
+
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+async def test_refresh_drops_the_shared_entry(store, shared):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/v1/theme/theme-1", params={"lang": "se"})
+    assert shared.get("theme:theme-1:se") is not None
+
+    store.blobs.clear()
+    await refresh_theme("theme-1", "se")
+
+    assert shared.get("theme:theme-1:se") is None
+
+
+async def test_yle_url_resolved_once_across_workers(shared, monkeypatch):
+    calls = []
+
+    def resolve(program_id):
+        calls.append(program_id)
+        return f"https://example.com/{program_id}.m3u8"
+
+    monkeypatch.setattr("app.routers.media.map_yle_content", resolve)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get("/v1/yle-media/1-123")
+        clear_media_cache()
+        second = await client.get("/v1/media/v1/yle-media/1-123")
+
+    assert first.json() == second.json() == "https://example.com/1-123.m3u8"
+    assert calls == ["1-123"]
@@ -0,0 +1,163 @@
+"""Tests for the local filesystem storage backend."""
+
+import json
+from unittest.mock import patch
+from urllib.parse import urlsplit
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.main import app
+from app.storage_backends import FilesystemBackend
+
+pytestmark = pytest.mark.anyio
+
+CLIENT_ID = "550e8400-e29b-41d4-a716-446655440000"
+SESSION_ID = "7c9e6679-7425-40de-944b-e07fc1f90ae7"
+
+
+@pytest.fixture
+def content_root(tmp_path):
+    theme = {
+        "mediaState": {"title": "Title", "body1": "b1", "body2": "b2"},
+        "schedule": {"items": []},
+    }
+    for lang in ("se", "fi"):
+        path = tmp_path / "themes" / "theme-1" / f"{lang}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(theme))
+    (tmp_path / "media").mkdir()
+    (tmp_path / "media" / "clip.mp4").write_bytes(bytes(range(256)) * 40)
+    (tmp_path / "excel").mkdir()
+    (tmp_path / "excel" / "workbook.xlsx").write_bytes(b"xlsx")
+    return tmp_path
+
+
+@pytest.fixture
+def backend(content_root):
+    backend = FilesystemBackend(content_root, public_url="http://test")
+    with (
+        patch("app.storage.get_storage_backend", return_value=backend),
+        patch("app.routers.local_storage.get_storage_backend", return_value=backend),
+    ):
+        yield backend
+
+
+def test_blob_names_map_onto_content_folders(content_root):
+    backend = FilesystemBackend(content_root)
+
+    assert backend.path_for("theme/t/se.json") == content_root / "themes/t/se.json"
+    assert backend.path_for("media/a.jpg") == content_root / "media/a.jpg"
+    assert backend.path_for("uploads/x/y.json") == content_root / "uploads/x/y.json"
+
+
+@pytest.mark.parametrize(
+    "blob_name", ["", "media/../secret", "theme//x.json", "excel/workbook.xlsx"]
+)
+def test_blob_names_cannot_escape_the_root(content_root, blob_name):
+    with pytest.raises(ValueError):
+        FilesystemBackend(content_root).path_for(blob_name)
+
+
+async def test_list_names_matches_blob_layout(content_root):
+    backend = FilesystemBackend(content_root)
+
+    assert await backend.list_names("theme/") == [
+        "theme/theme-1/fi.json",
+        "theme/theme-1/se.json",
+    ]
+    assert await backend.list_names("theme/theme-1/s") == ["theme/theme-1/se.json"]
+    assert await backend.list_names("", max_results=2) == [
+        "media/clip.mp4",
+        "theme/theme-1/fi.json",
+    ]
+
+
+async def test_root_prefix_skips_directories_that_cannot_match(content_root):
+    backend = FilesystemBackend(content_root)
+    (content_root / "content-version.json").write_text("{}")
+    (content_root / "uploads" / "deep").mkdir(parents=True)
+    (content_root / "uploads" / "deep" / "take.json").write_text("{}")
+    scanned = []
+    original = backend._scan
+
+    def recording_scan(directory, blob_prefix, prefix):
+        scanned.append(blob_prefix)
+        return original(directory, blob_prefix, prefix)
+
+    with patch.object(backend, "_scan", side_effect=recording_scan):
+        names = await backend.list_names("content-version.json")
+
+    assert names == ["content-version.json"]
+    assert scanned == [""]
+
+
+async def test_download_range_reads_slice_and_total_size(content_root):
+    backend = FilesystemBackend(content_root)
+
+    content, total = await backend.download_range("media/clip.mp4", 250, 10)
+
+    assert total == 10240
+    assert content == bytes([250, 251, 252, 253, 254, 255, 0, 1, 2, 3])
+    assert await backend.download_range("media/clip.mp4", 20000) == (b"", 10240)
+
+
+async def test_delete_prefix_removes_files_and_empty_directories(content_root):
+    backend = FilesystemBackend(content_root)
+    prefix = f"uploads/audio_and_metadata/{CLIENT_ID}/"
+    await backend.upload(f"{prefix}{SESSION_ID}/a.m4a", b"a")
+    await backend.upload(f"{prefix}{SESSION_ID}/b.m4a", b"b")
+
+    assert await backend.delete_prefix(prefix) == 2
+    assert await backend.list_names("uploads/") == []
+    assert not (content_root / "uploads" / "audio_and_metadata" / CLIENT_ID).exists()
+    assert (content_root / "themes").is_dir()
+
+
+async def test_api_serves_themes_and_media_from_disk(backend):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        themes = await client.get("/v1/theme")
+        theme = await client.get("/v1/theme/theme-1", params={"lang": "se"})
+        media = await client.get("/v1/media/clip.mp4", headers={"Range": "bytes=0-9"})
+
+    assert themes.json() == [{"id": "theme-1", "availableLanguages": ["fi", "se"]}]
+    assert theme.status_code == 200
+    assert theme.json()["id"] == "theme-1"
+    assert media.status_code == 206
+    assert media.headers["content-range"] == "bytes 0-9/10240"
+    assert media.content == bytes(range(10))
+
+
+async def test_signed_upload_url_stores_file_locally(backend, content_root):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        init = await client.post(
+            "/v1/upload",
+            json={
+                "filename": "rec.m4a",
+                "metadata": {"clientId": CLIENT_ID, "contentType": "audio/m4a"},
+            },
+        )
+        url = urlsplit(init.json()["presignedUrl"])
+        tampered = await client.put(
+            f"{url.path}?{url.query.replace('sig=', 'sig=0')}", content=b"audio"
+        )
+        stored = await client.put(f"{url.path}?{url.query}", content=b"audio")
+
+    assert tampered.status_code == 403
+    assert stored.status_code == 201
+    audio = content_root / "uploads" / "audio_and_metadata" / CLIENT_ID / "rec.m4a"
+    assert audio.read_bytes() == b"audio"
+    metadata = (
+        content_root / "uploads/audio_and_metadata/metadata" / CLIENT_ID / "rec.json"
+    )
+    assert json.loads(metadata.read_text())["clientId"] == CLIENT_ID
+
+
+async def test_local_upload_route_is_disabled_for_azure():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.put("/v1/local-blobs/x.m4a?se=1&sig=x", content=b"")
+
+    assert response.status_code == 404
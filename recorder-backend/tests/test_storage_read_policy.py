@@ -0,0 +1,119 @@
+"""Tests for deadlines, retries and hedging of blob reads."""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.metrics import REGISTRY
+from app.read_policy import HEDGED_READS, READ_RETRIES
+from app.settings import get_settings
+from app.storage import StorageError, get_blob_properties, load_blob_binary
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+BLOB = "media/foto21_svt.jpg"
+
+
+@pytest.fixture
+def store(monkeypatch):
+    REGISTRY.reset()
+    settings = get_settings()
+    monkeypatch.setattr(settings, "storage_read_backoff_seconds", 0.001)
+    monkeypatch.setattr(settings, "storage_read_attempt_timeout_seconds", 0.2)
+    monkeypatch.setattr(settings, "storage_read_deadline_seconds", 1.0)
+    monkeypatch.setattr(settings, "storage_read_deadlines", {})
+    monkeypatch.setattr(settings, "storage_read_attempt_timeouts", {})
+    store = FakeBlobStore()
+    store.put(BLOB, b"jpeg")
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield store
+    REGISTRY.reset()
+
+
+async def test_transient_failures_are_retried(store):
+    store.failures = 2
+
+    assert await load_blob_binary(BLOB) == b"jpeg"
+    assert store.reads == 3
+    assert READ_RETRIES.value(operation="load_binary", reason="error") == 2
+
+
+async def test_gives_up_after_configured_retries(store, monkeypatch):
+    monkeypatch.setattr(get_settings(), "storage_read_retries", 1)
+    store.failures = 5
+
+    with pytest.raises(StorageError):
+        await load_blob_binary(BLOB)
+    assert store.reads == 2
+
+
+async def test_missing_blob_is_not_retried(store):
+    with pytest.raises(StorageError, match="not found"):
+        await load_blob_binary("media/missing.jpg")
+    assert store.reads == 1
+
+
+async def test_slow_attempt_times_out_and_is_retried(store):
+    store.delays = [5.0]
+
+    assert await load_blob_binary(BLOB) == b"jpeg"
+    assert READ_RETRIES.value(operation="load_binary", reason="timeout") == 1
+
+
+async def test_operation_deadline_bounds_all_attempts(store, monkeypatch):
+    monkeypatch.setattr(get_settings(), "storage_read_deadlines", {"properties": 0.1})
+    store.latency = 5.0
+
+    started = time.perf_counter()
+    with pytest.raises(StorageError, match="timed out"):
+        await get_blob_properties(BLOB)
+    assert time.perf_counter() - started < 0.5
+
+
+async def test_whole_blob_download_gets_its_own_limits(store, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "storage_read_attempt_timeouts", {"load_binary": 1})
+    monkeypatch.setattr(settings, "storage_read_deadlines", {"load_binary": 2})
+    # A large recording on a slow link: slower than small reads may take.
+    store.latency = 0.4
+
+    assert await load_blob_binary(BLOB) == b"jpeg"
+    assert READ_RETRIES.value(operation="load_binary", reason="timeout") == 0
+    with pytest.raises(StorageError, match="timed out"):
+        await get_blob_properties(BLOB)
+
+
+async def test_slow_read_is_hedged_after_observed_p95(store, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "storage_read_hedging", True)
+    monkeypatch.setattr(settings, "storage_read_hedge_min_samples", 5)
+    monkeypatch.setattr(settings, "storage_read_attempt_timeout_seconds", 10.0)
+    store.latency = 0.005
+    for _ in range(5):
+        await load_blob_binary(BLOB)
+
+    store.delays = [5.0]
+    started = time.perf_counter()
+    assert await load_blob_binary(BLOB) == b"jpeg"
+
+    assert time.perf_counter() - started < 0.5
+    assert HEDGED_READS.value(operation="load_binary", winner="hedge") == 1
+    assert READ_RETRIES.value(operation="load_binary", reason="timeout") == 0
+
+
+async def test_no_hedging_by_default(store):
+    store.latency = 0.005
+    for _ in range(60):
+        await load_blob_binary(BLOB)
+    store.delays = [0.05]
+
+    await load_blob_binary(BLOB)
+    await asyncio.sleep(0)
+
+    assert store.reads == 61
+    assert HEDGED_READS.value(operation="load_binary", winner="hedge") == 0
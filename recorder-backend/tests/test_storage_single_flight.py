@@ -0,0 +1,91 @@
+"""Tests for coalescing concurrent identical storage reads."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.metrics import REGISTRY, STORAGE_DURATION
+from app.single_flight import COALESCING_RATIO
+from app.storage import (
+    StorageError,
+    load_blob_binary,
+    load_blob_binary_range,
+    load_blob_json,
+)
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def store():
+    REGISTRY.reset()
+    store = FakeBlobStore(latency=0.02)
+    store.put("media/foto21_svt.jpg", b"\xff\xd8" * 50)
+    store.put("theme/t/se.json", b'{"a": 1}')
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield store
+    REGISTRY.reset()
+
+
+async def test_concurrent_reads_share_one_download(store):
+    results = await asyncio.gather(
+        *(load_blob_binary("media/foto21_svt.jpg") for _ in range(20))
+    )
+
+    assert all(result == b"\xff\xd8" * 50 for result in results)
+    assert STORAGE_DURATION.count(operation="load_binary", outcome="ok") == 1
+    assert COALESCING_RATIO.value(operation="download") == 19 / 20
+
+
+async def test_sequential_reads_are_not_coalesced(store):
+    await load_blob_binary("media/foto21_svt.jpg")
+    await load_blob_binary("media/foto21_svt.jpg")
+
+    assert STORAGE_DURATION.count(operation="load_binary", outcome="ok") == 2
+
+
+async def test_different_ranges_are_separate_downloads(store):
+    first, second, again = await asyncio.gather(
+        load_blob_binary_range("media/foto21_svt.jpg", 0, 10),
+        load_blob_binary_range("media/foto21_svt.jpg", 10, 10),
+        load_blob_binary_range("media/foto21_svt.jpg", 0, 10),
+    )
+
+    assert first == again == (b"\xff\xd8" * 5, 100)
+    assert second == (b"\xff\xd8" * 5, 100)
+    assert STORAGE_DURATION.count(operation="load_range", outcome="ok") == 2
+
+
+async def test_failure_is_shared_by_all_callers(store):
+    results = await asyncio.gather(
+        *(load_blob_binary("media/missing.jpg") for _ in range(5)),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, StorageError) for result in results)
+    assert STORAGE_DURATION.count(operation="load_binary", outcome="error") == 1
+
+
+async def test_cancelled_caller_does_not_cancel_the_others(store):
+    first = asyncio.create_task(load_blob_binary("media/foto21_svt.jpg"))
+    second = asyncio.create_task(load_blob_binary("media/foto21_svt.jpg"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == b"\xff\xd8" * 50
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+async def test_json_callers_get_their_own_objects(store):
+    first, second = await asyncio.gather(
+        load_blob_json("theme/t/se.json"), load_blob_json("theme/t/se.json")
+    )
+
+    first["a"] = 2
+    assert second == {"a": 1}
+    assert STORAGE_DURATION.count(operation="load_json", outcome="ok") == 1
@@ -0,0 +1,58 @@
+"""Benchmark for the theme parse, validate and serialize round trip.
+
+Run with ``pytest tests/test_theme_roundtrip_benchmark.py -s`` to see timings.
+"""
+
+import json
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.responses import JSONResponse
+
+from app.models import THEME_ADAPTER, Theme
+from app.responses import FastJSONResponse
+
+THEMES_ROOT = Path(__file__).resolve().parents[2] / "recorder-content" / "dev" / "themes"
+ITERATIONS = 50
+
+
+def _theme_blobs() -> list[bytes]:
+    return [path.read_bytes() for path in sorted(THEMES_ROOT.glob("*/*.json"))]
+
+
+def _dict_round_trip(raw: bytes) -> bytes:
+    theme = Theme(**json.loads(raw))
+    return JSONResponse(theme.model_dump(mode="json")).body
+
+
+def _bytes_round_trip(raw: bytes) -> bytes:
+    theme = THEME_ADAPTER.validate_json(raw)
+    return FastJSONResponse(THEME_ADAPTER.dump_python(theme, mode="json")).body
+
+
+def _time_per_blob(round_trip, blobs: list[bytes]) -> float:
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        for raw in blobs:
+            round_trip(raw)
+    return (time.perf_counter() - started) / (ITERATIONS * len(blobs))
+
+
+@pytest.mark.skipif(not THEMES_ROOT.is_dir(), reason="recorder-content not present")
+def test_theme_round_trip_benchmark():
+    blobs = _theme_blobs()
+    assert blobs
+
+    for raw in blobs:
+        assert json.loads(_bytes_round_trip(raw)) == json.loads(_dict_round_trip(raw))
+
+    dict_seconds = _time_per_blob(_dict_round_trip, blobs)
+    bytes_seconds = _time_per_blob(_bytes_round_trip, blobs)
+
+    print(
+        f"\ntheme round trip over {len(blobs)} blobs: "
+        f"dict path {dict_seconds * 1e6:.1f} µs, "
+        f"bytes path {bytes_seconds * 1e6:.1f} µs "
+        f"({dict_seconds / bytes_seconds:.2f}x)"
+    )
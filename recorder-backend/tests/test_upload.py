@@ -22,6 +22,13 @@ pytestmark = pytest.mark.anyio
 # Test fixtures
 
 
+@pytest.fixture(autouse=True)
+def mock_record_upload():
+    """Keep upload initialisation from writing client manifests."""
+    with patch("app.routers.upload.record_upload") as record_upload:
+        yield record_upload
+
+
 @pytest.fixture
 def valid_client_id():
     """Valid UUID v4 client ID."""
@@ -274,7 +281,7 @@ class TestInitUpload:
 class TestDeleteRecordings:
     """Tests for DELETE /v1/recordings endpoints."""
 
-    @patch("app.routers.upload.delete_by_prefix")
+    @patch("app.routers.upload.delete_client_blobs")
     async def test_delete_by_client_id_success(self, mock_delete, valid_client_id):
         """Test successful deletion by client ID."""
         mock_delete.return_value = None
@@ -286,7 +293,7 @@ class TestDeleteRecordings:
         assert response.status_code == 200
         assert "Deleted all data for client" in response.json()["message"]
         mock_delete.assert_called_once()
-        call_args = mock_delete.call_args[0][0]
+        call_args = mock_delete.call_args[0]
         assert valid_client_id in call_args
 
     async def test_delete_by_client_id_invalid_uuid(self):
@@ -298,7 +305,7 @@ class TestDeleteRecordings:
         assert response.status_code == 400
         assert "Invalid clientId" in response.json()["detail"]
 
-    @patch("app.routers.upload.delete_by_prefix")
+    @patch("app.routers.upload.delete_client_blobs")
     async def test_delete_by_client_id_storage_error(
         self, mock_delete, valid_client_id
     ):
@@ -312,7 +319,7 @@ class TestDeleteRecordings:
         assert response.status_code == 500
         assert "Error deleting data" in response.json()["detail"]
 
-    @patch("app.routers.upload.delete_by_prefix")
+    @patch("app.routers.upload.delete_client_blobs")
     async def test_delete_by_session_id_success(
         self, mock_delete, valid_client_id, valid_session_id
     ):
@@ -327,7 +334,7 @@ class TestDeleteRecordings:
 
         assert response.status_code == 200
         assert "Deleted all data for session" in response.json()["message"]
-        call_args = mock_delete.call_args[0][0]
+        call_args = mock_delete.call_args[0]
         assert valid_client_id in call_args
         assert valid_session_id in call_args
 
@@ -353,7 +360,7 @@ class TestDeleteRecordings:
         assert response.status_code == 400
         assert "Invalid clientId or sessionId" in response.json()["detail"]
 
-    @patch("app.routers.upload.delete_by_prefix")
+    @patch("app.routers.upload.delete_client_blobs")
     async def test_delete_by_session_id_storage_error(
         self, mock_delete, valid_client_id, valid_session_id
     ):
@@ -369,7 +376,7 @@ class TestDeleteRecordings:
         assert response.status_code == 500
         assert "Error deleting data" in response.json()["detail"]
 
-    @patch("app.routers.upload.delete_by_prefix")
+    @patch("app.routers.upload.delete_client_blobs")
     async def test_delete_by_recording_id_success(
         self, mock_delete, valid_client_id, valid_session_id, valid_recording_id
     ):
@@ -384,7 +391,7 @@ class TestDeleteRecordings:
 
         assert response.status_code == 200
         assert "Deleted recording" in response.json()["message"]
-        call_args = mock_delete.call_args[0][0]
+        call_args = mock_delete.call_args[0]
         assert valid_client_id in call_args
         assert valid_session_id in call_args
         assert valid_recording_id in call_args
@@ -428,7 +435,7 @@ class TestDeleteRecordings:
         assert response.status_code == 400
         assert "Invalid" in response.json()["detail"]
 
-    @patch("app.routers.upload.delete_by_prefix")
+    @patch("app.routers.upload.delete_client_blobs")
     async def test_delete_by_recording_id_storage_error(
         self, mock_delete, valid_client_id, valid_session_id, valid_recording_id
     ):
@@ -0,0 +1,163 @@
+"""Tests for Idempotency-Key handling of POST /v1/upload."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.main import app
+from app.routers import upload
+from app.routers.upload import clear_upload_responses
+from app.settings import get_settings
+from app.shared_cache import get_shared_cache
+from app.storage import StorageError
+
+pytestmark = pytest.mark.anyio
+
+CLIENT_ID = "550e8400-e29b-41d4-a716-446655440000"
+RECORDING_ID = "3fa85f64-5717-4562-b3fc-2c963f66afa6"
+
+
+def _request(filename: str = "take.m4a", **metadata) -> dict:
+    return {
+        "filename": filename,
+        "metadata": {"clientId": CLIENT_ID, "contentType": "audio/m4a", **metadata},
+    }
+
+
+@pytest.fixture
+def storage():
+    urls = iter(f"https://example.test/sas/{n}" for n in range(100))
+    with (
+        patch("app.routers.upload.record_upload"),
+        patch("app.routers.upload.store_metadata") as store_metadata,
+        patch(
+            "app.routers.upload.generate_upload_sas_url",
+            side_effect=lambda **kwargs: next(urls),
+        ) as generate_sas,
+    ):
+        yield store_metadata, generate_sas
+
+
+def _signed_blobs(generate_sas) -> list[str]:
+    return [call.kwargs["blob_name"] for call in generate_sas.call_args_list]
+
+
+async def _post(body: dict, key: str | None = None):
+    headers = {"Idempotency-Key": key} if key else {}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/v1/upload", json=body, headers=headers)
+
+
+async def test_retry_with_same_key_replays_first_response(storage):
+    store_metadata, generate_sas = storage
+
+    first = await _post(_request(), key="retry-1")
+    retry = await _post(_request(), key="retry-1")
+
+    assert retry.status_code == 200
+    assert retry.headers["idempotency-replayed"] == "true"
+    assert "idempotency-replayed" not in first.headers
+    assert store_metadata.call_count == 1
+    # The replay points at the same blob with a freshly signed URL.
+    assert retry.json() != first.json()
+    assert (
+        _signed_blobs(generate_sas)
+        == [f"uploads/audio_and_metadata/{CLIENT_ID}/take.m4a"] * 2
+    )
+
+
+async def test_recording_id_is_the_default_key(storage):
+    store_metadata, _ = storage
+
+    await _post(_request(recordingId=RECORDING_ID))
+    retry = await _post(_request(recordingId=RECORDING_ID))
+
+    assert retry.headers["idempotency-replayed"] == "true"
+    assert store_metadata.call_count == 1
+
+
+async def test_requests_without_key_are_not_deduplicated(storage):
+    store_metadata, _ = storage
+
+    first = await _post(_request())
+    second = await _post(_request())
+
+    assert first.json() != second.json()
+    assert store_metadata.call_count == 2
+
+
+async def test_key_reused_for_different_request_is_rejected(storage):
+    await _post(_request("one.m4a"), key="retry-1")
+    response = await _post(_request("two.m4a"), key="retry-1")
+
+    assert response.status_code == 422
+
+
+async def test_failures_are_not_remembered(storage):
+    store_metadata, _ = storage
+    store_metadata.side_effect = [StorageError("down"), None]
+
+    failed = await _post(_request(), key="retry-1")
+    retried = await _post(_request(), key="retry-1")
+
+    assert failed.status_code == 500
+    assert retried.status_code == 200
+    assert "idempotency-replayed" not in retried.headers
+
+
+async def test_concurrent_duplicates_wait_for_the_first(storage):
+    store_metadata, generate_sas = storage
+
+    async def slow_store(*args, **kwargs):
+        await asyncio.sleep(0.05)
+
+    store_metadata.side_effect = slow_store
+    first, second = await asyncio.gather(
+        _post(_request(), key="retry-1"), _post(_request(), key="retry-1")
+    )
+
+    assert first.status_code == second.status_code == 200
+    assert store_metadata.call_count == 1
+    replayed = [r.headers.get("idempotency-replayed") for r in (first, second)]
+    assert sorted(replayed, key=str) == [None, "true"]
+    assert len(set(_signed_blobs(generate_sas))) == 1
+
+
+async def test_duplicate_waits_for_another_worker(storage, tmp_path, monkeypatch):
+    store_metadata, _ = storage
+    monkeypatch.setattr(get_settings(), "shared_cache_dir", str(tmp_path))
+    monkeypatch.setattr(upload, "IDEMPOTENCY_WAIT_SECONDS", 0.2)
+    get_shared_cache.cache_clear()
+    try:
+        # Another worker process has reserved the key but not yet finished.
+        shared = get_shared_cache()
+        shared.add(f"upload-init-pending:upload:{CLIENT_ID}:retry-1", b"")
+        waiting = await _post(_request(), key="retry-1")
+        shared.invalidate(f"upload-init-pending:upload:{CLIENT_ID}:retry-1")
+        retried = await _post(_request(), key="retry-1")
+    finally:
+        get_shared_cache.cache_clear()
+
+    assert waiting.status_code == 409
+    assert retried.status_code == 200
+    assert store_metadata.call_count == 1
+
+
+async def test_replay_is_shared_between_workers(storage, tmp_path, monkeypatch):
+    store_metadata, _ = storage
+    monkeypatch.setattr(get_settings(), "shared_cache_dir", str(tmp_path))
+    get_shared_cache.cache_clear()
+    try:
+        first = await _post(_request(), key="retry-1")
+        # Another worker process starts with an empty in-process cache.
+        clear_upload_responses()
+        retry = await _post(_request(), key="retry-1")
+    finally:
+        get_shared_cache.cache_clear()
+
+    assert first.status_code == 200
+    assert retry.headers["idempotency-replayed"] == "true"
+    assert store_metadata.call_count == 1
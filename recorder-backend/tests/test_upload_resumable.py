@@ -0,0 +1,177 @@
+"""Tests for resumable block-by-block uploads."""
+
+import base64
+import json
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.main import app
+from app.settings import get_settings
+from app.storage import StorageError, store_metadata
+from app.storage_backends import FilesystemBackend
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+CLIENT_ID = "550e8400-e29b-41d4-a716-446655440000"
+AUDIO = b"0123456789"
+
+
+def _request(size: int = len(AUDIO)) -> dict:
+    return {
+        "filename": "long-take.flac",
+        "metadata": {"clientId": CLIENT_ID, "contentType": "audio/flac"},
+        "size": size,
+    }
+
+
+def _block_id(index: int) -> str:
+    return f"{index:06d}"
+
+
+def _block(index: int, block_size: int = 4) -> bytes:
+    return AUDIO[index * block_size : (index + 1) * block_size]
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(get_settings(), "resumable_upload_block_size", 4)
+
+
+@pytest.fixture
+def store():
+    store = FakeBlobStore()
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield store
+
+
+@pytest.fixture
+async def client():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def test_init_plans_blocks_and_stores_the_upload(store, client):
+    response = await client.post("/v1/upload/resumable", json=_request())
+
+    assert response.status_code == 200
+    status = response.json()
+    assert status["size"] == 10
+    assert status["blockSize"] == 4
+    assert [base64.b64decode(b) for b in status["blockIds"]] == [
+        b"000000",
+        b"000001",
+        b"000002",
+    ]
+    assert status["receivedBlocks"] == []
+    assert status["missingBlocks"] == [0, 1, 2]
+    assert status["committed"] is False
+    assert parse_qs(urlsplit(status["blockUrl"]).query)["sp"] == ["cw"]
+
+    upload = json.loads(store.blobs[f"uploads/resumable/{status['uploadId']}.json"])
+    assert upload["blobName"] == (
+        f"uploads/audio_and_metadata/{CLIENT_ID}/long-take.flac"
+    )
+    assert f"uploads/audio_and_metadata/metadata/{CLIENT_ID}/long-take.json" in (
+        store.blobs
+    )
+
+
+async def test_interrupted_upload_resumes_with_missing_blocks(store, client):
+    status = (await client.post("/v1/upload/resumable", json=_request())).json()
+    blob_name = f"uploads/audio_and_metadata/{CLIENT_ID}/long-take.flac"
+    blob = store.client().get_blob_client("recorder-content", blob_name)
+    await blob.stage_block("000000", _block(0))
+    await blob.stage_block("000002", _block(2))
+    # A block cut short by a dropped connection does not count.
+    await blob.stage_block("000001", _block(1)[:2])
+
+    progress = (await client.get(f"/v1/upload/{status['uploadId']}")).json()
+    early = await client.post(f"/v1/upload/{status['uploadId']}/complete")
+    await blob.stage_block("000001", _block(1))
+    done = await client.post(f"/v1/upload/{status['uploadId']}/complete")
+    again = await client.post(f"/v1/upload/{status['uploadId']}/complete")
+    finished = (await client.get(f"/v1/upload/{status['uploadId']}")).json()
+
+    assert progress["receivedBlocks"] == [0, 2]
+    assert progress["missingBlocks"] == [1]
+    assert early.status_code == 409
+    assert early.json()["detail"]["missingBlocks"] == [1]
+    assert done.status_code == 200
+    assert done.json()["committed"] is True
+    assert store.blobs[blob_name] == AUDIO
+    assert again.json()["committed"] is True
+    # A committed recording can no longer be overwritten through the upload.
+    assert done.json()["blockUrl"] is None
+    assert finished["blockUrl"] is None
+
+
+async def test_completion_retried_after_failed_bookkeeping(store, client):
+    status = (await client.post("/v1/upload/resumable", json=_request())).json()
+    upload_id = status["uploadId"]
+    blob_name = f"uploads/audio_and_metadata/{CLIENT_ID}/long-take.flac"
+    blob = store.client().get_blob_client("recorder-content", blob_name)
+    for index in range(3):
+        await blob.stage_block(_block_id(index), _block(index))
+
+    # The commit succeeds, but recording it in the upload record does not.
+    with patch("app.routers.upload.store_metadata", side_effect=StorageError("down")):
+        failed = await client.post(f"/v1/upload/{upload_id}/complete")
+    with patch(
+        "app.routers.upload.store_metadata", side_effect=store_metadata
+    ) as recording:
+        retried = await client.post(f"/v1/upload/{upload_id}/complete")
+
+    assert failed.status_code == 500
+    assert retried.status_code == 200
+    assert retried.json()["committed"] is True
+    assert retried.json()["missingBlocks"] == []
+    assert recording.call_count == 1
+    upload = json.loads(store.blobs[f"uploads/resumable/{upload_id}.json"])
+    assert upload["committed"] is True
+
+
+async def test_unknown_and_invalid_upload_ids(store, client):
+    unknown = await client.get("/v1/upload/3fa85f64-5717-4562-b3fc-2c963f66afa6")
+    invalid = await client.get("/v1/upload/not-a-uuid")
+    with patch("app.routers.upload.load_blob_json", side_effect=StorageError("down")):
+        unavailable = await client.get(
+            "/v1/upload/3fa85f64-5717-4562-b3fc-2c963f66afa6"
+        )
+
+    assert unknown.status_code == 404
+    assert invalid.status_code == 400
+    assert unavailable.status_code == 500
+
+
+async def test_oversized_upload_is_rejected(store, client):
+    response = await client.post("/v1/upload/resumable", json=_request(4 * 50_001))
+
+    assert response.status_code == 400
+
+
+async def test_filesystem_backend_accepts_put_block(tmp_path, client):
+    backend = FilesystemBackend(tmp_path, public_url="http://test")
+    with (
+        patch("app.storage.get_storage_backend", return_value=backend),
+        patch("app.routers.local_storage.get_storage_backend", return_value=backend),
+    ):
+        status = (await client.post("/v1/upload/resumable", json=_request())).json()
+        for index in (2, 0, 1):
+            url = f"{status['blockUrl']}&comp=block&blockid={status['blockIds'][index]}"
+            staged = await client.put(url, content=_block(index))
+            assert staged.status_code == 201
+        done = await client.post(f"/v1/upload/{status['uploadId']}/complete")
+        bad = await client.put(f"{status['blockUrl']}&comp=block&blockid=%%%")
+
+    assert done.status_code == 200
+    audio = tmp_path / "uploads/audio_and_metadata" / CLIENT_ID / "long-take.flac"
+    assert audio.read_bytes() == AUDIO
+    assert not any((tmp_path / ".blocks").iterdir())
+    assert bad.status_code == 400
@@ -0,0 +1,109 @@
+"""Tests for the startup warm-up and readiness endpoint."""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.cache import TTLCache
+from app.main import app
+from app.metrics import CACHE_REQUESTS, REGISTRY
+from app.settings import get_settings
+from app.warmup import WarmupState, run_warmup
+from tests.fake_blob_storage import FakeBlobStore
+
+pytestmark = pytest.mark.anyio
+
+
+def _theme(media_url: str) -> bytes:
+    return json.dumps(
+        {
+            "mediaState": {"title": "T", "body1": "b1", "body2": "b2", "url": media_url},
+            "schedule": None,
+        }
+    ).encode("utf-8")
+
+
+@pytest.fixture
+def store():
+    store = FakeBlobStore()
+    store.put("theme/theme-1/se.json", _theme("small.jpg"))
+    store.put("theme/theme-1/fi.json", _theme("small.jpg"))
+    store.put("theme/theme-2/se.json", _theme("big.mp4"))
+    store.put("media/small.jpg", b"\xff\xd8" * 100)
+    store.put("media/big.mp4", b"\x00" * (get_settings().media_cache_max_file_bytes + 1))
+    with patch(
+        "app.storage_backends.azure.get_blob_service_client", side_effect=store.client
+    ):
+        yield store
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    REGISTRY.reset()
+    yield
+    REGISTRY.reset()
+
+
+async def test_warmup_preloads_themes_and_small_media(store):
+    state = await run_warmup(WarmupState())
+
+    assert state.ready and not state.timed_out
+    assert (state.themes_loaded, state.themes_failed) == (3, 0)
+    assert state.media_cached == 1
+
+    # Served from the caches without touching storage again.
+    store.blobs.clear()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        theme = await client.get("/v1/theme/theme-2", params={"lang": "se"})
+        media = await client.get("/v1/media/small.jpg")
+
+    assert theme.status_code == 200
+    assert media.status_code == 200
+    assert media.content == b"\xff\xd8" * 100
+    assert CACHE_REQUESTS.value(cache="theme", result="hit") == 1
+    assert CACHE_REQUESTS.value(cache="media", result="hit") == 1
+
+
+async def test_warmup_becomes_ready_when_budget_runs_out(store, monkeypatch):
+    monkeypatch.setattr(get_settings(), "warmup_budget_seconds", 0.01)
+
+    async def slow_preload(concurrency: int = 16):
+        await asyncio.sleep(1)
+        return 0, 0
+
+    with patch("app.warmup.preload_themes", side_effect=slow_preload):
+        state = await run_warmup(WarmupState())
+
+    assert state.ready
+    assert state.timed_out
+
+
+async def test_ready_endpoint_reports_warmup_state():
+    state = WarmupState()
+    transport = ASGITransport(app=app)
+    with patch("app.main.warmup_state", state):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            warming = await client.get("/ready")
+            state.ready = True
+            ready = await client.get("/ready")
+
+    assert warming.status_code == 503
+    assert warming.json()["ready"] is False
+    assert ready.status_code == 200
+
+
+def test_ttl_cache_evicts_to_stay_within_byte_budget():
+    cache: TTLCache[str, bytes] = TTLCache(ttl_seconds=60, max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    cache.set("c", b"1234")
+    cache.set("huge", b"x" * 11)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == b"1234"
+    assert cache.get("huge") is None
+    assert cache.total_bytes == 8
@@ -7,6 +7,8 @@ import os
 
 from azure.storage.blob import BlobServiceClient
 
+from .init_storage import write_content_version
+
 AZURITE_CONNECTION_STRING = (
     "DefaultEndpointsProtocol=http;"
     "AccountName=devstoreaccount1;"
@@ -128,6 +130,7 @@ def main() -> int:
             print("\nDeleting test data...")
             for prefix in ["schedule/", "theme/", "media/"]:
                 delete_prefix(container_client, prefix)
+            write_content_version(client)
         elif choice == "4":
             delete_prefix(container_client, "uploads/")
         elif choice == "5":
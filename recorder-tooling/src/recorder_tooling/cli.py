@@ -6,7 +6,14 @@ from pathlib import Path
 import typer
 
 from .cleanup_storage import main as cleanup_storage_main
+from .compact_metadata import (
+    DEFAULT_SEGMENT_RECORDS,
+    DEFAULT_SETTLE_SECONDS,
+    DEFAULT_WORKERS,
+    compact_metadata_main,
+)
 from .count_missing_translations import write_multilang_workbook_json
+from .export_corpus import DEFAULT_INDEX_PATH, Selection, export_main
 from .convert_excel_to_json import convert_workbook
 from .init_storage import init_storage_main
 from .optimize_media_images import optimize_media_images
@@ -174,6 +181,58 @@ def optimize_images(
     typer.echo(f"Saved:  {saved_bytes / (1024 * 1024):.2f} MiB ({saved_percent:.1f}%)")
 
 
+@app.command("export")
+def export(
+    out_dir: Path = typer.Argument(..., help="Directory the shards are written to"),
+    language: list[str] = typer.Option(
+        [],
+        "--language",
+        help="Only recordings whose metadata has this language (repeatable); "
+        "app uploads do not store it",
+    ),
+    schedule: list[str] = typer.Option(
+        [],
+        "--schedule",
+        help="Only recordings whose metadata has this schedule ID (repeatable); "
+        "app uploads do not store it",
+    ),
+    since: str | None = typer.Option(
+        None, "--since", help="Only recordings made on or after YYYY-MM-DD"
+    ),
+    until: str | None = typer.Option(
+        None, "--until", help="Only recordings made on or before YYYY-MM-DD"
+    ),
+    index: Path = typer.Option(
+        DEFAULT_INDEX_PATH, "--index", help="Local metadata index, kept between runs"
+    ),
+    shard_size_mb: int = typer.Option(1024, help="Audio per tar shard, in MiB"),
+    workers: int = typer.Option(16, help="Concurrent downloads"),
+    update_index: bool = typer.Option(
+        True, help="Bring the index up to date with storage first"
+    ),
+    verify_only: bool = typer.Option(
+        False, "--verify", help="Only verify an existing export"
+    ),
+) -> None:
+    """Export recordings as sharded tar files with checksum manifests.
+
+    Rerun the same command to resume an interrupted export.
+    """
+    raise typer.Exit(
+        code=export_main(
+            out_dir,
+            index_path=index,
+            selection=Selection(
+                languages=language, schedule_ids=schedule, since=since, until=until
+            ),
+            shard_bytes=shard_size_mb * 1024 * 1024,
+            workers=workers,
+            update=update_index,
+            verify_only=verify_only,
+        )
+    )
+
+
 @storage_app.command("init")
 def storage_init(
     content_dir: Path = typer.Argument(
@@ -190,6 +249,46 @@ def storage_cleanup() -> None:
     raise typer.Exit(code=cleanup_storage_main())
 
 
+@storage_app.command("compact-metadata")
+def storage_compact_metadata(
+    segment_records: int = typer.Option(
+        DEFAULT_SEGMENT_RECORDS, help="Most records written to one segment"
+    ),
+    settle_seconds: float = typer.Option(
+        DEFAULT_SETTLE_SECONDS,
+        help="Metadata blobs younger than this are left for the next run",
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, help="Partitions compacted in parallel"
+    ),
+    prune: bool = typer.Option(
+        False, help="Also drop records of deleted uploads from existing segments"
+    ),
+) -> None:
+    """Roll new upload metadata blobs into daily compressed NDJSON segments."""
+    raise typer.Exit(
+        code=compact_metadata_main(
+            segment_records=segment_records,
+            settle_seconds=settle_seconds,
+            workers=workers,
+            prune=prune,
+        )
+    )
+
+
+@storage_app.command("reconcile-manifests")
+def storage_reconcile_manifests() -> None:
+    """Add missing blob names to client upload manifests and mark them complete."""
+    import asyncio
+
+    from app.manifests import reconcile_manifests
+
+    repaired = asyncio.run(reconcile_manifests())
+    for client_id, added in repaired.items():
+        typer.echo(f"{client_id}: added {added} blob names")
+    typer.echo(f"Reconciled {len(repaired)} manifests")
+
+
 app.add_typer(storage_app, name="storage")
 
 
@@ -0,0 +1,530 @@
+"""Compact per-recording metadata blobs into partitioned NDJSON segments.
+
+Every upload writes one small JSON blob under
+``uploads/audio_and_metadata/metadata/``. Reading the corpus that way means
+one GET per recording. This job rolls metadata blobs into gzip-compressed
+NDJSON segments, partitioned by the day the blob was created::
+
+    uploads/compacted/metadata/
+        _state.json                          resume marker
+        dt=2025-01-31/manifest.json          segments of the partition
+        dt=2025-01-31/part-<run>-0000.ndjson.gz
+
+Each segment line is ``{"blobName": ..., "createdAt": ..., "metadata": {...}}``.
+Read a partition through its manifest; segments not listed there are
+leftovers of an interrupted run.
+
+A run compacts the blobs created between the previous run's cutoff (the
+watermark) and its own cutoff, which lies ``settle`` seconds in the past so
+that uploads still being written are left for the next run. The cutoff is
+stored in ``_state.json`` before anything is written, so an interrupted run
+resumes with the same blobs and segment names: partitions whose manifest
+already lists the run are skipped, others are rewritten in place. The
+watermark only advances once every partition is done.
+
+A run claims ``_state.json`` by writing its owner ID and a heartbeat into
+``pending`` under an ETag condition, resumed runs included, and renews the
+heartbeat while it works. Another run refuses to start while the heartbeat
+is younger than the lock timeout and takes over an interrupted run after
+that. A run whose claim was taken over fails on its next state write and
+writes no further manifests.
+
+Segments are copies. After donors delete their data, run with ``prune``
+to rewrite segments without the records whose metadata blob is gone.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    AzureError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from azure.storage.blob import BlobServiceClient, ContainerClient, ContentSettings
+
+from .init_storage import CONNECTION_STRING, CONTAINER_NAME, IS_AZURE
+
+METADATA_PREFIX = "uploads/audio_and_metadata/metadata/"
+COMPACTED_PREFIX = "uploads/compacted/metadata/"
+STATE_BLOB = f"{COMPACTED_PREFIX}_state.json"
+MANIFEST_NAME = "manifest.json"
+
+DEFAULT_SEGMENT_RECORDS = 50_000
+DEFAULT_SETTLE_SECONDS = 600
+DEFAULT_WORKERS = 8
+DEFAULT_LOCK_SECONDS = 900
+
+RUN_ID_FORMAT = "%Y%m%dT%H%M%SZ"
+
+
+class CompactionInProgress(Exception):
+    """Another run holds the compaction state."""
+
+
+@dataclass
+class CompactionSummary:
+    run_id: str
+    resumed: bool = False
+    blobs_compacted: int = 0
+    partitions_compacted: int = 0
+    partitions_skipped: int = 0
+    segments_written: int = 0
+    records_pruned: int = 0
+    partitions: list[str] = field(default_factory=list)
+
+
+@dataclass
+class _Blob:
+    name: str
+    created: datetime
+
+
+def partition_prefix(day: str) -> str:
+    """Return the prefix of one day's partition (day as YYYY-MM-DD)."""
+    return f"{COMPACTED_PREFIX}dt={day}/"
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def _load_json(
+    container_client: ContainerClient, blob_name: str
+) -> tuple[dict[str, Any] | None, str | None]:
+    """Return a JSON blob and its ETag, or (None, None) if it does not exist."""
+    try:
+        downloader = container_client.download_blob(blob_name)
+        content = downloader.readall()
+    except ResourceNotFoundError:
+        return None, None
+    return json.loads(content), downloader.properties.etag
+
+
+def _write_json(
+    container_client: ContainerClient,
+    blob_name: str,
+    payload: dict[str, Any],
+    etag: str | None,
+) -> str:
+    """Write a JSON blob only if it is unchanged since read; return the new ETag.
+
+    Raises:
+        ResourceExistsError / ResourceModifiedError: If another writer got there
+    """
+    data = json.dumps(payload, indent=2).encode("utf-8")
+    blob_client = container_client.get_blob_client(blob_name)
+    settings = ContentSettings(content_type="application/json")
+    if etag is None:
+        result = blob_client.upload_blob(
+            data, overwrite=False, content_settings=settings
+        )
+    else:
+        result = blob_client.upload_blob(
+            data,
+            overwrite=True,
+            content_settings=settings,
+            etag=etag,
+            match_condition=MatchConditions.IfNotModified,
+        )
+    return result["etag"]
+
+
+class _StateLock:
+    """One run's claim on ``_state.json``.
+
+    Every state write is conditional on the ETag of the previous one, so
+    the claim is lost as soon as anyone else writes the state.
+    """
+
+    def __init__(self, container_client: ContainerClient, lock_seconds: float) -> None:
+        self.owner = uuid.uuid4().hex
+        self._container = container_client
+        self._lock_seconds = lock_seconds
+        self._state: dict[str, Any] = {}
+        self._etag: str | None = None
+        self._mutex = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat: threading.Thread | None = None
+        self._lost: Exception | None = None
+
+    def read(self, now: datetime) -> dict[str, Any]:
+        """Read the state, refusing to go on while another run holds it.
+
+        Raises:
+            CompactionInProgress: If another run renewed its claim recently
+        """
+        state, self._etag = _load_json(self._container, STATE_BLOB)
+        self._state = state or {}
+        pending = self._state.get("pending") or {}
+        if pending.get("owner") and pending.get("heartbeat"):
+            age = now - _parse_time(pending["heartbeat"])
+            if age < timedelta(seconds=self._lock_seconds):
+                raise CompactionInProgress(
+                    f"Run {pending['owner']} is still running "
+                    f"(last heartbeat {pending['heartbeat']})"
+                )
+        return self._state
+
+    def claim(self, cutoff: datetime, now: datetime) -> None:
+        """Write this run's cutoff and owner and start renewing the claim.
+
+        Raises:
+            ResourceExistsError / ResourceModifiedError: If another run got there
+        """
+        self._state["pending"] = {
+            "cutoff": cutoff.isoformat(),
+            "owner": self.owner,
+            "heartbeat": now.isoformat(),
+        }
+        self._etag = _write_json(self._container, STATE_BLOB, self._state, self._etag)
+        self._heartbeat = threading.Thread(target=self._renew, daemon=True)
+        self._heartbeat.start()
+
+    def _renew(self) -> None:
+        while not self._stopped.wait(self._lock_seconds / 3):
+            with self._mutex:
+                self._state["pending"]["heartbeat"] = datetime.now(
+                    timezone.utc
+                ).isoformat()
+                try:
+                    self._etag = _write_json(
+                        self._container, STATE_BLOB, self._state, self._etag
+                    )
+                except (ResourceExistsError, ResourceModifiedError) as e:
+                    self._lost = e
+                    return
+                except AzureError as e:
+                    # Transient; the next heartbeat tries again.
+                    print(f"⚠️  Could not renew the compaction claim: {e}")
+
+    def check(self) -> None:
+        """Raise if another run has taken the state over."""
+        if self._lost is not None:
+            raise self._lost
+
+    def stop(self) -> None:
+        """Stop renewing the claim, so another run can take over once it expires."""
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+
+    def release(self, state: dict[str, Any]) -> None:
+        """Write the final state, which ends the claim.
+
+        Raises:
+            ResourceModifiedError: If another run took the state over
+        """
+        self.stop()
+        self.check()
+        _write_json(self._container, STATE_BLOB, state, self._etag)
+
+
+def _list_metadata(container_client: ContainerClient) -> list[_Blob]:
+    blobs = []
+    for blob in container_client.list_blobs(name_starts_with=METADATA_PREFIX):
+        if not blob.name.endswith(".json"):
+            continue
+        created = blob.creation_time or blob.last_modified
+        blobs.append(_Blob(blob.name, created.astimezone(timezone.utc)))
+    return blobs
+
+
+def _segment_lines(
+    container_client: ContainerClient, blobs: list[_Blob]
+) -> list[bytes]:
+    lines = []
+    for blob in sorted(blobs, key=lambda b: (b.created, b.name)):
+        try:
+            content = container_client.download_blob(blob.name).readall()
+        except ResourceNotFoundError:
+            # Deleted by its donor since the listing.
+            continue
+        try:
+            metadata = json.loads(content)
+        except ValueError:
+            print(f"⚠️  Skipping unreadable metadata blob {blob.name}")
+            continue
+        record = {
+            "blobName": blob.name,
+            "createdAt": blob.created.isoformat(),
+            "metadata": metadata,
+        }
+        lines.append(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+    return lines
+
+
+def _write_segment(
+    container_client: ContainerClient, blob_name: str, lines: list[bytes], run_id: str
+) -> dict[str, Any]:
+    # mtime=0 keeps the bytes, and so the checksum, the same on a rerun.
+    data = gzip.compress(b"".join(lines), mtime=0)
+    container_client.upload_blob(
+        blob_name,
+        data,
+        overwrite=True,
+        content_settings=ContentSettings(content_type="application/gzip"),
+    )
+    return {
+        "name": blob_name.rsplit("/", 1)[1],
+        "run": run_id,
+        "records": len(lines),
+        "bytes": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+
+
+def compact_partition(
+    container_client: ContainerClient,
+    day: str,
+    blobs: list[_Blob],
+    run_id: str,
+    segment_records: int = DEFAULT_SEGMENT_RECORDS,
+    check: Callable[[], None] = lambda: None,
+) -> int:
+    """
+    Write one run's segments of a partition and list them in its manifest.
+
+    ``check`` is called before anything is written and raises to stop.
+
+    Returns:
+        Number of segments written, or -1 if the run was already recorded
+    """
+    prefix = partition_prefix(day)
+    manifest_name = prefix + MANIFEST_NAME
+    manifest, etag = _load_json(container_client, manifest_name)
+    if manifest is None:
+        manifest = {"partition": day, "segments": []}
+    elif any(segment["run"] == run_id for segment in manifest["segments"]):
+        return -1
+
+    lines = _segment_lines(container_client, blobs)
+    check()
+    segments = []
+    for index, start in enumerate(range(0, len(lines), segment_records)):
+        segment_name = f"{prefix}part-{run_id}-{index:04d}.ndjson.gz"
+        segments.append(
+            _write_segment(
+                container_client,
+                segment_name,
+                lines[start : start + segment_records],
+                run_id,
+            )
+        )
+
+    manifest["segments"].extend(segments)
+    manifest["records"] = sum(s["records"] for s in manifest["segments"])
+    check()
+    _write_json(container_client, manifest_name, manifest, etag)
+
+    # A retry of an interrupted run may need fewer segments than the first try.
+    written = {segment["name"] for segment in segments}
+    for blob in container_client.list_blobs(name_starts_with=f"{prefix}part-{run_id}-"):
+        if blob.name.rsplit("/", 1)[1] not in written:
+            container_client.delete_blob(blob.name)
+    return len(segments)
+
+
+def prune_partition(
+    container_client: ContainerClient,
+    manifest_name: str,
+    existing: set[str],
+    check: Callable[[], None] = lambda: None,
+) -> int:
+    """
+    Rewrite a partition's segments without records of deleted metadata blobs.
+
+    ``check`` is called before anything is written and raises to stop.
+
+    Returns:
+        Number of records removed
+    """
+    manifest, etag = _load_json(container_client, manifest_name)
+    if manifest is None:
+        return 0
+    prefix = manifest_name[: -len(MANIFEST_NAME)]
+
+    removed = 0
+    segments = []
+    for segment in manifest["segments"]:
+        blob_name = prefix + segment["name"]
+        content = gzip.decompress(container_client.download_blob(blob_name).readall())
+        lines = content.splitlines(keepends=True)
+        kept = [line for line in lines if json.loads(line)["blobName"] in existing]
+        if len(kept) == len(lines):
+            segments.append(segment)
+            continue
+        removed += len(lines) - len(kept)
+        check()
+        if kept:
+            segments.append(
+                _write_segment(container_client, blob_name, kept, segment["run"])
+            )
+        else:
+            container_client.delete_blob(blob_name)
+
+    if removed:
+        manifest["segments"] = segments
+        manifest["records"] = sum(s["records"] for s in segments)
+        check()
+        _write_json(container_client, manifest_name, manifest, etag)
+    return removed
+
+
+def compact_metadata(
+    container_client: ContainerClient,
+    segment_records: int = DEFAULT_SEGMENT_RECORDS,
+    settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+    workers: int = DEFAULT_WORKERS,
+    prune: bool = False,
+    now: datetime | None = None,
+    lock_seconds: float = DEFAULT_LOCK_SECONDS,
+) -> CompactionSummary:
+    """
+    Compact the metadata blobs created since the last run.
+
+    Args:
+        container_client: Container holding the uploads
+        segment_records: Most records written to one segment
+        settle_seconds: Blobs younger than this are left for the next run
+        workers: Partitions compacted in parallel
+        prune: Also drop records of deleted metadata blobs from all segments
+        now: Current time (for tests)
+        lock_seconds: Heartbeat age after which another run may take over
+
+    Returns:
+        What the run did
+
+    Raises:
+        CompactionInProgress: If another run holds the state
+        ResourceModifiedError: If another run took the state over meanwhile
+    """
+    now = now or datetime.now(timezone.utc)
+    lock = _StateLock(container_client, lock_seconds)
+    state = lock.read(now)
+    watermark = _parse_time(state["watermark"]) if state.get("watermark") else None
+
+    pending = state.get("pending")
+    if pending:
+        cutoff = _parse_time(pending["cutoff"])
+    else:
+        cutoff = (now - timedelta(seconds=settle_seconds)).replace(microsecond=0)
+    lock.claim(cutoff, now)
+
+    try:
+        summary = CompactionSummary(run_id=cutoff.strftime(RUN_ID_FORMAT))
+        summary.resumed = bool(pending)
+
+        blobs = _list_metadata(container_client)
+        by_day: dict[str, list[_Blob]] = defaultdict(list)
+        for blob in blobs:
+            if (
+                watermark is None or blob.created >= watermark
+            ) and blob.created < cutoff:
+                by_day[blob.created.date().isoformat()].append(blob)
+        summary.partitions = sorted(by_day)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = executor.map(
+                lambda day: compact_partition(
+                    container_client,
+                    day,
+                    by_day[day],
+                    summary.run_id,
+                    segment_records,
+                    lock.check,
+                ),
+                summary.partitions,
+            )
+            for day, written in zip(summary.partitions, results):
+                if written < 0:
+                    summary.partitions_skipped += 1
+                    continue
+                summary.partitions_compacted += 1
+                summary.segments_written += written
+                summary.blobs_compacted += len(by_day[day])
+
+            if prune:
+                existing = {blob.name for blob in blobs}
+                manifests = [
+                    blob.name
+                    for blob in container_client.list_blobs(
+                        name_starts_with=COMPACTED_PREFIX
+                    )
+                    if blob.name.endswith(f"/{MANIFEST_NAME}")
+                ]
+                summary.records_pruned = sum(
+                    executor.map(
+                        lambda name: prune_partition(
+                            container_client, name, existing, lock.check
+                        ),
+                        manifests,
+                    )
+                )
+
+        lock.release(
+            {
+                "watermark": cutoff.isoformat(),
+                "pending": None,
+                "lastRun": {
+                    **asdict(summary),
+                    "finishedAt": datetime.now(timezone.utc).isoformat(),
+                },
+            }
+        )
+    finally:
+        lock.stop()
+    return summary
+
+
+def compact_metadata_main(
+    segment_records: int = DEFAULT_SEGMENT_RECORDS,
+    settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+    workers: int = DEFAULT_WORKERS,
+    prune: bool = False,
+) -> int:
+    """Compact metadata blobs in the configured container."""
+    if IS_AZURE:
+        print("🔵 Using Azure Blob Storage")
+    else:
+        print("🟡 Using local Azurite storage")
+    print(f"   Container: {CONTAINER_NAME}\n")
+
+    try:
+        client = BlobServiceClient.from_connection_string(CONNECTION_STRING)
+        container_client = client.get_container_client(CONTAINER_NAME)
+        summary = compact_metadata(
+            container_client,
+            segment_records=segment_records,
+            settle_seconds=settle_seconds,
+            workers=workers,
+            prune=prune,
+        )
+    except Exception as exc:
+        print(f"❌ Error: {exc}")
+        return 1
+
+    if summary.resumed:
+        print(f"↻ Resumed interrupted run {summary.run_id}")
+    print(
+        f"✓ Compacted {summary.blobs_compacted} metadata blobs into "
+        f"{summary.segments_written} segments across "
+        f"{summary.partitions_compacted} partitions"
+    )
+    if summary.partitions_skipped:
+        print(f"✓ {summary.partitions_skipped} partitions were already done")
+    if prune:
+        print(f"✓ Pruned {summary.records_pruned} records of deleted uploads")
+    return 0
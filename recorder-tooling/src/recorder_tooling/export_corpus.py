@@ -0,0 +1,669 @@
+"""Export recordings for researchers as sharded tar archives.
+
+An export has two steps:
+
+1. ``update_index`` brings a local SQLite index of recording metadata up to
+   date. Compacted metadata segments (see ``compact_metadata``) are read
+   once each and skipped afterwards unless their checksum changes; only
+   metadata blobs not yet in the index are downloaded one by one. Audio
+   blob names and sizes come from one listing. Recordings whose metadata
+   blob has been deleted are dropped from the index.
+
+2. ``export_corpus`` selects recordings by language, schedule and creation
+   date, plans shards of at most ``shard_bytes`` of audio and writes each
+   shard as ``shard-NNNNN.tar`` holding ``<path>.<ext>`` audio and
+   ``<path>.json`` metadata for every recording. Audio is downloaded
+   concurrently over one pooled connection set. Each finished shard gets a
+   ``shard-NNNNN.json`` manifest with the SHA-256 and duration of every
+   recording, and ``SHA256SUMS`` lists the shard checksums. Durations are
+   read from the WAV or FLAC header of the audio.
+
+Uploads store only the IDs, content type and timestamp of a recording
+(the backend's ``UploadMetadata`` drops other fields), so language and
+schedule are only known for metadata written by other means. Selecting by
+them matches nothing in a corpus of app uploads.
+
+The plan is stored in ``export.json`` in the output directory. Running the
+same export again skips shards that have a manifest and rewrites any shard
+that was interrupted, so an export can be resumed at any point.
+``verify_export`` checks every shard and recording against the manifests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tarfile
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable
+
+import aiohttp
+from azure.core.exceptions import ResourceNotFoundError
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob.aio import BlobServiceClient, ContainerClient
+
+from .compact_metadata import COMPACTED_PREFIX, MANIFEST_NAME, METADATA_PREFIX
+from .init_storage import CONNECTION_STRING, CONTAINER_NAME, IS_AZURE
+
+UPLOAD_PREFIX = "uploads/audio_and_metadata/"
+
+DEFAULT_INDEX_PATH = Path("corpus-index.sqlite")
+DEFAULT_SHARD_BYTES = 1024 * 1024 * 1024
+DEFAULT_WORKERS = 16
+
+PLAN_FILE = "export.json"
+CHECKSUM_FILE = "SHA256SUMS"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    metadata_blob TEXT PRIMARY KEY,
+    stem TEXT NOT NULL,
+    client_id TEXT,
+    session_id TEXT,
+    item_id TEXT,
+    schedule_id TEXT,
+    language TEXT,
+    created_at TEXT NOT NULL,
+    duration REAL,
+    content_type TEXT,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_stem ON recordings (stem);
+CREATE INDEX IF NOT EXISTS recordings_source ON recordings (source);
+CREATE INDEX IF NOT EXISTS recordings_language ON recordings (language);
+CREATE TABLE IF NOT EXISTS segments (
+    name TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS audio (
+    stem TEXT PRIMARY KEY,
+    blob_name TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+
+@dataclass
+class Selection:
+    languages: list[str] = field(default_factory=list)
+    schedule_ids: list[str] = field(default_factory=list)
+    # Creation dates as YYYY-MM-DD, both inclusive.
+    since: str | None = None
+    until: str | None = None
+
+
+@dataclass
+class IndexSummary:
+    recordings: int = 0
+    segments_read: int = 0
+    blobs_read: int = 0
+    recordings_removed: int = 0
+
+
+@dataclass
+class ExportSummary:
+    recordings: int = 0
+    shards: int = 0
+    shards_written: int = 0
+    shards_skipped: int = 0
+    recordings_missing: int = 0
+
+
+# --- Index ---
+
+
+def open_index(path: Path) -> sqlite3.Connection:
+    """Open (creating if needed) the local metadata index."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _stem(metadata_blob: str) -> str:
+    """Path of a recording below the upload prefix, without extension."""
+    return metadata_blob[len(METADATA_PREFIX) : -len(".json")]
+
+
+def _index_row(
+    metadata_blob: str, created_at: str, metadata: dict[str, Any], source: str
+) -> tuple:
+    language = metadata.get("language")
+    duration = metadata.get("duration")
+    return (
+        metadata_blob,
+        _stem(metadata_blob),
+        metadata.get("clientId"),
+        metadata.get("sessionId"),
+        metadata.get("itemId"),
+        metadata.get("scheduleId"),
+        language.lower() if isinstance(language, str) else None,
+        created_at,
+        float(duration) if isinstance(duration, (int, float)) else None,
+        metadata.get("contentType"),
+        source,
+    )
+
+
+def _insert_rows(conn: sqlite3.Connection, rows: Iterable[tuple]) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO recordings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+
+
+async def _read(container: ContainerClient, blob_name: str) -> bytes | None:
+    """Download a blob, or return None if it does not exist."""
+    try:
+        downloader = await container.download_blob(blob_name)
+        return await downloader.readall()
+    except ResourceNotFoundError:
+        return None
+
+
+async def _ordered(
+    items: list[Any],
+    fetch: Callable[[Any], Awaitable[Any]],
+    workers: int,
+) -> AsyncIterator[Any]:
+    """Yield fetch(item) for each item in order, with up to workers in flight."""
+    remaining = iter(items)
+    pending: deque[asyncio.Future] = deque(
+        asyncio.ensure_future(fetch(item)) for item in islice(remaining, workers)
+    )
+    try:
+        while pending:
+            result = await pending.popleft()
+            # Keep the window full while the caller handles this result.
+            pending.extend(
+                asyncio.ensure_future(fetch(item)) for item in islice(remaining, 1)
+            )
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _index_segments(
+    container: ContainerClient, conn: sqlite3.Connection, summary: IndexSummary
+) -> None:
+    manifests = [
+        blob.name
+        async for blob in container.list_blobs(name_starts_with=COMPACTED_PREFIX)
+        if blob.name.endswith(f"/{MANIFEST_NAME}")
+    ]
+    seen: set[str] = set()
+    for manifest_name in manifests:
+        content = await _read(container, manifest_name)
+        if content is None:
+            continue
+        prefix = manifest_name[: -len(MANIFEST_NAME)]
+        for segment in json.loads(content)["segments"]:
+            name = prefix + segment["name"]
+            seen.add(name)
+            known = conn.execute(
+                "SELECT sha256 FROM segments WHERE name = ?", (name,)
+            ).fetchone()
+            if known is not None and known["sha256"] == segment["sha256"]:
+                continue
+            data = await _read(container, name)
+            if data is None:
+                continue
+            records = [json.loads(line) for line in gzip.decompress(data).splitlines()]
+            with conn:
+                conn.execute("DELETE FROM recordings WHERE source = ?", (name,))
+                _insert_rows(
+                    conn,
+                    (
+                        _index_row(
+                            record["blobName"],
+                            record["createdAt"],
+                            record["metadata"],
+                            name,
+                        )
+                        for record in records
+                    ),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO segments VALUES (?, ?)",
+                    (name, segment["sha256"]),
+                )
+            summary.segments_read += 1
+
+    # Segments dropped by compaction pruning.
+    with conn:
+        for row in conn.execute("SELECT name FROM segments").fetchall():
+            if row["name"] not in seen:
+                conn.execute("DELETE FROM recordings WHERE source = ?", (row["name"],))
+                conn.execute("DELETE FROM segments WHERE name = ?", (row["name"],))
+
+
+async def update_index(
+    container: ContainerClient, conn: sqlite3.Connection, workers: int = DEFAULT_WORKERS
+) -> IndexSummary:
+    """
+    Bring the local index up to date with storage.
+
+    Args:
+        container: Container holding the uploads
+        conn: Index opened with ``open_index``
+        workers: Metadata blobs downloaded concurrently
+
+    Returns:
+        What was read and how many recordings the index holds
+    """
+    summary = IndexSummary()
+    listed: dict[str, str] = {}
+    audio: list[tuple[str, str, int]] = []
+    async for blob in container.list_blobs(name_starts_with=UPLOAD_PREFIX):
+        if blob.name.startswith(METADATA_PREFIX):
+            if blob.name.endswith(".json"):
+                created = blob.creation_time or blob.last_modified
+                listed[blob.name] = created.astimezone(timezone.utc).isoformat()
+        elif "." in blob.name.rsplit("/", 1)[-1]:
+            stem = blob.name[len(UPLOAD_PREFIX) :].rsplit(".", 1)[0]
+            audio.append((stem, blob.name, blob.size))
+
+    await _index_segments(container, conn, summary)
+
+    indexed = {row[0] for row in conn.execute("SELECT metadata_blob FROM recordings")}
+    missing = sorted(name for name in listed if name not in indexed)
+
+    async def fetch(name: str) -> tuple[str, bytes | None]:
+        return name, await _read(container, name)
+
+    rows = []
+    async for name, content in _ordered(missing, fetch, workers):
+        if content is None:
+            continue
+        try:
+            metadata = json.loads(content)
+        except ValueError:
+            print(f"⚠️  Skipping unreadable metadata blob {name}")
+            continue
+        rows.append(_index_row(name, listed[name], metadata, ""))
+        summary.blobs_read += 1
+        if len(rows) >= 1000:
+            with conn:
+                _insert_rows(conn, rows)
+            rows.clear()
+
+    with conn:
+        _insert_rows(conn, rows)
+        # Donors may have deleted recordings that segments still hold.
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS listed (name TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM listed")
+        conn.executemany("INSERT INTO listed VALUES (?)", ((n,) for n in listed))
+        summary.recordings_removed = conn.execute(
+            "DELETE FROM recordings"
+            " WHERE metadata_blob NOT IN (SELECT name FROM listed)"
+        ).rowcount
+        conn.execute("DELETE FROM audio")
+        conn.executemany("INSERT OR REPLACE INTO audio VALUES (?, ?, ?)", audio)
+
+    summary.recordings = conn.execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+    return summary
+
+
+def select_recordings(conn: sqlite3.Connection, selection: Selection) -> list[dict]:
+    """Return the indexed recordings matching a selection that have audio."""
+    sql = [
+        "SELECT r.*, a.blob_name AS audio_blob, a.size AS audio_size",
+        "FROM recordings r JOIN audio a ON a.stem = r.stem WHERE 1 = 1",
+    ]
+    params: list[Any] = []
+    if selection.languages:
+        sql.append(f"AND r.language IN ({', '.join('?' * len(selection.languages))})")
+        params.extend(language.lower() for language in selection.languages)
+    if selection.schedule_ids:
+        sql.append(
+            f"AND r.schedule_id IN ({', '.join('?' * len(selection.schedule_ids))})"
+        )
+        params.extend(selection.schedule_ids)
+    if selection.since:
+        sql.append("AND substr(r.created_at, 1, 10) >= ?")
+        params.append(selection.since)
+    if selection.until:
+        sql.append("AND substr(r.created_at, 1, 10) <= ?")
+        params.append(selection.until)
+    sql.append("ORDER BY r.created_at, r.metadata_blob")
+    return [dict(row) for row in conn.execute(" ".join(sql), params)]
+
+
+# --- Export ---
+
+
+def _wav_duration(data: bytes) -> float | None:
+    byte_rate = 0
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset : offset + 4]
+        size = int.from_bytes(data[offset + 4 : offset + 8], "little")
+        body = offset + 8
+        if chunk_id == b"fmt " and size >= 16:
+            byte_rate = int.from_bytes(data[body + 8 : body + 12], "little")
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            # Streaming writers may leave the size unset (0xFFFFFFFF).
+            return min(size, len(data) - body) / byte_rate
+        offset = body + size + (size & 1)
+    return None
+
+
+def _flac_duration(data: bytes) -> float | None:
+    # STREAMINFO is always the first metadata block.
+    if len(data) < 26 or data[4] & 0x7F != 0:
+        return None
+    packed = int.from_bytes(data[18:26], "big")
+    sample_rate = packed >> 44
+    total_samples = packed & ((1 << 36) - 1)
+    if not sample_rate or not total_samples:
+        return None
+    return total_samples / sample_rate
+
+
+def audio_duration(data: bytes) -> float | None:
+    """Return the duration in seconds from a WAV or FLAC header, if readable."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        duration = _wav_duration(data)
+    elif data[:4] == b"fLaC":
+        duration = _flac_duration(data)
+    else:
+        duration = None
+    return round(duration, 3) if duration is not None else None
+
+
+def plan_shards(recordings: list[dict], shard_bytes: int) -> list[list[dict]]:
+    """Split recordings, in order, into shards of at most shard_bytes of audio.
+
+    A recording larger than shard_bytes gets a shard of its own.
+    """
+    shards: list[list[dict]] = []
+    size = 0
+    for recording in recordings:
+        entry = {
+            "stem": recording["stem"],
+            "metadataBlob": recording["metadata_blob"],
+            "audioBlob": recording["audio_blob"],
+            "size": recording["audio_size"],
+            "duration": recording["duration"],
+            "language": recording["language"],
+            "scheduleId": recording["schedule_id"],
+            "createdAt": recording["created_at"],
+        }
+        if not shards or (shards[-1] and size + entry["size"] > shard_bytes):
+            shards.append([])
+            size = 0
+        shards[-1].append(entry)
+        size += entry["size"]
+    return shards
+
+
+def _write_json_atomic(path: Path, payload: dict[str, Any]) -> None:
+    partial = path.with_name(path.name + ".partial")
+    partial.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    os.replace(partial, path)
+
+
+def _sha256_file(path: Path) -> str:
+    with path.open("rb") as handle:
+        return hashlib.file_digest(handle, "sha256").hexdigest()
+
+
+def _add_member(tar: tarfile.TarFile, name: str, data: bytes, mtime: float) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    info.mode = 0o644
+    tar.addfile(info, io.BytesIO(data))
+
+
+def shard_manifest_path(shard: Path) -> Path:
+    return shard.with_suffix(".json")
+
+
+async def _write_shard(
+    container: ContainerClient, shard: Path, entries: list[dict], workers: int
+) -> int:
+    """Write one shard and then its manifest; return recordings missing."""
+
+    async def fetch(entry: dict) -> tuple[dict, bytes | None, bytes | None]:
+        audio, metadata = await asyncio.gather(
+            _read(container, entry["audioBlob"]),
+            _read(container, entry["metadataBlob"]),
+        )
+        return entry, audio, metadata
+
+    partial = shard.with_name(shard.name + ".partial")
+    recordings = []
+    missing = 0
+    with tarfile.open(partial, "w", format=tarfile.PAX_FORMAT) as tar:
+        async for entry, audio, metadata in _ordered(entries, fetch, workers):
+            if audio is None or metadata is None:
+                # Deleted by its donor since the export was planned.
+                missing += 1
+                continue
+            extension = entry["audioBlob"].rsplit(".", 1)[1]
+            mtime = datetime.fromisoformat(entry["createdAt"]).timestamp()
+            audio_path = f"{entry['stem']}.{extension}"
+            _add_member(tar, audio_path, audio, mtime)
+            _add_member(tar, f"{entry['stem']}.json", metadata, mtime)
+            duration = audio_duration(audio)
+            recordings.append(
+                {
+                    "path": audio_path,
+                    "bytes": len(audio),
+                    "sha256": hashlib.sha256(audio).hexdigest(),
+                    "metadataSha256": hashlib.sha256(metadata).hexdigest(),
+                    "duration": (
+                        duration if duration is not None else entry["duration"]
+                    ),
+                    "language": entry["language"],
+                    "scheduleId": entry["scheduleId"],
+                    "createdAt": entry["createdAt"],
+                }
+            )
+    os.replace(partial, shard)
+    _write_json_atomic(
+        shard_manifest_path(shard),
+        {
+            "shard": shard.name,
+            "bytes": shard.stat().st_size,
+            "sha256": _sha256_file(shard),
+            "recordings": recordings,
+        },
+    )
+    return missing
+
+
+async def export_corpus(
+    container: ContainerClient,
+    conn: sqlite3.Connection,
+    out_dir: Path,
+    selection: Selection,
+    shard_bytes: int = DEFAULT_SHARD_BYTES,
+    workers: int = DEFAULT_WORKERS,
+) -> ExportSummary:
+    """
+    Write, or resume writing, an export of the selected recordings.
+
+    Raises:
+        ValueError: If out_dir holds an export of a different selection
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    plan_path = out_dir / PLAN_FILE
+    if plan_path.exists():
+        plan = json.loads(plan_path.read_text(encoding="utf-8"))
+        if plan["selection"] != asdict(selection):
+            raise ValueError(f"{out_dir} holds an export of a different selection")
+    else:
+        recordings = select_recordings(conn, selection)
+        plan = {
+            "selection": asdict(selection),
+            "shardBytes": shard_bytes,
+            "plannedAt": datetime.now(timezone.utc).isoformat(),
+            "shards": plan_shards(recordings, shard_bytes),
+        }
+        _write_json_atomic(plan_path, plan)
+
+    summary = ExportSummary(shards=len(plan["shards"]))
+    checksums = []
+    for index, entries in enumerate(plan["shards"]):
+        shard = out_dir / f"shard-{index:05d}.tar"
+        summary.recordings += len(entries)
+        if shard_manifest_path(shard).exists():
+            summary.shards_skipped += 1
+        else:
+            summary.recordings_missing += await _write_shard(
+                container, shard, entries, max(1, workers)
+            )
+            summary.shards_written += 1
+        manifest = json.loads(shard_manifest_path(shard).read_text(encoding="utf-8"))
+        checksums.append(f"{manifest['sha256']}  {shard.name}\n")
+
+    partial = out_dir / f"{CHECKSUM_FILE}.partial"
+    partial.write_text("".join(checksums), encoding="utf-8")
+    os.replace(partial, out_dir / CHECKSUM_FILE)
+    return summary
+
+
+def verify_export(out_dir: Path) -> list[str]:
+    """
+    Check every shard and recording of an export against its manifests.
+
+    Returns:
+        Problems found; empty if the export is complete and intact
+    """
+    problems = []
+    plan = json.loads((out_dir / PLAN_FILE).read_text(encoding="utf-8"))
+    checksum_path = out_dir / CHECKSUM_FILE
+    listed = {}
+    if checksum_path.exists():
+        for line in checksum_path.read_text(encoding="utf-8").splitlines():
+            digest, name = line.split("  ", 1)
+            listed[name] = digest
+
+    for index in range(len(plan["shards"])):
+        shard = out_dir / f"shard-{index:05d}.tar"
+        manifest_path = shard_manifest_path(shard)
+        if not shard.exists() or not manifest_path.exists():
+            problems.append(f"{shard.name}: not written")
+            continue
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        digest = _sha256_file(shard)
+        if digest != manifest["sha256"] or listed.get(shard.name) != digest:
+            problems.append(f"{shard.name}: checksum mismatch")
+            continue
+        with tarfile.open(shard) as tar:
+            for recording in manifest["recordings"]:
+                try:
+                    member = tar.extractfile(recording["path"])
+                except KeyError:
+                    member = None
+                if member is None:
+                    problems.append(f"{shard.name}: {recording['path']} missing")
+                elif hashlib.sha256(member.read()).hexdigest() != recording["sha256"]:
+                    problems.append(f"{shard.name}: {recording['path']} corrupt")
+    return problems
+
+
+# --- CLI ---
+
+
+async def _run_export(
+    out_dir: Path,
+    index_path: Path,
+    selection: Selection,
+    shard_bytes: int,
+    workers: int,
+    update: bool,
+) -> tuple[IndexSummary | None, ExportSummary]:
+    conn = open_index(index_path)
+    try:
+        # One connection pool shared by every download.
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=workers)
+        ) as session:
+            transport = AioHttpTransport(session=session, session_owner=False)
+            async with BlobServiceClient.from_connection_string(
+                CONNECTION_STRING, transport=transport
+            ) as client:
+                container = client.get_container_client(CONTAINER_NAME)
+                index_summary = None
+                if update:
+                    index_summary = await update_index(container, conn, workers)
+                export_summary = await export_corpus(
+                    container, conn, out_dir, selection, shard_bytes, workers
+                )
+                return index_summary, export_summary
+    finally:
+        conn.close()
+
+
+def export_main(
+    out_dir: Path,
+    index_path: Path = DEFAULT_INDEX_PATH,
+    selection: Selection | None = None,
+    shard_bytes: int = DEFAULT_SHARD_BYTES,
+    workers: int = DEFAULT_WORKERS,
+    update: bool = True,
+    verify_only: bool = False,
+) -> int:
+    """Export (or verify an export of) recordings from the configured container."""
+    if not verify_only:
+        if IS_AZURE:
+            print("🔵 Using Azure Blob Storage")
+        else:
+            print("🟡 Using local Azurite storage")
+        print(f"   Container: {CONTAINER_NAME}\n")
+        try:
+            index_summary, summary = asyncio.run(
+                _run_export(
+                    out_dir,
+                    index_path,
+                    selection or Selection(),
+                    shard_bytes,
+                    workers,
+                    update,
+                )
+            )
+        except Exception as exc:
+            print(f"❌ Error: {exc}")
+            return 1
+        if index_summary is not None:
+            print(
+                f"✓ Index holds {index_summary.recordings} recordings "
+                f"({index_summary.segments_read} segments and "
+                f"{index_summary.blobs_read} metadata blobs read)"
+            )
+        print(
+            f"✓ Exported {summary.recordings} recordings in {summary.shards} shards "
+            f"({summary.shards_written} written, {summary.shards_skipped} already done)"
+        )
+        if summary.recordings_missing:
+            print(f"⚠️  {summary.recordings_missing} recordings were deleted meanwhile")
+        if selection and (selection.languages or selection.schedule_ids):
+            if not summary.recordings:
+                print(
+                    "⚠️  Uploads do not store language or schedule; "
+                    "--language and --schedule only match metadata that does"
+                )
+
+    problems = verify_export(out_dir)
+    for problem in problems:
+        print(f"✗ {problem}")
+    if problems:
+        print(f"❌ Export in {out_dir} is incomplete or damaged")
+        return 1
+    print(f"✓ Verified {out_dir}")
+    return 0
@@ -2,8 +2,11 @@
 
 from __future__ import annotations
 
+import json
 import os
 import time
+import uuid
+from datetime import datetime, timezone
 from pathlib import Path
 
 from azure.storage.blob import BlobServiceClient
@@ -22,6 +25,23 @@ CONTAINER_NAME = os.environ.get("AZURE_STORAGE_CONTAINER_NAME") or "recorder-con
 IS_AZURE = bool(os.environ.get("AZURE_STORAGE_CONNECTION_STRING"))
 CONTENT_ENV = "prod" if IS_AZURE else "dev"
 
+# Rewritten after every content change; backend replicas poll its ETag to
+# know when to re-check theme/ and media/ for changed blobs.
+CONTENT_VERSION_BLOB = "content-version.json"
+
+
+def write_content_version(client: BlobServiceClient) -> None:
+    """Bump the content version marker so running backends pick up changes."""
+    marker = {
+        "version": uuid.uuid4().hex,
+        "updatedAt": datetime.now(timezone.utc).isoformat(),
+    }
+    blob_client = client.get_blob_client(
+        container=CONTAINER_NAME, blob=CONTENT_VERSION_BLOB
+    )
+    blob_client.upload_blob(json.dumps(marker), overwrite=True)
+    print(f"✓ Updated {CONTENT_VERSION_BLOB}")
+
 
 def init_storage_main(content_dir: Path) -> int:
     """Initialize storage with content files."""
@@ -91,6 +111,8 @@ def init_storage_main(content_dir: Path) -> int:
         else:
             print(f"⚠ Warning: Media directory not found: {media_dir}")
 
+        write_content_version(client)
+
         print("\n✨ Storage initialized successfully!")
 
         if IS_AZURE:
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import gzip
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+
+from recorder_tooling.compact_metadata import (
+    METADATA_PREFIX,
+    STATE_BLOB,
+    CompactionInProgress,
+    compact_metadata,
+    partition_prefix,
+)
+
+NOW = datetime(2025, 3, 2, 12, 0, tzinfo=timezone.utc)
+
+
+@dataclass
+class _Properties:
+    name: str
+    creation_time: datetime
+    last_modified: datetime
+    etag: str
+
+
+class _Download:
+    def __init__(self, data: bytes, etag: str) -> None:
+        self._data = data
+        self.properties = _Properties("", NOW, NOW, etag)
+
+    def readall(self) -> bytes:
+        return self._data
+
+
+class FakeContainer:
+    """The subset of the sync ContainerClient used by the compaction job."""
+
+    def __init__(self) -> None:
+        self.blobs: dict[str, tuple[bytes, datetime, int]] = {}
+        self.version = 0
+        self.downloads = 0
+
+    def put(self, name: str, data: bytes, created: datetime = NOW) -> str:
+        self.version += 1
+        self.blobs[name] = (data, created, self.version)
+        return str(self.version)
+
+    def download_blob(self, name: str) -> _Download:
+        if name not in self.blobs:
+            raise ResourceNotFoundError(name)
+        self.downloads += 1
+        data, _, version = self.blobs[name]
+        return _Download(data, str(version))
+
+    def upload_blob(self, name: str, data: bytes, overwrite: bool = False, **kwargs):
+        if name in self.blobs and not overwrite:
+            raise ResourceExistsError(name)
+        self.put(name, data)
+
+    def get_blob_client(self, name: str) -> "_FakeBlobClient":
+        return _FakeBlobClient(self, name)
+
+    def list_blobs(self, name_starts_with: str = ""):
+        for name in sorted(self.blobs):
+            if name.startswith(name_starts_with):
+                _, created, version = self.blobs[name]
+                yield _Properties(name, created, created, str(version))
+
+    def delete_blob(self, name: str) -> None:
+        del self.blobs[name]
+
+
+class _FakeBlobClient:
+    def __init__(self, container: FakeContainer, name: str) -> None:
+        self._container = container
+        self._name = name
+
+    def upload_blob(self, data: bytes, overwrite: bool = False, etag=None, **kwargs):
+        existing = self._container.blobs.get(self._name)
+        if existing is not None and not overwrite:
+            raise ResourceExistsError(self._name)
+        if etag is not None and (existing is None or str(existing[2]) != etag):
+            raise ResourceModifiedError(self._name)
+        return {"etag": self._container.put(self._name, data)}
+
+
+def _metadata(container: FakeContainer, name: str, created: datetime) -> str:
+    blob_name = f"{METADATA_PREFIX}{name}.json"
+    container.put(blob_name, json.dumps({"itemId": name}).encode(), created)
+    return blob_name
+
+
+def _records(container: FakeContainer, day: str) -> list[dict]:
+    prefix = partition_prefix(day)
+    manifest = json.loads(container.blobs[prefix + "manifest.json"][0])
+    records = []
+    for segment in manifest["segments"]:
+        content = gzip.decompress(container.blobs[prefix + segment["name"]][0])
+        records.extend(json.loads(line) for line in content.splitlines())
+    return records
+
+
+def test_compacts_by_day_and_resumes_from_watermark() -> None:
+    container = FakeContainer()
+    _metadata(container, "a", NOW - timedelta(days=1))
+    _metadata(container, "b", NOW - timedelta(days=1, hours=1))
+    _metadata(container, "c", NOW - timedelta(hours=2))
+    _metadata(container, "fresh", NOW - timedelta(minutes=1))
+
+    first = compact_metadata(container, segment_records=1, now=NOW)
+
+    assert first.partitions == ["2025-03-01", "2025-03-02"]
+    assert first.blobs_compacted == 3
+    assert first.segments_written == 3
+    assert [r["metadata"]["itemId"] for r in _records(container, "2025-03-01")] == [
+        "b",
+        "a",
+    ]
+
+    downloads = container.downloads
+    second = compact_metadata(container, now=NOW + timedelta(hours=1))
+
+    assert second.blobs_compacted == 1
+    assert [r["metadata"]["itemId"] for r in _records(container, "2025-03-02")] == [
+        "c",
+        "fresh",
+    ]
+    # Only the new blob, the state and one manifest were read.
+    assert container.downloads - downloads == 3
+
+
+def test_interrupted_run_resumes_with_same_cutoff() -> None:
+    container = FakeContainer()
+    _metadata(container, "a", NOW - timedelta(hours=3))
+    state = {
+        "watermark": None,
+        "pending": {"cutoff": (NOW - timedelta(hours=2)).isoformat()},
+    }
+    container.put(STATE_BLOB, json.dumps(state).encode())
+    _metadata(container, "late", NOW - timedelta(hours=1))
+
+    summary = compact_metadata(container, now=NOW)
+
+    assert summary.resumed
+    assert summary.blobs_compacted == 1
+    state = json.loads(container.blobs[STATE_BLOB][0])
+    assert state["pending"] is None
+    assert state["watermark"] == (NOW - timedelta(hours=2)).isoformat()
+
+
+def test_prune_drops_records_of_deleted_uploads() -> None:
+    container = FakeContainer()
+    kept = _metadata(container, "kept", NOW - timedelta(hours=2))
+    deleted = _metadata(container, "deleted", NOW - timedelta(hours=2))
+    compact_metadata(container, now=NOW)
+    container.delete_blob(deleted)
+
+    summary = compact_metadata(container, prune=True, now=NOW + timedelta(hours=1))
+
+    assert summary.records_pruned == 1
+    assert [r["blobName"] for r in _records(container, "2025-03-02")] == [kept]
+
+
+def test_concurrent_run_is_refused() -> None:
+    container = FakeContainer()
+    container.put(STATE_BLOB, b"{}")
+    original = container.get_blob_client
+
+    def racing_client(name: str) -> _FakeBlobClient:
+        # Another run rewrites the state between our read and write.
+        container.put(STATE_BLOB, b"{}")
+        return original(name)
+
+    container.get_blob_client = racing_client
+
+    with pytest.raises(ResourceModifiedError):
+        compact_metadata(container, now=NOW)
+
+
+def _claimed_state(heartbeat: datetime) -> bytes:
+    pending = {
+        "cutoff": (NOW - timedelta(hours=2)).isoformat(),
+        "owner": "other",
+        "heartbeat": heartbeat.isoformat(),
+    }
+    return json.dumps({"watermark": None, "pending": pending}).encode()
+
+
+def test_resume_is_refused_while_the_running_claim_is_fresh() -> None:
+    container = FakeContainer()
+    _metadata(container, "a", NOW - timedelta(hours=3))
+    container.put(STATE_BLOB, _claimed_state(NOW - timedelta(minutes=1)))
+
+    with pytest.raises(CompactionInProgress):
+        compact_metadata(container, now=NOW)
+
+    assert not any(name.endswith("manifest.json") for name in container.blobs)
+
+
+def test_resume_claims_the_state_before_compacting() -> None:
+    container = FakeContainer()
+    _metadata(container, "a", NOW - timedelta(hours=3))
+    container.put(STATE_BLOB, _claimed_state(NOW - timedelta(hours=1)))
+    claims = []
+    original = container.list_blobs
+
+    def listing(name_starts_with: str = ""):
+        claims.append(json.loads(container.blobs[STATE_BLOB][0])["pending"])
+        return original(name_starts_with)
+
+    container.list_blobs = listing
+
+    summary = compact_metadata(container, now=NOW)
+
+    assert summary.resumed
+    assert summary.blobs_compacted == 1
+    assert claims[0]["owner"] != "other"
+    assert claims[0]["cutoff"] == (NOW - timedelta(hours=2)).isoformat()
+
+
+def test_run_whose_claim_was_taken_over_writes_no_manifest() -> None:
+    container = FakeContainer()
+    _metadata(container, "a", NOW - timedelta(hours=3))
+    original = container.download_blob
+
+    def slow_download(name: str) -> _Download:
+        if name.startswith(METADATA_PREFIX):
+            # Another run takes over, then this run's heartbeat notices.
+            container.put(STATE_BLOB, _claimed_state(datetime.now(timezone.utc)))
+            time.sleep(0.2)
+        return original(name)
+
+    container.download_blob = slow_download
+
+    with pytest.raises(ResourceModifiedError):
+        compact_metadata(container, now=NOW, lock_seconds=0.03)
+
+    assert not any(name.endswith("manifest.json") for name in container.blobs)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+import tarfile
+import uuid
+import wave
+from pathlib import Path
+
+import pytest
+from azure.core.exceptions import AzureError
+from azure.storage.blob import BlobServiceClient as SyncBlobServiceClient
+from azure.storage.blob.aio import BlobServiceClient
+
+from recorder_tooling.export_corpus import (
+    Selection,
+    audio_duration,
+    export_corpus,
+    open_index,
+    update_index,
+    verify_export,
+)
+from recorder_tooling.init_storage import AZURITE_CONNECTION_STRING
+
+METADATA = "uploads/audio_and_metadata/metadata"
+AUDIO = "uploads/audio_and_metadata"
+SESSION_ID = "7c9e6679-7425-40de-944b-e07fc1f90ae7"
+
+
+def _wav(seconds: float, sample_rate: int = 8000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(bytes(2 * int(seconds * sample_rate)))
+    return buffer.getvalue()
+
+
+def _flac_header(sample_rate: int, total_samples: int) -> bytes:
+    # 16-bit mono; block sizes and frame sizes are not read.
+    packed = sample_rate << 44 | 0 << 41 | 15 << 36 | total_samples
+    streaminfo = bytes(10) + packed.to_bytes(8, "big") + bytes(16)
+    return b"fLaC" + bytes([0x80]) + len(streaminfo).to_bytes(3, "big") + streaminfo
+
+
+def test_audio_duration_is_read_from_headers() -> None:
+    wav = _wav(1.5)
+    # Streaming writers may leave the data size unset.
+    unsized = wav[:40] + b"\xff\xff\xff\xff" + wav[44:]
+
+    assert audio_duration(wav) == 1.5
+    assert audio_duration(unsized) == 1.5
+    assert audio_duration(_flac_header(48000, 120000)) == 2.5
+    assert audio_duration(b"\x00\x00\x00\x18ftypM4A ") is None
+    assert audio_duration(b"") is None
+
+
+@pytest.fixture
+def container_name():
+    """A fresh container on Azurite, or skip when Azurite is not running."""
+    client = SyncBlobServiceClient.from_connection_string(
+        AZURITE_CONNECTION_STRING, connection_timeout=2, retry_total=0
+    )
+    name = f"export-test-{uuid.uuid4().hex[:12]}"
+    try:
+        client.create_container(name)
+    except AzureError:
+        if os.environ.get("REQUIRE_AZURITE"):
+            raise
+        pytest.skip("Azurite is not running on 127.0.0.1:10000")
+
+    container = client.get_container_client(name)
+    for index in range(4):
+        # Shaped like what the backend stores for an app upload.
+        client_id = f"{index:08d}-e29b-41d4-a716-446655440000"
+        recording_id = str(uuid.uuid4())
+        metadata = {
+            "clientId": client_id,
+            "sessionId": SESSION_ID,
+            "recordingId": recording_id,
+            "contentType": "audio/wav",
+        }
+        path = f"{client_id}/{SESSION_ID}/{recording_id}"
+        container.upload_blob(f"{METADATA}/{path}.json", json.dumps(metadata))
+        container.upload_blob(f"{AUDIO}/{path}.wav", _wav(0.5 * (index + 1)))
+    yield name
+    client.delete_container(name)
+
+
+def _run(container_name: str, coroutine_factory):
+    async def run():
+        async with BlobServiceClient.from_connection_string(
+            AZURITE_CONNECTION_STRING
+        ) as client:
+            return await coroutine_factory(client.get_container_client(container_name))
+
+    return asyncio.run(run())
+
+
+def test_index_is_updated_incrementally(container_name: str, tmp_path: Path) -> None:
+    conn = open_index(tmp_path / "index.sqlite")
+
+    first = _run(container_name, lambda c: update_index(c, conn))
+    second = _run(container_name, lambda c: update_index(c, conn))
+
+    assert first.recordings == 4
+    assert first.blobs_read == 4
+    assert second.blobs_read == 0
+
+
+def test_export_is_resumable_and_verifiable(
+    container_name: str, tmp_path: Path
+) -> None:
+    conn = open_index(tmp_path / "index.sqlite")
+    out_dir = tmp_path / "export"
+    selection = Selection(since="2000-01-01")
+
+    async def export(container):
+        await update_index(container, conn)
+        # 0.5 s to 2 s of 16-bit 8 kHz audio: shards of 3 and 1 recordings.
+        return await export_corpus(
+            container, conn, out_dir, selection, shard_bytes=50_000
+        )
+
+    first = _run(container_name, export)
+    # An interrupted run leaves a shard without its manifest.
+    (out_dir / "shard-00001.json").unlink()
+    resumed = _run(container_name, export)
+
+    assert (first.recordings, first.shards, first.shards_written) == (4, 2, 2)
+    assert (resumed.shards_written, resumed.shards_skipped) == (1, 1)
+    assert verify_export(out_dir) == []
+    manifest = json.loads((out_dir / "shard-00000.json").read_text())
+    assert [r["duration"] for r in manifest["recordings"]] == [0.5, 1.0, 1.5]
+    with tarfile.open(out_dir / "shard-00000.tar") as tar:
+        names = tar.getnames()
+    assert names[0] == manifest["recordings"][0]["path"]
+    assert names[0].startswith(f"00000000-e29b-41d4-a716-446655440000/{SESSION_ID}/")
+
+    (out_dir / "shard-00001.tar").write_bytes(b"damaged")
+    assert verify_export(out_dir) == ["shard-00001.tar: checksum mismatch"]